@@ -0,0 +1,217 @@
+"""Deterministic relationship analytics behind /ai/insights.
+
+Everything numeric - drift alerts, category balance, per-tag health, the
+overdue distribution - is computed here with NumPy over *all* non-archived
+contacts. Two queries feed it: one projection of the contacts with health and
+days-since-contact computed in the database, and one grouped count of each
+contact's interactions over the last RECENT_DAYS and the BASELINE_DAYS window
+before that.
+
+The model is only asked for the prose (`overall_insight`, `encouragement`),
+and only sees the compact `digest`. The prose is stored in `insight_snapshots`
+together with the digest's fingerprint; as long as the fingerprint is the
+same, the stored prose is reused without calling the model.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from health import days_since_expr, health_expr
+from timestamps import date_expr, since, utcnow
+
+RECENT_DAYS = 30
+BASELINE_DAYS = 90
+DRIFT_HEALTH_BELOW = 50
+DRIFT_ALERT_LIMIT = 5
+HEALTHY_AT = 70
+
+OVERDUE_BUCKETS = ["on_track", "1-7", "8-30", "31-90", "90+"]
+_OVERDUE_EDGES = [1, 8, 31, 91]  # lower bounds, in days overdue, of every bucket after on_track
+
+PROSE_SNAPSHOT_ID = "default"
+
+
+def contacts_pipeline(now: datetime) -> List[dict]:
+    return [
+        {"$match": {"is_archived": False}},
+        {"$project": {
+            "_id": 0, "id": 1, "name": 1, "relationship_tag": 1, "frequency_days": 1, "is_pinned": 1,
+            "health": health_expr(now),
+            "days_since": days_since_expr(now),
+        }},
+    ]
+
+
+def cadence_pipeline(now: datetime) -> List[dict]:
+    recent = now - timedelta(days=RECENT_DAYS)
+    baseline = now - timedelta(days=BASELINE_DAYS)
+    created = date_expr("created_at")
+    return [
+        {"$match": since("created_at", baseline)},
+        {"$group": {
+            "_id": "$contact_id",
+            "recent": {"$sum": {"$cond": [{"$gte": [created, recent]}, 1, 0]}},
+            "earlier": {"$sum": {"$cond": [{"$lt": [created, recent]}, 1, 0]}},
+        }},
+    ]
+
+
+def _drift_message(name: str, days: float, frequency: float) -> str:
+    cadence = "every day" if int(frequency) == 1 else f"every {int(frequency)} days"
+    return f"It's been {int(days)} days since you connected with {name} — you were aiming for {cadence}."
+
+
+def analyze(contacts: List[dict], cadence: List[dict]) -> dict:
+    """Pure function of the two query results; see module docstring."""
+    n = len(contacts)
+    names = [c["name"] for c in contacts]
+    tags = np.array([c.get("relationship_tag") or "Other" for c in contacts], dtype=object)
+    health = np.array([c.get("health") or 0.0 for c in contacts], dtype=float)
+    freq = np.array([c.get("frequency_days") or 7 for c in contacts], dtype=float)
+    days_since = np.array([np.nan if c.get("days_since") is None else c["days_since"] for c in contacts], dtype=float)
+    pinned = np.array([bool(c.get("is_pinned")) for c in contacts], dtype=bool)
+
+    index = {c["id"]: i for i, c in enumerate(contacts)}
+    recent = np.zeros(n)
+    earlier = np.zeros(n)
+    for row in cadence:
+        i = index.get(row["_id"])
+        if i is not None:
+            recent[i] = row["recent"]
+            earlier[i] = row["earlier"]
+
+    never = np.isnan(days_since)
+    overdue_days = np.where(never, 0.0, np.maximum(0.0, np.floor(np.nan_to_num(days_since) - freq)))
+
+    # Drift: below DRIFT_HEALTH_BELOW and either talking less than in the baseline
+    # window or at under half the cadence the contact's frequency asks for.
+    expected = np.where(freq > 0, RECENT_DAYS / np.where(freq > 0, freq, 1), 0.0)
+    baseline_rate = earlier * RECENT_DAYS / (BASELINE_DAYS - RECENT_DAYS)
+    trend = recent - baseline_rate
+    drifting = (health < DRIFT_HEALTH_BELOW) & ~never & ((trend < 0) | (recent < expected * 0.5))
+    drift_idx = np.flatnonzero(drifting)
+    drift_idx = drift_idx[np.lexsort((-days_since[drift_idx], health[drift_idx]))][:DRIFT_ALERT_LIMIT]
+    drift_alerts = [{
+        "contact_id": contacts[i]["id"],
+        "contact_name": names[i],
+        "message": _drift_message(names[i], days_since[i], freq[i]),
+        "health": round(float(health[i]), 1),
+        "days_since": int(days_since[i]),
+        "trend": round(float(trend[i]), 2),
+    } for i in drift_idx]
+
+    tag_names, tag_of = np.unique(tags.astype(str), return_inverse=True)
+    tag_counts = np.bincount(tag_of, minlength=len(tag_names))
+    tag_health = np.bincount(tag_of, weights=health, minlength=len(tag_names)) / np.maximum(tag_counts, 1)
+    tag_overdue = np.bincount(tag_of, weights=(overdue_days > 0), minlength=len(tag_names))
+    category_balance = {
+        str(tag): {
+            "count": int(tag_counts[t]),
+            "share": round(float(tag_counts[t]) / n * 100, 1),
+            "avg_health": round(float(tag_health[t]), 1),
+            "overdue": int(tag_overdue[t]),
+        }
+        for t, tag in enumerate(tag_names)
+    }
+
+    buckets = np.bincount(np.digitize(overdue_days[~never], _OVERDUE_EDGES), minlength=len(OVERDUE_BUCKETS))
+    overdue_distribution = {label: int(buckets[b]) for b, label in enumerate(OVERDUE_BUCKETS)}
+    overdue_distribution["never"] = int(never.sum())
+
+    stats = {
+        "total": n,
+        "avg_health": round(float(health.mean()), 1),
+        "median_health": round(float(np.median(health)), 1),
+        "healthy": int((health >= HEALTHY_AT).sum()),
+        "overdue": int((overdue_days > 0).sum()),
+        "drifting": int(drifting.sum()),
+        "never_contacted": int(never.sum()),
+        "pinned_below_drift": int((pinned & (health < DRIFT_HEALTH_BELOW)).sum()),
+    }
+
+    return {
+        "drift_alerts": drift_alerts,
+        "category_balance": category_balance,
+        "overdue_distribution": overdue_distribution,
+        "suggestions": suggestions(drift_alerts, category_balance, overdue_distribution, [names[i] for i in np.flatnonzero(never)]),
+        "stats": stats,
+    }
+
+
+def suggestions(drift_alerts: list, category_balance: dict, overdue_distribution: dict, never_contacted: List[str]) -> List[str]:
+    out = []
+    if drift_alerts:
+        a = drift_alerts[0]
+        out.append(f"Reach out to {a['contact_name']} — a short message is enough to reconnect.")
+    elif never_contacted:
+        out.append(f"Log your first conversation with {never_contacted[0]}.")
+    if len(category_balance) > 1:
+        tag, info = min(category_balance.items(), key=lambda item: (item[1]["avg_health"], item[0]))
+        out.append(f"Your {tag} connections average {info['avg_health']:.0f}% health — pick one to check in with this week.")
+    if overdue_distribution.get("90+"):
+        out.append(f"{overdue_distribution['90+']} connections have gone quiet for over three months; a simple hello can restart things.")
+    for generic in ["Schedule a short call with someone you haven't spoken to this month.",
+                    "Pin the people you most want to stay close to so they surface first.",
+                    "Reach out to someone today"]:
+        if len(out) >= 3:
+            break
+        out.append(generic)
+    return out[:3]
+
+
+def digest(analysis: dict) -> dict:
+    """Compact, rounded summary the model writes prose from. Rounding keeps the
+    fingerprint stable while health drifts by fractions of a point."""
+    stats = analysis["stats"]
+    return {
+        "total": stats["total"],
+        "avg_health": round(stats["avg_health"]),
+        "healthy": stats["healthy"],
+        "overdue": stats["overdue"],
+        "drifting": stats["drifting"],
+        "never_contacted": stats["never_contacted"],
+        "categories": {tag: [c["count"], round(c["avg_health"])] for tag, c in analysis["category_balance"].items()},
+        "overdue_distribution": analysis["overdue_distribution"],
+        "drifting_contacts": [a["contact_name"] for a in analysis["drift_alerts"][:3]],
+    }
+
+
+def fingerprint(digest: dict) -> str:
+    return hashlib.sha256(json.dumps(digest, sort_keys=True).encode()).hexdigest()
+
+
+async def compute_analytics(db, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now(timezone.utc)
+    contacts = await db.contacts.aggregate(contacts_pipeline(now)).to_list(None)
+    if not contacts:
+        return {}
+    cadence = await db.interactions.aggregate(cadence_pipeline(now)).to_list(None)
+    analysis = analyze(contacts, cadence)
+    analysis["digest"] = digest(analysis)
+    analysis["fingerprint"] = fingerprint(analysis["digest"])
+    return analysis
+
+
+async def get_prose(db, fingerprint: str) -> Optional[dict]:
+    doc = await db.insight_snapshots.find_one({"_id": PROSE_SNAPSHOT_ID, "fingerprint": fingerprint})
+    return doc["prose"] if doc else None
+
+
+async def store_prose(db, fingerprint: str, prose: dict):
+    await db.insight_snapshots.update_one(
+        {"_id": PROSE_SNAPSHOT_ID},
+        {"$set": {"fingerprint": fingerprint, "prose": prose, "generated_at": utcnow()}},
+        upsert=True,
+    )
+
+
+async def insight_prose(db, analysis: dict, write: Callable[[dict], Awaitable[dict]]) -> dict:
+    """Stored prose for this fingerprint, or freshly written (and stored) prose. `write` raises on failure."""
+    prose = await get_prose(db, analysis["fingerprint"])
+    if prose is None:
+        prose = await write(analysis["digest"])
+        await store_prose(db, analysis["fingerprint"], prose)
+    return prose
@@ -0,0 +1,119 @@
+"""Dashboard latency: Python-loop implementation vs the single $facet round trip.
+
+Seeds a scratch database (`<DB_NAME>_bench`, dropped afterwards unless --keep)
+with N contacts and 2N interactions from synthetic.py, then reports p50 / p99
+of both implementations at each size.
+
+    cd backend && python -m benchmarks.bench_dashboard --sizes 1000,10000,100000 --runs 30
+
+Note: the legacy implementation reads at most 500 contacts (its `to_list(500)`),
+so at 10k+ it is timing a truncated - and wrong - answer.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from dashboard import compute_dashboard
+from indexes import ensure_indexes
+from synthetic import generate_dataset
+from timestamps import as_datetime
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+
+def _health(last_interaction_at, frequency_days):
+    last = as_datetime(last_interaction_at)
+    if not last:
+        return 0.0
+    try:
+        elapsed = (datetime.now(timezone.utc) - last).total_seconds() / 86400
+        return round(max(0.0, min(100.0, (1.0 - elapsed / frequency_days) * 100)), 1)
+    except Exception:
+        return 0.0
+
+
+async def legacy_dashboard(db):
+    """The pre-aggregation get_dashboard, verbatim apart from taking `db` as an argument
+    and comparing timestamps as dates."""
+    contacts = await db.contacts.find({"is_archived": False}, {"_id": 0}).to_list(500)
+    total = len(contacts)
+    if total == 0:
+        return {}
+    scores = []
+    needs_attention = []
+    for c in contacts:
+        health = _health(c.get("last_interaction_at"), c.get("frequency_days", 7))
+        c["connection_health"] = health
+        scores.append(health)
+        if health < 30:
+            needs_attention.append({"id": c["id"], "name": c["name"], "health": health, "relationship_tag": c["relationship_tag"]})
+    overall_score = round(sum(scores) / len(scores), 1) if scores else 0
+    needs_attention.sort(key=lambda x: x["health"])
+    pinned = [c for c in contacts if c.get("is_pinned")]
+    pool = pinned if pinned else contacts
+    suggested = min(pool, key=lambda c: c.get("connection_health", 0)) if pool else None
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    month_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    weekly_count = await db.interactions.count_documents({"created_at": {"$gte": week_ago}})
+    monthly_count = await db.interactions.count_documents({"created_at": {"$gte": month_ago}})
+    categories = {}
+    for c in contacts:
+        tag = c.get("relationship_tag", "Other")
+        categories[tag] = categories.get(tag, 0) + 1
+    return {"overall_score": overall_score, "suggested": suggested, "weekly": weekly_count, "monthly": monthly_count, "categories": categories}
+
+
+async def seed(db, n_contacts: int, rng_seed: int):
+    await db.contacts.delete_many({})
+    await db.interactions.delete_many({})
+    await generate_dataset(db, n_contacts, n_contacts * 2, seed=rng_seed)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def measure(fn, db, runs):
+    await fn(db)  # warm-up
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn(db)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db_name = f"{os.environ['DB_NAME']}_bench"
+    db = client[db_name]
+    await ensure_indexes(db)
+
+    print(f"{'contacts':>10} {'impl':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        await seed(db, size, args.seed)
+        for name, fn in (("legacy", legacy_dashboard), ("facet", compute_dashboard)):
+            p50, p99 = await measure(fn, db, args.runs)
+            print(f"{size:>10} {name:>8} {p50:>10.1f} {p99:>10.1f}")
+
+    if not args.keep:
+        await client.drop_database(db_name)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,269 @@
+"""Load test: replay a weighted route mix against the app and report latency per route.
+
+By default the FastAPI app runs in this process behind httpx's ASGI transport,
+against a scratch database (`<DB_NAME>_loadtest` on MONGO_URL, dropped
+afterwards unless --keep) seeded by synthetic.py. The LLM is the local stub
+(`LLM_BACKEND=stub`) and Expo push requests are answered in-process, so only
+the app and MongoDB are measured. The app's startup hooks run as usual, so the
+dashboard refresher, enrichment workers and brief prefetcher compete for the
+database just as they do in production.
+
+`--concurrency` workers each send one request at a time, picking the route from
+the mix, for `--duration` seconds after `--warmup` seconds that are not
+recorded. The report has requests/s and p50 / p95 / p99 per route.
+
+    cd backend && python -m benchmarks.load_test --contacts 10000 --interactions 200000 --concurrency 32 --duration 30
+    cd backend && python -m benchmarks.load_test --mix mixed --write-baseline benchmarks/baseline.json
+    cd backend && python -m benchmarks.load_test --mix mixed --baseline benchmarks/baseline.json
+
+With --baseline the run is compared with a saved report and exits with status 1
+when a route's p95 grew, or its throughput fell, by more than --tolerance.
+Compare runs with the same dataset, mix and concurrency on the same machine.
+
+--url drives an already running server instead (e.g. uvicorn under test);
+start it with LLM_BACKEND=stub, DB_NAME=<DB_NAME>_loadtest and EXPO_PUSH_URL
+pointing at a stub, or leave push out of the mix.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.bench_dashboard import percentile
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+
+# route -> (method, path template); {contact_id} is filled with a random seeded contact
+ROUTES = {
+    "dashboard": ("GET", "/api/dashboard"),
+    "contacts": ("GET", "/api/contacts"),
+    "interactions": ("GET", "/api/interactions/{contact_id}"),
+    "notifications": ("GET", "/api/notifications/pending"),
+    "widget": ("GET", "/api/widget/data"),
+    "log_interaction": ("POST", "/api/interactions"),
+    "push_reminders": ("POST", "/api/push/send-reminders"),
+}
+
+# Relative weights. `read` is people opening the app and the home-screen widget
+# refreshing; `mixed` adds logging interactions and the reminder push job.
+MIXES = {
+    "read": {"dashboard": 30, "contacts": 15, "interactions": 20, "notifications": 15, "widget": 20},
+    "mixed": {"dashboard": 25, "contacts": 12, "interactions": 18, "notifications": 12, "widget": 20,
+              "log_interaction": 12, "push_reminders": 1},
+}
+
+LOG_NOTES = [
+    "Called to catch up about the weekend, they sounded well.",
+    "Quick text about dinner plans next week.",
+    "Long talk about their new job and the move.",
+]
+PUSH_DEVICES = 5
+SAMPLED_CONTACTS = 1000
+
+
+def _expo_stub(request: httpx.Request) -> httpx.Response:
+    payload = json.loads(request.content or b"[]")
+    if request.url.path.endswith("/getReceipts"):
+        return httpx.Response(200, json={"data": {ticket_id: {"status": "ok"} for ticket_id in payload["ids"]}})
+    return httpx.Response(200, json={"data": [{"status": "ok", "id": f"stub-{uuid.uuid4()}"} for _ in payload]})
+
+
+class _StubbedExpoClient(httpx.AsyncClient):
+    """httpx.AsyncClient that answers requests in-process unless given its own transport."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("transport", httpx.MockTransport(_expo_stub))
+        super().__init__(*args, **kwargs)
+
+
+def _request(rng: random.Random, route: str, contact_ids: list) -> dict:
+    method, path = ROUTES[route]
+    contact_id = rng.choice(contact_ids)
+    request = {"method": method, "url": path.format(contact_id=contact_id)}
+    if route == "log_interaction":
+        request["json"] = {"contact_id": contact_id, "interaction_type": "call", "notes": rng.choice(LOG_NOTES)}
+    return request
+
+
+async def _worker(http, rng, mix, contact_ids, record_from, stop_at, samples, errors):
+    routes, weights = list(mix), list(mix.values())
+    while True:
+        route = rng.choices(routes, weights=weights)[0]
+        started = time.perf_counter()
+        if started >= stop_at:
+            return
+        try:
+            response = await http.request(**_request(rng, route, contact_ids))
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if started >= record_from:
+            samples[route].append((time.perf_counter() - started) * 1000)
+            if not ok:
+                errors[route] += 1
+
+
+async def run_mix(http, mix: dict, contact_ids: list, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    samples = {route: [] for route in mix}
+    errors = {route: 0 for route in mix}
+    record_from = time.perf_counter() + warmup
+    stop_at = record_from + duration
+    await asyncio.gather(*(
+        _worker(http, random.Random(seed + i), mix, contact_ids, record_from, stop_at, samples, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - record_from
+
+    routes = {}
+    for route, latencies in samples.items():
+        if not latencies:
+            continue
+        routes[route] = {
+            "requests": len(latencies),
+            "errors": errors[route],
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies), 2),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "seconds": round(elapsed, 1),
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "rps": round(total / elapsed, 1),
+        "routes": routes,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of `report` against `baseline`, as readable strings."""
+    regressions = []
+    for key in ("contacts", "interactions", "mix", "concurrency"):
+        if report["config"].get(key) != baseline["config"].get(key):
+            print(f"warning: {key} differs from the baseline ({report['config'].get(key)} vs {baseline['config'].get(key)})")
+    for route, base in baseline["routes"].items():
+        current = report["routes"].get(route)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {current['rps']} req/s vs baseline {base['rps']} req/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{route}: {current['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"{'route':>16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, r in sorted(report["routes"].items()):
+        print(f"{route:>16} {r['requests']:>9} {r['errors']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    print(f"{'total':>16} {report['requests']:>9} {report['errors']:>7} {report['rps']:>8.1f}")
+
+
+async def _prepare(db, args) -> list:
+    from indexes import ensure_indexes
+    from synthetic import generate_dataset
+
+    if not args.reuse:
+        await db.client.drop_database(db.name)
+        await ensure_indexes(db)
+        await generate_dataset(db, args.contacts, args.interactions, seed=args.seed)
+        await db.push_tokens.insert_many([
+            {"token": f"ExponentPushToken[loadtest-{i}]", "device_id": f"loadtest-{i}", "platform": "ios"}
+            for i in range(PUSH_DEVICES)
+        ])
+    rows = await db.contacts.aggregate([
+        {"$match": {"is_archived": False}}, {"$sample": {"size": SAMPLED_CONTACTS}}, {"$project": {"_id": 0, "id": 1}},
+    ]).to_list(SAMPLED_CONTACTS)
+    if not rows:
+        sys.exit("No contacts to drive the mix with; drop --reuse to seed the database")
+    return [r["id"] for r in rows]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=10_000)
+    parser.add_argument("--interactions", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="read")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--url", help="drive a running server at this base URL instead of the in-process app")
+    parser.add_argument("--reuse", action="store_true", help="run against the data already in the scratch database")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--write-baseline", metavar="PATH", help="write the JSON report as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against this baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95 / throughput change (default 0.2)")
+    args = parser.parse_args()
+
+    db_name = f"{os.environ['DB_NAME']}_loadtest"
+    os.environ["DB_NAME"] = db_name
+    os.environ["LLM_BACKEND"] = "stub"
+
+    if args.url:
+        mongo = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+        db = mongo[db_name]
+        contact_ids = await _prepare(db, args)
+        http = httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=60)
+        app = None
+    else:
+        httpx.AsyncClient = _StubbedExpoClient  # the app's Expo push calls
+        import server
+        app, mongo, db = server.app, server.client, server.db
+        contact_ids = await _prepare(db, args)
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+        await app.router.startup()
+
+    try:
+        async with http:
+            result = await run_mix(http, MIXES[args.mix], contact_ids, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if app is not None:
+            await app.router.shutdown()  # stops the background tasks and closes the app's Mongo client
+        else:
+            mongo.close()
+        if not args.keep:
+            cleanup = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+            await cleanup.drop_database(db_name)
+            cleanup.close()
+
+    report = {
+        "config": {
+            "contacts": args.contacts, "interactions": args.interactions, "seed": args.seed, "mix": args.mix,
+            "concurrency": args.concurrency, "duration": args.duration, "target": args.url or "asgi",
+        },
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        **result,
+    }
+    print_report(report)
+    for path in filter(None, (args.out, args.write_baseline)):
+        Path(path).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"wrote {path}")
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,356 @@
+"""Bulk import of contacts and interaction history.
+
+Accepts NDJSON or CSV. NDJSON lines are either bare records (the `kind`
+parameter says which) or typed records in the export format, so an NDJSON
+export can be imported again as-is:
+
+    {"type": "contact", "data": {"name": "Mom", "phone": "+1...", "relationship_tag": "Family"}}
+    {"type": "interaction", "data": {"contact_id": "...", "notes": "...", "created_at": "2021-05-01T18:00:00Z"}}
+
+A CSV file holds one kind of record, with a header row naming the fields.
+
+Rows are read and validated CHUNK_ROWS at a time. Each chunk costs one
+`insert_many(ordered=False)` per kind plus one `$in` lookup of the contacts
+its interactions refer to, so a bad row never stops the rest of its chunk.
+Interactions may refer to contacts imported earlier in the same file (give
+the contacts an `id`). After the last chunk, `interaction_count` and
+`last_interaction_at` are recomputed for every touched contact in a single
+aggregation that `$merge`s the results back into `contacts` - also when the
+import stops early, so whatever was written is always reconciled.
+
+Bytes that are not UTF-8 and malformed CSV rows are reported as row errors
+rather than ending the import.
+
+Imported interactions are not summarised inline. With `enrich` they are queued
+for the background enrichment worker in bulk; otherwise they are stored as
+"skipped".
+"""
+import asyncio
+import csv
+import io
+import json
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError, field_validator
+from pymongo.errors import BulkWriteError
+
+from enrichment import COMPLETE, PENDING, SKIPPED, enqueue_enrichments
+from health import due_fields, due_stage
+from timestamps import date_expr, utcnow
+
+CHUNK_ROWS = 1000
+MAX_REPORTED_ERRORS = 1000
+MIN_ENRICH_LENGTH = 10  # same cut-off as create_interaction
+
+KINDS = {"contact", "interaction"}
+# Export metadata lines that an import skips.
+_SKIPPED_TYPES = {"header", "settings", "checkpoint", "end", "goal"}
+
+
+def _timestamp(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+class ImportContact(BaseModel):
+    id: Optional[str] = None
+    name: str
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    relationship_tag: str = "Friend"
+    frequency_days: int = 7
+    is_pinned: bool = False
+    is_archived: bool = False
+    avatar_color: Optional[str] = None
+    notes: Optional[str] = None
+    last_interaction_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+    @field_validator("name")
+    @classmethod
+    def _name(cls, v: str) -> str:
+        if not v.strip():
+            raise ValueError("name must not be empty")
+        return v.strip()
+
+    @field_validator("frequency_days")
+    @classmethod
+    def _frequency(cls, v: int) -> int:
+        if v < 1:
+            raise ValueError("frequency_days must be at least 1")
+        return v
+
+    _timestamps = field_validator("last_interaction_at", "created_at", mode="before")(_timestamp)
+
+
+class ImportInteraction(BaseModel):
+    id: Optional[str] = None
+    contact_id: str
+    interaction_type: str = "note"
+    notes: Optional[str] = None
+    voice_transcript: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    created_at: Optional[datetime] = None
+    # Present when re-importing an export; such rows are not enriched again.
+    ai_summary: Optional[str] = None
+    key_highlights: List[str] = []
+    action_items: List[str] = []
+    emotional_cues: List[str] = []
+    promises: List[str] = []
+    important_dates: List[str] = []
+
+    _timestamps = field_validator("created_at", mode="before")(_timestamp)
+
+
+class ImportReport:
+    def __init__(self):
+        self.received = {kind: 0 for kind in KINDS}
+        self.inserted = {kind: 0 for kind in KINDS}
+        self.errors: List[dict] = []
+        self.error_count = 0
+        self.touched_contacts = set()
+        self.enrichment_queued = 0
+
+    def error(self, row: int, kind: Optional[str], message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "kind": kind, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.error_count,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+            "errors_truncated": self.error_count > len(self.errors),
+            "contacts_recomputed": len(self.touched_contacts),
+            "enrichment_queued": self.enrichment_queued,
+        }
+
+
+# ===================== PARSING =====================
+
+# The file is decoded with errors="replace"; a row containing the replacement character had bytes that were not UTF-8.
+_UNDECODABLE = "\ufffd"
+_NOT_UTF8 = "not valid UTF-8 (save the file as UTF-8)"
+
+
+def _ndjson_rows(text: io.TextIOBase, kind: Optional[str]) -> Iterator[Tuple[int, Optional[str], object]]:
+    """(line number, kind, record or error message)"""
+    for line_no, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if _UNDECODABLE in line:
+            yield line_no, kind, _NOT_UTF8
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, kind, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, kind, "expected a JSON object"
+        elif "type" in record:
+            if record["type"] in KINDS and isinstance(record.get("data"), dict):
+                yield line_no, record["type"], record["data"]
+            elif record["type"] not in _SKIPPED_TYPES:
+                yield line_no, None, f"unknown record type {record['type']!r}"
+        elif kind:
+            yield line_no, kind, record
+        else:
+            yield line_no, None, "untyped record; pass kind=contact or kind=interaction"
+
+
+def _csv_rows(text: io.TextIOBase, kind: str) -> Iterator[Tuple[int, Optional[str], object]]:
+    reader = csv.DictReader(text)
+    while True:
+        # DictReader.line_num only moves on a successful row; the inner reader's counts the lines consumed.
+        line_num = reader.reader.line_num
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.reader.line_num, kind, f"malformed CSV: {e}"
+            if reader.reader.line_num == line_num:
+                return  # nothing was consumed; the reader cannot get past this
+            continue
+        # Empty cells mean "not given", not "empty string".
+        record = {k.strip(): v for k, v in row.items() if k and v not in (None, "")}
+        if any(_UNDECODABLE in v for v in record.values() if isinstance(v, str)):
+            yield reader.line_num, kind, _NOT_UTF8
+            continue
+        yield reader.line_num, kind, record
+
+
+def _next_chunk(rows: Iterator) -> list:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            break
+    return chunk
+
+
+# ===================== WRITING =====================
+
+def _contact_doc(row: ImportContact, now: datetime, avatar_colors: List[str]) -> dict:
+    contact_id = row.id or str(uuid.uuid4())
+    created_at = row.created_at or now
+    return {
+        "_id": contact_id,
+        "id": contact_id,
+        "name": row.name,
+        "phone": row.phone,
+        "email": row.email,
+        "relationship_tag": row.relationship_tag,
+        "frequency_days": row.frequency_days,
+        "is_pinned": row.is_pinned,
+        "is_archived": row.is_archived,
+        "avatar_color": row.avatar_color or random.choice(avatar_colors),
+        "notes": row.notes,
+        "last_interaction_at": row.last_interaction_at,
+        "interaction_count": 0,
+        "connection_health": 0.0,
+        **due_fields(row.last_interaction_at, row.frequency_days, created_at),
+        "created_at": created_at,
+        "updated_at": now,
+    }
+
+
+def _interaction_doc(row: ImportInteraction, now: datetime, enrich: bool) -> dict:
+    interaction_id = row.id or str(uuid.uuid4())
+    text = row.notes or row.voice_transcript or ""
+    if row.ai_summary:
+        status = COMPLETE
+    else:
+        status = PENDING if enrich and len(text) > MIN_ENRICH_LENGTH else SKIPPED
+    return {
+        "_id": interaction_id,
+        "id": interaction_id,
+        "contact_id": row.contact_id,
+        "interaction_type": row.interaction_type,
+        "notes": row.notes,
+        "voice_transcript": row.voice_transcript,
+        "ai_summary": row.ai_summary or "",
+        "key_highlights": row.key_highlights,
+        "action_items": row.action_items,
+        "emotional_cues": row.emotional_cues,
+        "promises": row.promises,
+        "important_dates": row.important_dates,
+        "duration_minutes": row.duration_minutes,
+        "enrichment_status": status,
+        "created_at": row.created_at or now,
+    }
+
+
+async def _insert(collection, docs: List[dict], rows: List[int], kind: str, report: ImportReport) -> List[dict]:
+    """Unordered insert_many; returns the docs that were written."""
+    if not docs:
+        return []
+    failed = set()
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details.get("writeErrors", []):
+            failed.add(err["index"])
+            message = "duplicate id" if err.get("code") == 11000 else err.get("errmsg", "write failed")
+            report.error(rows[err["index"]], kind, message)
+    written = [doc for i, doc in enumerate(docs) if i not in failed]
+    report.inserted[kind] += len(written)
+    return written
+
+
+async def _import_chunk(db, chunk: list, enrich: bool, avatar_colors: List[str], report: ImportReport):
+    now = utcnow()
+    contacts, contact_rows = [], []
+    interactions: List[Tuple[int, ImportInteraction]] = []
+    for row_no, kind, record in chunk:
+        if kind in KINDS:
+            report.received[kind] += 1
+        if isinstance(record, str):
+            report.error(row_no, kind, record)
+            continue
+        try:
+            if kind == "contact":
+                contacts.append(_contact_doc(ImportContact(**record), now, avatar_colors))
+                contact_rows.append(row_no)
+            else:
+                interactions.append((row_no, ImportInteraction(**record)))
+        except ValidationError as e:
+            report.error(row_no, kind, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+
+    await _insert(db.contacts, contacts, contact_rows, "contact", report)
+    if not interactions:
+        return
+
+    referenced = list({row.contact_id for _, row in interactions})
+    existing = {c["id"] for c in await db.contacts.find({"id": {"$in": referenced}}, {"_id": 0, "id": 1}).to_list(len(referenced))}
+    docs, rows = [], []
+    for row_no, row in interactions:
+        if row.contact_id not in existing:
+            report.error(row_no, "interaction", f"unknown contact_id {row.contact_id!r}")
+            continue
+        docs.append(_interaction_doc(row, now, enrich))
+        rows.append(row_no)
+
+    written = await _insert(db.interactions, docs, rows, "interaction", report)
+    report.touched_contacts.update(doc["contact_id"] for doc in written)
+    queued = [(doc["id"], doc["notes"] or doc["voice_transcript"]) for doc in written if doc["enrichment_status"] == PENDING]
+    await enqueue_enrichments(db, queued)
+    report.enrichment_queued += len(queued)
+
+
+def recompute_pipeline(contact_ids: List[str]) -> List[dict]:
+    return [
+        {"$match": {"contact_id": {"$in": contact_ids}}},
+        {"$group": {"_id": "$contact_id", "interaction_count": {"$sum": 1}, "last_interaction_at": {"$max": date_expr("created_at")}}},
+        {"$project": {"_id": 0, "id": "$_id", "interaction_count": 1, "last_interaction_at": 1}},
+        {"$merge": {
+            "into": "contacts",
+            "on": "id",
+            "whenMatched": [
+                {"$set": {
+                    "interaction_count": "$$new.interaction_count",
+                    # An imported contact may already carry a later "last contacted" date.
+                    "last_interaction_at": {"$max": [date_expr("last_interaction_at"), "$$new.last_interaction_at"]},
+                }},
+                due_stage(),
+            ],
+            "whenNotMatched": "discard",
+        }},
+    ]
+
+
+async def recompute_contact_stats(db, contact_ids: List[str]):
+    if contact_ids:
+        await db.interactions.aggregate(recompute_pipeline(contact_ids)).to_list(None)
+
+
+async def import_file(
+    db, file, fmt: str, kind: Optional[str] = None, enrich: bool = False, avatar_colors: Optional[List[str]] = None,
+    report: Optional[ImportReport] = None,
+) -> ImportReport:
+    """`file` is a binary file object (an UploadFile's spooled file). Parsing runs in a worker thread.
+    Pass `report` to keep the counts of an import that raises part-way."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+    rows = _csv_rows(text, kind) if fmt == "csv" else _ndjson_rows(text, kind)
+    report = report or ImportReport()
+    try:
+        while True:
+            chunk = await asyncio.to_thread(_next_chunk, rows)
+            if not chunk:
+                break
+            await _import_chunk(db, chunk, enrich, avatar_colors or ["#40916C"], report)
+    finally:
+        text.detach()
+        await recompute_contact_stats(db, sorted(report.touched_contacts))
+    return report
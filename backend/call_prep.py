@@ -0,0 +1,163 @@
+"""Precomputed call-prep briefs.
+
+People open /ai/call-prep/{id} right before a call, so waiting on the model
+there hurts. `BriefPrefetcher` keeps ready-made briefs in `call_prep_briefs`
+(one document per contact, keyed by contact id) for the contacts most likely
+to be called next: pinned contacts and contacts whose health is getting close
+to the reminder threshold.
+
+Like the dashboard snapshot, each brief document carries a `version` that
+writes bump (a new interaction, a rename) and the `built_version` its brief
+was generated from. A brief is served only while the two match, and a brief is
+stored only if no write landed while it was being generated, so a brief never
+goes out older than the interactions it summarises. Briefs are not refreshed
+on a timer - only a bumped version makes one stale.
+
+A full pass (health over every contact with interactions) runs every
+`interval_seconds`. Writes call `notify` with the contacts they touched, and
+the pass that wakes up then looks only at those contacts, through the unique
+index on `id`, so a steady stream of interactions never turns into back-to-back
+collection scans.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Iterable, List, Optional, Set
+
+from pymongo.errors import DuplicateKeyError
+
+from health import health_stages
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Reminders start below 40; start preparing a little before that.
+PREFETCH_BELOW = 55
+PREFETCH_LIMIT = 50
+BRIEF_INTERACTIONS = 5
+
+
+async def invalidate_brief(db, contact_id: str):
+    await db.call_prep_briefs.update_one({"_id": contact_id}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def invalidate_briefs(db, contact_ids: List[str]):
+    """Bulk variant for imports; contacts without a brief document have nothing to invalidate."""
+    await db.call_prep_briefs.update_many({"_id": {"$in": contact_ids}}, {"$inc": {"version": 1}})
+
+
+async def delete_brief(db, contact_id: str):
+    await db.call_prep_briefs.delete_one({"_id": contact_id})
+
+
+async def get_brief(db, contact_id: str) -> Optional[dict]:
+    doc = await db.call_prep_briefs.find_one({"_id": contact_id})
+    if doc and "data" in doc and doc.get("built_version") == doc.get("version", 0):
+        return doc["data"]
+    return None
+
+
+def candidates_pipeline(now: datetime, below: float, limit: int, contact_ids: Optional[List[str]] = None) -> List[dict]:
+    """Pinned contacts first, then the lowest-health ones under `below`; never-contacted contacts have nothing to brief.
+    `contact_ids` narrows the scan to those contacts."""
+    match = {"is_archived": False, "interaction_count": {"$gt": 0}}
+    if contact_ids is not None:
+        match["id"] = {"$in": contact_ids}
+    return [
+        {"$match": match},
+        *health_stages(now),
+        {"$match": {"$or": [{"is_pinned": True}, {"connection_health": {"$lt": below}}]}},
+        {"$sort": {"is_pinned": -1, "connection_health": 1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "id": 1, "name": 1}},
+    ]
+
+
+class BriefPrefetcher:
+    def __init__(
+        self,
+        db,
+        generate: Callable[[str, list], Awaitable[dict]],
+        interval_seconds: float = 300,
+        below: float = PREFETCH_BELOW,
+        limit: int = PREFETCH_LIMIT,
+    ):
+        self.db = db
+        self.generate = generate
+        self.interval_seconds = interval_seconds
+        self.below = below
+        self.limit = limit
+        self._wake = asyncio.Event()
+        self._pending: Set[str] = set()
+        self._last_full_pass: Optional[float] = None
+
+    def notify(self, contact_ids: Iterable[str]):
+        """Run a pass over these contacts now (e.g. after an interaction made a brief stale)."""
+        self._pending.update(contact_ids)
+        self._wake.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wake.clear()
+            contact_ids, self._pending = self._pending, set()
+            # Notified passes must not starve the full one under a steady stream of writes.
+            full = not contact_ids or self._last_full_pass is None or loop.time() - self._last_full_pass >= self.interval_seconds
+            if full:
+                self._last_full_pass = loop.time()
+            try:
+                await self.refresh(None if full else list(contact_ids))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Call prep prefetch error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self, contact_ids: Optional[List[str]] = None) -> int:
+        """Build briefs for candidates (among `contact_ids`, if given) that have none or a stale one.
+        Returns how many were stored."""
+        candidates = await self.db.contacts.aggregate(
+            candidates_pipeline(datetime.now(timezone.utc), self.below, self.limit, contact_ids)
+        ).to_list(self.limit)
+        if not candidates:
+            return 0
+        docs = await self.db.call_prep_briefs.find({"_id": {"$in": [c["id"] for c in candidates]}}).to_list(len(candidates))
+        by_id = {d["_id"]: d for d in docs}
+
+        stored = 0
+        for contact in candidates:
+            doc = by_id.get(contact["id"], {})
+            if "data" in doc and doc.get("built_version") == doc.get("version", 0):
+                continue
+            if await self.build(contact, doc.get("version", 0)):
+                stored += 1
+        return stored
+
+    async def build(self, contact: dict, version: int) -> bool:
+        interactions = await self.db.interactions.find(
+            {"contact_id": contact["id"]}, {"_id": 0}
+        ).sort("created_at", -1).to_list(BRIEF_INTERACTIONS)
+        if not interactions:
+            return False
+        try:
+            brief = await self.generate(contact["name"], interactions)
+        except Exception as e:
+            logger.warning(f"Call prep brief for {contact['id']} not generated: {e}")
+            return False
+        try:
+            # Only store if nothing changed while the model was writing; the next pass retries otherwise.
+            result = await self.db.call_prep_briefs.update_one(
+                {"_id": contact["id"], "version": version},
+                {"$set": {
+                    "data": {**brief, "contact_name": contact["name"]},
+                    "built_version": version,
+                    "generated_at": utcnow(),
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return result.upserted_id is not None or result.matched_count > 0
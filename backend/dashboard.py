@@ -0,0 +1,195 @@
+"""Home dashboard as a single aggregation round trip, plus a materialized snapshot.
+
+One `$facet` over the non-archived contacts produces the overall score,
+category breakdown, needs-attention list and suggested contact, while an
+uncorrelated `$lookup` into interactions supplies the weekly / monthly counts.
+
+The result is persisted in `dashboard_snapshots`. Writes that change the
+dashboard bump the snapshot's `generation` and start a background rebuild; a
+burst of writes coalesces into one rebuild plus one more for writes that land
+during it. Reads are a single find_one: they serve the stored payload, also
+while it is being rebuilt after a write, so reads never run the $facet
+themselves. Only a missing snapshot, or one older than `max_age` (health
+decays with time even without writes), is rebuilt before answering, and
+concurrent reads share that rebuild. `snapshot_refresher` rebuilds
+periodically so that rarely happens.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from health import health_stages
+from timestamps import as_datetime, date_expr, since, utcnow
+
+logger = logging.getLogger(__name__)
+
+NEEDS_ATTENTION_BELOW = 30
+NEEDS_ATTENTION_LIMIT = 5
+
+_CARD = {"_id": 0, "id": 1, "name": 1, "health": "$connection_health", "relationship_tag": 1}
+
+
+def dashboard_pipeline(now: datetime) -> List[dict]:
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+    return [
+        {"$match": {"is_archived": False}},
+        {"$project": {"id": 1, "name": 1, "relationship_tag": 1, "is_pinned": 1, "last_interaction_at": 1, "frequency_days": 1}},
+        *health_stages(now),
+        {"$facet": {
+            "summary": [
+                {"$group": {"_id": None, "total": {"$sum": 1}, "avg_health": {"$avg": "$connection_health"}}},
+            ],
+            "categories": [
+                {"$group": {"_id": {"$ifNull": ["$relationship_tag", "Other"]}, "count": {"$sum": 1}}},
+            ],
+            "needs_attention": [
+                {"$match": {"connection_health": {"$lt": NEEDS_ATTENTION_BELOW}}},
+                {"$sort": {"connection_health": 1, "_id": 1}},
+                {"$limit": NEEDS_ATTENTION_LIMIT},
+                {"$project": _CARD},
+            ],
+            # Lowest-health pinned contact, or lowest-health contact overall when nobody is pinned.
+            "suggested": [
+                {"$sort": {"is_pinned": -1, "connection_health": 1, "_id": 1}},
+                {"$limit": 1},
+                {"$project": _CARD},
+            ],
+            "interactions": [
+                {"$limit": 1},
+                {"$lookup": {
+                    "from": "interactions",
+                    "pipeline": [
+                        {"$match": since("created_at", month_ago)},
+                        {"$group": {
+                            "_id": None,
+                            "monthly": {"$sum": 1},
+                            "weekly": {"$sum": {"$cond": [{"$gte": [date_expr("created_at"), week_ago]}, 1, 0]}},
+                        }},
+                    ],
+                    "as": "counts",
+                }},
+                {"$project": {"_id": 0, "counts": 1}},
+            ],
+        }},
+    ]
+
+
+def empty_dashboard() -> dict:
+    return {
+        "overall_score": 0,
+        "total_contacts": 0,
+        "needs_attention": [],
+        "suggested_contact": None,
+        "weekly_interactions": 0,
+        "monthly_interactions": 0,
+        "category_breakdown": {},
+    }
+
+
+async def compute_dashboard(db, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.now(timezone.utc)
+    result = (await db.contacts.aggregate(dashboard_pipeline(now)).to_list(1))[0]
+    if not result["summary"]:
+        return empty_dashboard()
+
+    summary = result["summary"][0]
+    counts = result["interactions"][0]["counts"] if result["interactions"] else []
+    counts = counts[0] if counts else {}
+    return {
+        "overall_score": round(summary["avg_health"] or 0, 1),
+        "total_contacts": summary["total"],
+        "needs_attention": result["needs_attention"],
+        "suggested_contact": result["suggested"][0] if result["suggested"] else None,
+        "weekly_interactions": counts.get("weekly", 0),
+        "monthly_interactions": counts.get("monthly", 0),
+        "category_breakdown": {c["_id"]: c["count"] for c in result["categories"]},
+    }
+
+
+SNAPSHOT_ID = "default"
+
+
+async def invalidate_dashboard(db):
+    """Mark the snapshot stale and rebuild it in the background; reads keep the previous payload meanwhile."""
+    await db.dashboard_snapshots.update_one({"_id": SNAPSHOT_ID}, {"$inc": {"generation": 1}}, upsert=True)
+    _schedule_rebuild(db)
+
+
+# The rebuild in progress in this process, with the generation it was started for,
+# and the background task that keeps rebuilding until the snapshot has caught up with writes.
+_rebuild: Optional[Tuple[int, "asyncio.Task[dict]"]] = None
+_catch_up: Optional["asyncio.Task[None]"] = None
+
+
+async def _build_snapshot(db, generation: int) -> dict:
+    data = await compute_dashboard(db)
+    try:
+        # Never replace a snapshot built for a later generation (a slower, older rebuild finishing last).
+        await db.dashboard_snapshots.update_one(
+            {"_id": SNAPSHOT_ID, "$nor": [{"built_generation": {"$gte": generation}}]},
+            {"$set": {"data": data, "built_generation": generation, "computed_at": utcnow()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        pass
+    return data
+
+
+async def _shared_rebuild(db, generation: int) -> dict:
+    """Rebuild for `generation`, joining a rebuild already running for it (or a later one), so
+    concurrent callers share one $facet instead of each running it."""
+    global _rebuild
+    if _rebuild is None or _rebuild[1].done() or _rebuild[0] < generation:
+        _rebuild = (generation, asyncio.create_task(_build_snapshot(db, generation)))
+    # shield: a caller that goes away does not cancel the rebuild the others are waiting for.
+    return await asyncio.shield(_rebuild[1])
+
+
+async def _rebuild_until_current(db):
+    try:
+        while True:
+            snapshot = await db.dashboard_snapshots.find_one({"_id": SNAPSHOT_ID}, {"generation": 1, "built_generation": 1}) or {}
+            generation = snapshot.get("generation", 0)
+            if snapshot.get("built_generation") == generation:
+                return
+            await _shared_rebuild(db, generation)  # writes during this build are picked up by the next round
+    except Exception as e:
+        logger.error(f"Dashboard snapshot rebuild error: {e}")
+
+
+def _schedule_rebuild(db):
+    """A burst of writes coalesces into the one catch-up task already running."""
+    global _catch_up
+    if _catch_up is None or _catch_up.done():
+        _catch_up = asyncio.create_task(_rebuild_until_current(db))
+
+
+async def refresh_dashboard_snapshot(db) -> dict:
+    snapshot = await db.dashboard_snapshots.find_one({"_id": SNAPSHOT_ID}, {"generation": 1}) or {}
+    return await _shared_rebuild(db, snapshot.get("generation", 0))
+
+
+async def get_dashboard_snapshot(db, max_age: timedelta) -> dict:
+    """One find_one. A snapshot behind the latest writes is served while it is rebuilt in the background;
+    only a missing snapshot, or one older than `max_age`, is rebuilt before answering."""
+    snapshot = await db.dashboard_snapshots.find_one({"_id": SNAPSHOT_ID}) or {}
+    generation = snapshot.get("generation", 0)
+    computed_at = as_datetime(snapshot.get("computed_at"))
+    if "data" in snapshot and computed_at and datetime.now(timezone.utc) - computed_at < max_age:
+        if snapshot.get("built_generation") != generation:
+            _schedule_rebuild(db)  # e.g. a write handled by another worker
+        return snapshot["data"]
+    return await _shared_rebuild(db, generation)
+
+
+async def snapshot_refresher(db, interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await refresh_dashboard_snapshot(db)
+        except Exception as e:
+            logger.error(f"Dashboard snapshot refresh error: {e}")
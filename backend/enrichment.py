@@ -0,0 +1,165 @@
+"""Background AI enrichment of logged interactions.
+
+create_interaction stores the interaction with `enrichment_status: "pending"`
+and enqueues a job in the `enrichment_jobs` collection. A pool of worker
+coroutines claims jobs with find_one_and_update (so several uvicorn workers
+can share the queue), calls the summarizer, and writes the AI fields back to
+the interaction. Claims are leases: a job whose worker died is picked up again
+once `leased_until` passes. Completed jobs are deleted. Failed attempts are
+retried with exponential backoff; after `max_attempts` the fallback payload
+is written, the interaction is marked "failed" and the job is kept for
+FAILED_JOB_RETENTION (a TTL index on `finished_at`, a BSON date) for inspection.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from llm_gateway import llm_deadline
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETE = "complete"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+FAILED_JOB_RETENTION = timedelta(days=30)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat()
+
+
+def enrichment_fields(result: dict) -> dict:
+    return {
+        "ai_summary": result.get("summary", ""),
+        "key_highlights": result.get("key_highlights", []),
+        "action_items": result.get("action_items", []),
+        "emotional_cues": result.get("emotional_cues", []),
+        "promises": result.get("promises", []),
+        "important_dates": result.get("important_dates", []),
+    }
+
+
+def _job(interaction_id: str, text: str, now: str) -> dict:
+    return {
+        "_id": interaction_id,
+        "interaction_id": interaction_id,
+        "text": text,
+        "status": PENDING,
+        "attempts": 0,
+        "available_at": now,
+        "leased_until": None,
+        "last_error": None,
+        "created_at": now,
+    }
+
+
+async def enqueue_enrichment(db, interaction_id: str, text: str):
+    await db.enrichment_jobs.insert_one(_job(interaction_id, text, _iso(datetime.now(timezone.utc))))
+
+
+async def enqueue_enrichments(db, items: List[Tuple[str, str]]):
+    """Bulk enqueue (interaction_id, text) pairs; jobs that already exist are left alone."""
+    if not items:
+        return
+    now = _iso(datetime.now(timezone.utc))
+    try:
+        await db.enrichment_jobs.insert_many([_job(i, text, now) for i, text in items], ordered=False)
+    except BulkWriteError:
+        pass
+
+
+class EnrichmentWorker:
+    def __init__(
+        self,
+        db,
+        summarize: Callable[[str], Awaitable[dict]],
+        fallback: Callable[[str], dict],
+        concurrency: int = 4,
+        max_attempts: int = 3,
+        lease_seconds: float = 120,
+        poll_seconds: float = 5,
+    ):
+        self.db = db
+        self.summarize = summarize
+        self.fallback = fallback
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+
+    def notify(self):
+        """Wake idle workers now instead of at their next poll."""
+        self._wake.set()
+
+    def start(self) -> List[asyncio.Task]:
+        return [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                job = await self.claim()
+                if job:
+                    await self.process(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Enrichment worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await self.db.enrichment_jobs.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "available_at": {"$lte": _iso(now)}},
+                {"status": RUNNING, "leased_until": {"$lt": _iso(now)}},
+            ]},
+            {"$set": {"status": RUNNING, "leased_until": _iso(now + timedelta(seconds=self.lease_seconds))}, "$inc": {"attempts": 1}},
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def process(self, job: dict):
+        try:
+            # Never outlive the lease, or a second worker would pick the job up mid-call.
+            with llm_deadline(self.lease_seconds * 0.9):
+                result = await self.summarize(job["text"])
+        except Exception as e:
+            logger.warning(f"Enrichment attempt {job['attempts']} failed for {job['interaction_id']}: {e}")
+            if job["attempts"] < self.max_attempts:
+                retry_at = datetime.now(timezone.utc) + timedelta(seconds=2 ** job["attempts"])
+                await self.db.enrichment_jobs.update_one(
+                    {"_id": job["_id"]},
+                    {"$set": {"status": PENDING, "available_at": _iso(retry_at), "leased_until": None, "last_error": str(e)}},
+                )
+                return
+            await self._finish(job, self.fallback(job["text"]), FAILED, str(e))
+            return
+        await self._finish(job, result, COMPLETE)
+
+    async def _finish(self, job: dict, result: dict, status: str, error: Optional[str] = None):
+        await self.db.interactions.update_one(
+            {"id": job["interaction_id"]},
+            {"$set": {**enrichment_fields(result), "enrichment_status": status}},
+        )
+        if status == COMPLETE:
+            await self.db.enrichment_jobs.delete_one({"_id": job["_id"]})
+            return
+        # Failed jobs stay behind for inspection until the TTL index removes them.
+        await self.db.enrichment_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": status, "leased_until": None, "last_error": error, "finished_at": utcnow()}},
+        )
@@ -0,0 +1,133 @@
+"""Streaming data export.
+
+Collections are read with Motor cursors in `EXPORT_BATCH_SIZE` batches, sorted
+on the unique `id` index, and written out as they are read, so an export runs
+in constant memory however much data there is.
+
+Two formats:
+
+  * `json` - the original single object
+    ({"contacts": [...], "interactions": [...], "goals": [...], "settings": ..., "exported_at": ...}),
+    now streamed and without the old row caps.
+  * `ndjson` - one record per line:
+
+        {"type": "header", "version": 1, "exported_at": "...", "resumed_from": null}
+        {"type": "settings", "data": {...}}
+        {"type": "contact", "data": {...}}
+        {"type": "checkpoint", "resume": "<token>"}
+        ...
+        {"type": "end", "counts": {"contact": 120, "interaction": 4000, "goal": 3}}
+
+    A checkpoint line is written every CHECKPOINT_EVERY records. Passing its
+    token back as `resume` continues the export right after the last record
+    written before it, so an interrupted download does not start over.
+
+Either format can be gzip-compressed on the fly.
+"""
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, Tuple
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+EXPORT_BATCH_SIZE = 500
+CHECKPOINT_EVERY = 1000
+FLUSH_BYTES = 64 * 1024
+
+# (collection, ndjson record type)
+SECTIONS = [("contacts", "contact"), ("interactions", "interaction"), ("goals", "goal")]
+_CHECKPOINT_KEY = [("section", 1), ("id", 1)]
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_checkpoint(section: str, last_id: str) -> str:
+    return encode_cursor({"section": section, "id": last_id}, _CHECKPOINT_KEY)
+
+
+def decode_checkpoint(token: str) -> Tuple[str, str]:
+    """Raises pagination.InvalidCursor on a malformed or foreign token."""
+    section, last_id = decode_cursor(token, _CHECKPOINT_KEY)
+    if not isinstance(section, str) or not isinstance(last_id, str):
+        raise InvalidCursor("export checkpoint must hold a section name and an id")
+    if section not in {name for name, _ in SECTIONS}:
+        raise InvalidCursor(f"unknown export section {section!r}")
+    return section, last_id
+
+
+def _section(db, name: str, after_id: Optional[str] = None):
+    query = {"id": {"$gt": after_id}} if after_id is not None else {}
+    return db[name].find(query, {"_id": 0}).sort("id", 1).batch_size(EXPORT_BATCH_SIZE)
+
+
+async def iter_records(db, resume: Optional[Tuple[str, str]] = None) -> AsyncIterator[Tuple[str, dict]]:
+    """(collection, document) for every exported document, in (section, id) order, after `resume`."""
+    names = [name for name, _ in SECTIONS]
+    start = names.index(resume[0]) if resume else 0
+    for name in names[start:]:
+        async for doc in _section(db, name, resume[1] if resume and name == resume[0] else None):
+            yield name, doc
+
+
+async def _settings(db) -> Optional[dict]:
+    return await db.settings.find_one({"id": "default"}, {"_id": 0})
+
+
+async def ndjson_chunks(db, resume: Optional[str] = None) -> AsyncIterator[str]:
+    position = decode_checkpoint(resume) if resume else None
+    record_type = dict(SECTIONS)
+    counts = {kind: 0 for _, kind in SECTIONS}
+
+    lines = [_dumps({"type": "header", "version": 1, "exported_at": datetime.now(timezone.utc).isoformat(), "resumed_from": resume})]
+    if not position:
+        lines.append(_dumps({"type": "settings", "data": await _settings(db)}))
+    size = sum(len(line) for line in lines)
+    written = 0
+    async for name, doc in iter_records(db, position):
+        line = _dumps({"type": record_type[name], "data": doc})
+        lines.append(line)
+        size += len(line)
+        counts[record_type[name]] += 1
+        written += 1
+        if written % CHECKPOINT_EVERY == 0:
+            lines.append(_dumps({"type": "checkpoint", "resume": encode_checkpoint(name, doc["id"])}))
+        if size >= FLUSH_BYTES:
+            yield "\n".join(lines) + "\n"
+            lines, size = [], 0
+    lines.append(_dumps({"type": "end", "counts": counts}))
+    yield "\n".join(lines) + "\n"
+
+
+async def json_chunks(db) -> AsyncIterator[str]:
+    """The legacy export object, written incrementally."""
+    buffer = "{"
+    for name, _ in SECTIONS:
+        buffer += f'"{name}":['
+        first = True
+        async for doc in _section(db, name):
+            buffer += ("" if first else ",") + _dumps(doc)
+            first = False
+            if len(buffer) >= FLUSH_BYTES:
+                yield buffer
+                buffer = ""
+        buffer += "],"
+    buffer += f'"settings":{_dumps(await _settings(db))},"exported_at":{_dumps(datetime.now(timezone.utc).isoformat())}}}'
+    yield buffer
+
+
+async def gzip_chunks(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
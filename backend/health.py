@@ -0,0 +1,132 @@
+"""Connection health as MongoDB aggregation stages.
+
+Mirrors server.calc_connection_health so routes can compute, filter and sort on
+health inside the database and only ship the rows they need:
+
+    health = clamp(0, 100, (1 - days_since_last_interaction / frequency_days) * 100)
+
+Contacts that have never been contacted (or have an unparsable timestamp or a
+non-positive frequency) score 0.
+
+Health only changes with time between writes, so each contact also stores when
+it crosses the thresholds that matter, maintained on every write that moves them:
+
+    due_at       = last_interaction_at + frequency_days               (health 0)
+    attention_at = last_interaction_at + frequency_days * (1 - REMINDER_BELOW / 100)
+
+(both are `created_at` for a contact that was never contacted). Every contact
+with health below REMINDER_BELOW has `attention_at <= now`, so reminder queries
+start with an indexed range scan on (is_archived, attention_at) and compute exact
+health only for those candidates.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from timestamps import as_datetime, date_expr
+
+DAY_MS = 86400000
+# The loosest reminder threshold; stricter ones (low-pressure mode) are subsets.
+REMINDER_BELOW = 40
+
+_LAST = date_expr("last_interaction_at")
+_FREQ = {"$ifNull": ["$frequency_days", 7]}
+
+
+def _elapsed_days(now: datetime) -> dict:
+    return {"$divide": [{"$subtract": [now, _LAST]}, DAY_MS]}
+
+
+def health_expr(now: datetime) -> dict:
+    raw = {"$multiply": [{"$subtract": [1, {"$divide": [_elapsed_days(now), _FREQ]}]}, 100]}
+    return {
+        "$cond": [
+            {"$or": [{"$eq": [_LAST, None]}, {"$lte": [_FREQ, 0]}]},
+            0.0,
+            {"$round": [{"$max": [0.0, {"$min": [100.0, raw]}]}, 1]},
+        ]
+    }
+
+
+def days_since_expr(now: datetime) -> dict:
+    """Fractional days since the last interaction, null when there is none."""
+    return {"$cond": [{"$eq": [_LAST, None]}, None, _elapsed_days(now)]}
+
+
+def days_overdue_expr(now: datetime) -> dict:
+    return {
+        "$cond": [
+            {"$eq": [_LAST, None]},
+            0,
+            {"$max": [0, {"$trunc": {"$subtract": [_elapsed_days(now), _FREQ]}}]},
+        ]
+    }
+
+
+def health_stages(now: datetime, with_overdue: bool = False) -> List[dict]:
+    """$addFields stage that (re)computes `connection_health` (and optionally `days_overdue`)."""
+    fields = {"connection_health": health_expr(now)}
+    if with_overdue:
+        fields["days_overdue"] = days_overdue_expr(now)
+    return [{"$addFields": fields}]
+
+
+def health_pipeline(
+    match: dict,
+    now: datetime,
+    below: Optional[float] = None,
+    sort: Optional[dict] = None,
+    limit: Optional[int] = None,
+    project: Optional[dict] = None,
+    with_overdue: bool = False,
+) -> List[dict]:
+    """match -> health -> optional health filter -> sort -> limit -> project (`_id` always dropped)."""
+    pipeline = [{"$match": match}, *health_stages(now, with_overdue)]
+    if below is not None:
+        pipeline.append({"$match": {"connection_health": {"$lt": below}}})
+    if sort:
+        pipeline.append({"$sort": sort})
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": {**(project or {}), "_id": 0}})
+    return pipeline
+
+
+def due_fields(last_interaction_at, frequency_days: Optional[int], created_at) -> dict:
+    """due_at / attention_at for a contact document built in Python."""
+    last = as_datetime(last_interaction_at)
+    if last is None:
+        created = as_datetime(created_at)
+        return {"due_at": created, "attention_at": created}
+    days = max(frequency_days if frequency_days is not None else 7, 0)
+    return {
+        "due_at": last + timedelta(days=days),
+        "attention_at": last + timedelta(days=days * (1 - REMINDER_BELOW / 100)),
+    }
+
+
+def due_stage() -> dict:
+    """Update-pipeline / $merge stage recomputing due_at and attention_at from the document itself."""
+    period = {"$multiply": [{"$max": [_FREQ, 0]}, DAY_MS]}
+    never = {"$eq": [_LAST, None]}
+    created = date_expr("created_at")
+    return {"$set": {
+        "due_at": {"$cond": [never, created, {"$add": [_LAST, period]}]},
+        "attention_at": {"$cond": [never, created, {"$add": [_LAST, {"$multiply": [period, 1 - REMINDER_BELOW / 100]}]}]},
+    }}
+
+
+def due_update(fields: dict, expressions: Optional[dict] = None) -> List[dict]:
+    """Pipeline update: set `fields` (taken literally) and `expressions`, then recompute the due fields."""
+    values = {k: {"$literal": v} for k, v in fields.items()}
+    return [{"$set": {**values, **(expressions or {})}}, due_stage()]
+
+
+def attention_filter(now: datetime) -> dict:
+    """Non-archived contacts that may be below REMINDER_BELOW (index: is_archived, attention_at)."""
+    return {"is_archived": False, "attention_at": {"$lte": now}}
+
+
+async def backfill_due_fields(db) -> int:
+    """Compute the due fields for contacts written before they existed."""
+    result = await db.contacts.update_many({"attention_at": {"$exists": False}}, [due_stage()])
+    return result.modified_count
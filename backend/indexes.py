@@ -0,0 +1,155 @@
+"""Declarative MongoDB index registry for the Touch API.
+
+Every query shape the routes in server.py issue should be backed by an entry
+here. `ensure_indexes` applies the registry on startup and `index_report`
+compares it against what the server actually has, so a new route that adds
+a query without an index shows up as "missing" (or its old index as "unused").
+
+CLI:  python indexes.py            # print the report
+      python indexes.py --apply    # create missing indexes, then report
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from enrichment import FAILED_JOB_RETENTION
+
+logger = logging.getLogger(__name__)
+
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "contacts": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # get_contacts / dashboard / reminders filter on is_archived, sort on is_pinned,
+        # and optionally narrow by tag; the widget filters on (is_archived, is_pinned).
+        IndexModel([("is_archived", ASCENDING), ("is_pinned", DESCENDING), ("relationship_tag", ASCENDING)]),
+        # keyset pages of /contacts/page (see pagination.CONTACTS_SORT), with and without a tag.
+        IndexModel([("is_archived", ASCENDING), ("is_pinned", DESCENDING), ("name", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("is_archived", ASCENDING), ("relationship_tag", ASCENDING), ("is_pinned", DESCENDING), ("name", ASCENDING), ("_id", ASCENDING)]),
+        # reminders and push reminders: contacts past their attention threshold (see health.py).
+        IndexModel([("is_archived", ASCENDING), ("attention_at", ASCENDING)]),
+    ],
+    "interactions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # get_interactions(_page), call prep, prompts and calendar suggestions.
+        IndexModel([("contact_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # weekly / monthly counts on the dashboard.
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "goals": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "shared_invites": [
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "orders": [
+        IndexModel([("order_id", ASCENDING)], unique=True),
+    ],
+    "subscriptions": [
+        IndexModel([("status", ASCENDING), ("started_at", DESCENDING)]),
+    ],
+    "enrichment_jobs": [
+        # EnrichmentWorker.claim: due pending jobs, and running jobs with an expired lease.
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("leased_until", ASCENDING)]),
+        # failed jobs are kept for inspection, then removed FAILED_JOB_RETENTION after finished_at.
+        IndexModel(
+            [("finished_at", ASCENDING)],
+            expireAfterSeconds=int(FAILED_JOB_RETENTION.total_seconds()),
+            partialFilterExpression={"status": "failed"},
+        ),
+    ],
+    "llm_cache": [
+        # per-entry expiry: documents are removed once expires_at has passed.
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "push_tokens": [
+        IndexModel([("token", ASCENDING)], unique=True),
+    ],
+    "push_tickets": [
+        # ReceiptPoller.claim: pending tickets whose receipt check is due.
+        IndexModel([("status", ASCENDING), ("check_after", ASCENDING)]),
+        # delivery log retention: tickets are removed once expires_at has passed.
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "dead_push_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "transcripts": [
+        # transcript cache (see transcript_cache.py): entries are removed once expires_at has passed.
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "reminder_deliveries": [
+        # ReminderScheduler: each device's reminders still within their cooldown.
+        IndexModel([("token", ASCENDING), ("expires_at", ASCENDING)]),
+        # per-(device, contact) reminder cooldown: entries are removed once expires_at has passed.
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+
+def _key(spec) -> tuple:
+    return tuple((field, int(direction)) for field, direction in spec)
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every registered index. Failures are logged per collection so one bad
+    collection (e.g. duplicates blocking a unique index) does not stop startup."""
+    created = {}
+    for collection, models in INDEX_REGISTRY.items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Index creation failed for {collection}: {e}")
+            created[collection] = []
+    return created
+
+
+async def index_report(db) -> dict:
+    """Per collection: registered indexes that are missing, indexes present on the
+    server but not registered, and indexes with zero recorded accesses."""
+    report = {}
+    for collection, models in INDEX_REGISTRY.items():
+        declared = {_key(m.document["key"].items()): m.document["name"] for m in models}
+        existing = await db[collection].index_information()
+        existing_keys = {_key(info["key"]): name for name, info in existing.items()}
+
+        usage = {}
+        try:
+            async for stat in db[collection].aggregate([{"$indexStats": {}}]):
+                usage[stat["name"]] = stat.get("accesses", {}).get("ops", 0)
+        except OperationFailure as e:
+            logger.warning(f"$indexStats unavailable for {collection}: {e}")
+
+        report[collection] = {
+            "missing": [name for key, name in declared.items() if key not in existing_keys],
+            "unregistered": [name for key, name in existing_keys.items() if key not in declared and name != "_id_"],
+            "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+            "usage": usage,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import asyncio
+    import json
+    import os
+    import sys
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        db = client[os.environ['DB_NAME']]
+        if "--apply" in sys.argv:
+            await ensure_indexes(db)
+        print(json.dumps(await index_report(db), indent=2))
+        client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Content-addressed cache for LLM responses.
+
+Keys are a SHA-256 of (system prompt, provider, model, user message), so a
+response is reused exactly when the model would be asked the same thing again.
+Lookups go through an in-process LRU first and then the `llm_cache`
+collection, whose TTL index on `expires_at` lets MongoDB drop stale entries.
+(`expires_at` is a native BSON date - TTL indexes ignore strings.)
+
+Only raw successful responses are cached; fallbacks never are.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+ENDPOINT_TTL_SECONDS: Dict[str, int] = {
+    "summarize": 30 * 86400,     # same notes, same summary
+    "summarize_batch": 30 * 86400,
+    "call_prep": 6 * 3600,
+    "prompts": 6 * 3600,
+    "insights": 3600,
+    "calendar": 86400,
+}
+
+
+def cache_key(system_message: str, provider: str, model: str, user_message: str) -> str:
+    raw = json.dumps([system_message, provider, model, user_message], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class LlmCache:
+    def __init__(self, db, max_entries: int = 1024, ttls: Optional[Dict[str, int]] = None):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttls = {**ENDPOINT_TTL_SECONDS, **(ttls or {})}
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = defaultdict(lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0, "writes": 0})
+
+    def ttl(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint, DEFAULT_TTL_SECONDS)
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._lru[key] = (value, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get(self, endpoint: str, key: str) -> Optional[str]:
+        stats = self._stats[endpoint]
+        entry = self._lru.get(key)
+        if entry:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._lru.move_to_end(key)
+                stats["l1_hits"] += 1
+                return value
+            del self._lru[key]
+
+        # TTL monitor runs about once a minute, so filter on expiry here as well.
+        doc = await self.db.llm_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        if doc:
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            self._remember(key, doc["response"], expires_at.timestamp())
+            stats["l2_hits"] += 1
+            return doc["response"]
+
+        stats["misses"] += 1
+        return None
+
+    async def set(self, endpoint: str, key: str, value: str):
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(seconds=self.ttl(endpoint))
+        self._remember(key, value, expires_at.timestamp())
+        await self.db.llm_cache.update_one(
+            {"_id": key},
+            {"$set": {"endpoint": endpoint, "response": value, "created_at": now, "expires_at": expires_at}},
+            upsert=True,
+        )
+        self._stats[endpoint]["writes"] += 1
+
+    def stats(self) -> dict:
+        endpoints = {}
+        for endpoint, s in self._stats.items():
+            lookups = s["l1_hits"] + s["l2_hits"] + s["misses"]
+            endpoints[endpoint] = {
+                **s,
+                "hit_rate": round((s["l1_hits"] + s["l2_hits"]) / lookups, 3) if lookups else 0.0,
+            }
+        return {"l1_entries": len(self._lru), "l1_capacity": self.max_entries, "endpoints": endpoints}
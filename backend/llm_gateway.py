@@ -0,0 +1,423 @@
+"""Single entry point for every LLM call the API makes.
+
+    response = await llm.complete("call_prep", system_message, prompt)
+    data = extract_json(response)
+
+`LlmGateway.complete` layers, in order:
+  * the response cache (hits skip everything below). Only responses that pass
+    `validate` (by default `extract_json`) are stored, so an unparsable reply
+    is not replayed for the cache TTL - the next call asks the model again,
+  * a circuit breaker - after `failure_threshold` consecutive provider failures
+    calls fail fast with LlmUnavailable for `cooldown_seconds`, then one trial
+    call is let through,
+  * a global and a per-endpoint semaphore,
+  * a timeout: the endpoint's budget, capped by any deadline set further up the
+    call stack with `llm_deadline(...)` (time spent queueing counts against it).
+
+Callers already catch exceptions and return their fallback payloads, so an
+open breaker or an exhausted deadline degrades to those fallbacks immediately
+instead of stacking up coroutines behind a slow provider.
+
+`LlmGateway.stream` applies the same layers but yields the response text as
+it is generated (a cache hit yields the stored response in one piece). The
+timeout then bounds the whole stream, not just the first chunk.
+
+Providers are pluggable: `EmergentProvider` talks to Gemini through
+emergentintegrations, `GeminiProvider` calls the Gemini API directly with
+google-genai and can stream, `StubProvider` returns canned payloads for tests
+and benchmarks (set LLM_BACKEND=stub). Providers without a `stream` method
+deliver their whole response as a single chunk.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+
+from llm_cache import LlmCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class LlmUnavailable(Exception):
+    """Breaker open, deadline exhausted or provider timed out."""
+
+
+# ===================== JSON =====================
+
+def extract_json(text: str):
+    """Parse the JSON payload out of a model response: tolerates markdown fences and
+    prose around the payload. Raises ValueError when there is no JSON to be found."""
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
+        if cleaned.endswith("```"):
+            cleaned = cleaned[:-3]
+        cleaned = cleaned.strip()
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    decoder = json.JSONDecoder()
+    for i, ch in enumerate(cleaned):
+        if ch in "{[":
+            try:
+                value, _ = decoder.raw_decode(cleaned, i)
+                return value
+            except json.JSONDecodeError:
+                continue
+    raise ValueError("no JSON object in response")
+
+
+# ===================== DEADLINES =====================
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def llm_deadline(seconds: float):
+    """Bound every LLM call made inside the block to finish within `seconds` from now.
+    Nested deadlines can only shorten the outer one."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(min(deadline, outer) if outer is not None else deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+# ===================== CIRCUIT BREAKER =====================
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_skipped(self):
+        """The call never reached the provider (e.g. timed out while queued); it says nothing about health."""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+# ===================== PROVIDERS =====================
+
+class EmergentProvider:
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-3-flash-preview"):
+        self.api_key = api_key
+        self.model = model
+
+    async def complete(self, endpoint: str, system_message: str, text: str) -> str:
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        chat = LlmChat(api_key=self.api_key, session_id=f"{endpoint}-{uuid.uuid4()}", system_message=system_message)
+        chat.with_model(self.name, self.model)
+        return await chat.send_message(UserMessage(text=text))
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-3-flash-preview"):
+        from google import genai
+        self.client = genai.Client(api_key=api_key)
+        self.model = model
+
+    def _config(self, system_message: str):
+        from google.genai import types
+        return types.GenerateContentConfig(system_instruction=system_message)
+
+    async def complete(self, endpoint: str, system_message: str, text: str) -> str:
+        response = await self.client.aio.models.generate_content(model=self.model, contents=text, config=self._config(system_message))
+        return response.text or ""
+
+    async def stream(self, endpoint: str, system_message: str, text: str) -> AsyncIterator[str]:
+        chunks = await self.client.aio.models.generate_content_stream(model=self.model, contents=text, config=self._config(system_message))
+        async for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+
+STUB_RESPONSES: Dict[str, dict] = {
+    "summarize": {"summary": "A warm conversation covering recent updates.", "key_highlights": ["Caught up on recent news"],
+                  "action_items": [], "emotional_cues": ["warm"], "promises": [], "important_dates": []},
+    "call_prep": {"recap": "You last caught up about their week.", "follow_ups": ["Ask how the week went"], "important_dates": [],
+                  "conversation_starters": ["How have you been?"], "emotional_note": "Keep it light and warm."},
+    "insights": {"overall_insight": "Your connections are steady.", "encouragement": "You're doing great!"},
+    "prompts": ["How have you been?", "What's new?", "Any plans this weekend?", "What made you smile lately?", "How's work?"],
+    "calendar": {"suggested_times": [{"day": "Saturday", "time": "10:00 AM", "reason": "Weekend mornings are usually free"}],
+                 "best_duration": 15, "availability_tip": "Short, frequent calls often feel better than long ones."},
+}
+
+
+class StubProvider:
+    """Deterministic local provider. `handler(endpoint, system_message, text)` overrides the canned payloads."""
+    name = "stub"
+
+    def __init__(self, latency_seconds: float = 0.0, handler: Optional[Callable[[str, str, str], str]] = None):
+        self.model = "stub"
+        self.latency_seconds = latency_seconds
+        self.handler = handler
+
+    async def complete(self, endpoint: str, system_message: str, text: str) -> str:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.handler:
+            return self.handler(endpoint, system_message, text)
+        if endpoint == "summarize_batch":
+            return json.dumps([{"index": item["index"], **STUB_RESPONSES["summarize"]} for item in extract_json(text)])
+        return json.dumps(STUB_RESPONSES.get(endpoint, {}))
+
+    async def stream(self, endpoint: str, system_message: str, text: str, chunk_size: int = 24) -> AsyncIterator[str]:
+        response = await self.complete(endpoint, system_message, text)
+        for i in range(0, len(response), chunk_size):
+            yield response[i:i + chunk_size]
+            await asyncio.sleep(0)
+
+
+def make_provider(backend: str, api_key: str, stub_latency_seconds: float = 0.0, gemini_api_key: str = ""):
+    if backend == "stub":
+        return StubProvider(latency_seconds=stub_latency_seconds)
+    if backend == "gemini":
+        return GeminiProvider(gemini_api_key)
+    return EmergentProvider(api_key)
+
+
+# ===================== GATEWAY =====================
+
+async def _single_chunk(response) -> AsyncIterator[str]:
+    yield await response
+
+
+DEFAULT_TIMEOUTS: Dict[str, float] = {"summarize": 60, "summarize_batch": 90}
+# Each endpoint's share of the global pool, so a burst on one cannot take every slot.
+# Unlisted endpoints get UNLISTED_ENDPOINT_LIMIT; every limit is capped at max_concurrency.
+DEFAULT_ENDPOINT_LIMITS: Dict[str, int] = {
+    "summarize": 4,
+    "summarize_batch": 4,
+    "call_prep": 6,      # interactive, and the brief prefetcher
+    "prompts": 4,
+    "insights": 2,       # one digest for the whole account
+    "calendar": 2,
+}
+UNLISTED_ENDPOINT_LIMIT = 2
+
+
+def parse_endpoint_limits(spec: str) -> Dict[str, int]:
+    """Parse LLM_ENDPOINT_LIMITS: `call_prep=8,insights=1` -> {"call_prep": 8, "insights": 1}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, value = item.partition("=")
+        limits[endpoint.strip()] = int(value)
+    return limits
+
+
+class LlmGateway:
+    def __init__(
+        self,
+        provider,
+        cache: Optional[LlmCache] = None,
+        max_concurrency: int = 16,
+        endpoint_limits: Optional[Dict[str, int]] = None,
+        default_timeout: float = 20,
+        timeouts: Optional[Dict[str, float]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.provider = provider
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.endpoint_limits = {**DEFAULT_ENDPOINT_LIMITS, **(endpoint_limits or {})}
+        self.default_timeout = default_timeout
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.breaker = breaker or CircuitBreaker()
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._endpoint: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight = 0
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        if endpoint not in self._endpoint:
+            limit = self.endpoint_limits.get(endpoint, UNLISTED_ENDPOINT_LIMIT)
+            self._endpoint[endpoint] = asyncio.Semaphore(max(1, min(limit, self.max_concurrency)))
+        return self._endpoint[endpoint]
+
+    def _budget(self, endpoint: str) -> Tuple[float, bool]:
+        """(seconds left for this call, whether a caller deadline rather than the endpoint timeout set it)"""
+        budget = self.timeouts.get(endpoint, self.default_timeout)
+        deadline = _deadline.get()
+        if deadline is not None and deadline - time.monotonic() < budget:
+            return deadline - time.monotonic(), True
+        return budget, False
+
+    async def _cache_valid(self, endpoint: str, key: str, response: str, validate: Optional[Callable[[str], object]]):
+        if validate is not None:
+            try:
+                validate(response)
+            except ValueError as e:
+                logger.warning(f"LLM {endpoint} response not cached: {e}")
+                return
+        await self.cache.set(endpoint, key, response)
+
+    async def complete(
+        self, endpoint: str, system_message: str, text: str, validate: Optional[Callable[[str], object]] = extract_json,
+    ) -> str:
+        key = cache_key(system_message, self.provider.name, self.provider.model, text)
+        if self.cache:
+            cached = await self.cache.get(endpoint, key)
+            if cached is not None:
+                return cached
+
+        budget, caller_bound = self._budget(endpoint)
+        if budget <= 0:
+            raise LlmUnavailable(f"deadline exhausted before {endpoint} call")
+        if not self.breaker.allow():
+            raise LlmUnavailable(f"circuit open, skipping {endpoint} call")
+
+        start = time.monotonic()
+        reached_provider = []
+        try:
+            response = await asyncio.wait_for(self._call(endpoint, system_message, text, reached_provider), timeout=budget)
+        except asyncio.TimeoutError:
+            # Only a provider that blew its own timeout counts against it, not a caller's tight deadline.
+            if reached_provider and not caller_bound:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_skipped()
+            raise LlmUnavailable(f"{endpoint} call exceeded {budget:.1f}s")
+        except asyncio.CancelledError:
+            # The caller went away; that says nothing about the provider, but a half-open trial must end.
+            self.breaker.record_skipped()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        logger.debug(f"LLM {endpoint} took {time.monotonic() - start:.2f}s")
+
+        if self.cache:
+            await self._cache_valid(endpoint, key, response, validate)
+        return response
+
+    async def stream(
+        self, endpoint: str, system_message: str, text: str, validate: Optional[Callable[[str], object]] = extract_json,
+    ) -> AsyncIterator[str]:
+        key = cache_key(system_message, self.provider.name, self.provider.model, text)
+        if self.cache:
+            cached = await self.cache.get(endpoint, key)
+            if cached is not None:
+                yield cached
+                return
+
+        budget, caller_bound = self._budget(endpoint)
+        if budget <= 0:
+            raise LlmUnavailable(f"deadline exhausted before {endpoint} stream")
+        if not self.breaker.allow():
+            raise LlmUnavailable(f"circuit open, skipping {endpoint} stream")
+
+        deadline = time.monotonic() + budget
+        try:
+            await asyncio.wait_for(self._acquire(endpoint), timeout=budget)
+        except asyncio.TimeoutError:
+            self.breaker.record_skipped()
+            raise LlmUnavailable(f"{endpoint} stream queued for more than {budget:.1f}s")
+        except asyncio.CancelledError:
+            self.breaker.record_skipped()
+            raise
+
+        parts = []
+        self._in_flight += 1
+        try:
+            if hasattr(self.provider, "stream"):
+                chunks = self.provider.stream(endpoint, system_message, text).__aiter__()
+            else:
+                chunks = _single_chunk(self.provider.complete(endpoint, system_message, text))
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    break
+                parts.append(chunk)
+                yield chunk
+        except asyncio.TimeoutError:
+            if caller_bound:
+                self.breaker.record_skipped()
+            else:
+                self.breaker.record_failure()
+            raise LlmUnavailable(f"{endpoint} stream exceeded {budget:.1f}s")
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away; that says nothing about the provider.
+            self.breaker.record_skipped()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._in_flight -= 1
+            self._release(endpoint)
+        self.breaker.record_success()
+
+        if self.cache:
+            await self._cache_valid(endpoint, key, "".join(parts), validate)
+
+    async def _acquire(self, endpoint: str):
+        await self._global.acquire()
+        try:
+            await self._semaphore(endpoint).acquire()
+        except BaseException:
+            self._global.release()
+            raise
+
+    def _release(self, endpoint: str):
+        self._semaphore(endpoint).release()
+        self._global.release()
+
+    async def _call(self, endpoint: str, system_message: str, text: str, reached_provider: list) -> str:
+        async with self._global, self._semaphore(endpoint):
+            reached_provider.append(True)
+            self._in_flight += 1
+            try:
+                return await self.provider.complete(endpoint, system_message, text)
+            finally:
+                self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "model": self.provider.model,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "breaker": {"state": self.breaker.state, "consecutive_failures": self.breaker.failures},
+        }
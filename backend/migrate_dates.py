@@ -0,0 +1,148 @@
+"""Convert ISO-string timestamps to native BSON dates, in place and online.
+
+Walks every collection in timestamps.TIMESTAMP_FIELDS in `_id` order,
+BATCH_SIZE documents at a time, and rewrites the string timestamps of each
+batch with one unordered bulk write. Each update is conditional on the field
+still holding the string that was read, so a write the API makes meanwhile
+(which already stores a date) is never overwritten; the API reads both forms,
+so it keeps serving throughout.
+
+Progress is checkpointed per collection in the `migrations` collection after
+every batch, so an interrupted run picks up where it stopped. Strings that do
+not parse are left alone and counted. Until a collection is done, sorting on a
+timestamp can interleave converted and unconverted documents imperfectly
+(MongoDB orders every string before every date).
+
+CLI:  python migrate_dates.py                      # migrate all collections
+      python migrate_dates.py --collection contacts
+      python migrate_dates.py --status             # show progress only
+      python migrate_dates.py --restart            # forget checkpoints and walk everything again
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from timestamps import TIMESTAMP_FIELDS, as_datetime, utcnow
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+MIGRATION = "bson_dates"
+
+
+def _checkpoint_id(collection: str) -> str:
+    return f"{MIGRATION}:{collection}"
+
+
+def batch_updates(docs: List[dict], fields: List[str]) -> tuple:
+    """(UpdateOne list, unparsable count) for the string timestamps in `docs`."""
+    updates, unparsable = [], 0
+    for doc in docs:
+        converted = {}
+        for field in fields:
+            value = doc.get(field)
+            if not isinstance(value, str):
+                continue
+            dt = as_datetime(value)
+            if dt is None:
+                unparsable += 1
+                continue
+            converted[field] = (value, dt)
+        if converted:
+            query = {"_id": doc["_id"], **{field: old for field, (old, _) in converted.items()}}
+            updates.append(UpdateOne(query, {"$set": {field: dt for field, (_, dt) in converted.items()}}))
+    return updates, unparsable
+
+
+async def migrate_collection(db, collection: str, fields: List[str], batch_size: int = BATCH_SIZE, pause: float = 0.0) -> dict:
+    """Convert one collection from its checkpoint onwards; returns the final checkpoint document."""
+    checkpoints = db.migrations
+    state = await checkpoints.find_one({"_id": _checkpoint_id(collection)}) or {}
+    if state.get("done"):
+        return state
+    last_id = state.get("last_id")
+    counts = {key: state.get(key, 0) for key in ("scanned", "converted", "unparsable")}
+
+    projection = {field: 1 for field in fields}
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = await db[collection].find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        updates, unparsable = batch_updates(docs, fields)
+        if updates:
+            result = await db[collection].bulk_write(updates, ordered=False)
+            counts["converted"] += result.modified_count
+        counts["scanned"] += len(docs)
+        counts["unparsable"] += unparsable
+        last_id = docs[-1]["_id"]
+        await checkpoints.update_one(
+            {"_id": _checkpoint_id(collection)},
+            {"$set": {"last_id": last_id, **counts, "updated_at": utcnow()}},
+            upsert=True,
+        )
+        if pause:
+            await asyncio.sleep(pause)
+
+    done = {"done": True, **counts, "finished_at": utcnow()}
+    await checkpoints.update_one({"_id": _checkpoint_id(collection)}, {"$set": done}, upsert=True)
+    logger.info(f"{collection}: {counts}")
+    return {"_id": _checkpoint_id(collection), "last_id": last_id, **done}
+
+
+async def migrate(db, collections: Optional[List[str]] = None, batch_size: int = BATCH_SIZE, pause: float = 0.0) -> Dict[str, dict]:
+    results = {}
+    for collection, fields in TIMESTAMP_FIELDS.items():
+        if collections and collection not in collections:
+            continue
+        results[collection] = await migrate_collection(db, collection, fields, batch_size, pause)
+    return results
+
+
+async def status(db) -> Dict[str, dict]:
+    docs = await db.migrations.find({"_id": {"$regex": f"^{MIGRATION}:"}}).to_list(None)
+    by_collection = {doc["_id"].split(":", 1)[1]: doc for doc in docs}
+    return {
+        collection: {key: by_collection.get(collection, {}).get(key, 0) for key in ("done", "scanned", "converted", "unparsable")}
+        for collection in TIMESTAMP_FIELDS
+    }
+
+
+async def restart(db, collections: Optional[List[str]] = None):
+    names = collections or list(TIMESTAMP_FIELDS)
+    await db.migrations.delete_many({"_id": {"$in": [_checkpoint_id(name) for name in names]}})
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+    async def main():
+        parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+        parser.add_argument("--collection", action="append", choices=sorted(TIMESTAMP_FIELDS))
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--pause-ms", type=float, default=0, help="sleep between batches to limit load")
+        parser.add_argument("--status", action="store_true")
+        parser.add_argument("--restart", action="store_true")
+        args = parser.parse_args()
+
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+        db = client[os.environ['DB_NAME']]
+        if args.restart:
+            await restart(db, args.collection)
+        if not args.status:
+            await migrate(db, args.collection, args.batch_size, args.pause_ms / 1000)
+        print(json.dumps(await status(db), indent=2, default=str))
+        client.close()
+
+    asyncio.run(main())
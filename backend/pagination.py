@@ -0,0 +1,118 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is the sort-key values of the last row of a page, JSON-encoded and
+base64url'd so clients treat it as opaque. The next page is fetched with a
+range predicate on those values instead of skip(), so every page costs one
+index seek no matter how deep the client has scrolled.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SortSpec = List[Tuple[str, int]]
+
+CONTACTS_SORT: SortSpec = [("is_pinned", -1), ("name", 1), ("_id", 1)]
+INTERACTIONS_SORT: SortSpec = [("created_at", -1), ("_id", -1)]
+
+# What a cursor may hold per sort field (anything else cannot have come from encode_cursor).
+# Timestamps not yet migrated to dates are ISO strings; see timestamps.py.
+_NONE = type(None)
+CURSOR_TYPES: Dict[str, tuple] = {
+    "is_pinned": (bool, _NONE),
+    "name": (str, _NONE),
+    "_id": (str,),
+    "created_at": (datetime, str, _NONE),
+}
+
+# BSON integers are signed 64-bit; pymongo cannot encode anything larger.
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    """A JSON scalar, or a datetime from {"$date": iso}. Anything else - notably an operator
+    document such as {"$ne": null} - would end up inside the query, so it is refused."""
+    if isinstance(value, int) and not isinstance(value, bool) and not _INT64[0] <= value <= _INT64[1]:
+        raise InvalidCursor("cursor integer out of range")
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict) and list(value) == ["$date"] and isinstance(value["$date"], str):
+        try:
+            return datetime.fromisoformat(value["$date"])
+        except ValueError as e:
+            raise InvalidCursor(str(e))
+    raise InvalidCursor("cursor values must be scalars or dates")
+
+
+def encode_cursor(doc: dict, sort: SortSpec) -> str:
+    values = [_encode_value(doc.get(field)) for field, _ in sort]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: SortSpec) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursor("cursor does not match sort order")
+    decoded = [_decode_value(v) for v in values]
+    for (field, _), value in zip(sort, decoded):
+        if field in CURSOR_TYPES and not isinstance(value, CURSOR_TYPES[field]):
+            raise InvalidCursor(f"cursor value for {field} has the wrong type")
+    return decoded
+
+
+def _after(field: str, direction: int, value) -> dict:
+    if isinstance(value, datetime) and direction == -1:
+        # Timestamps not yet migrated to dates (see timestamps.py) are ISO strings,
+        # which MongoDB sorts before every date - i.e. after it when descending.
+        return {"$or": [{field: {"$lt": value}}, {field: {"$type": "string"}}]}
+    return {field: {"$gt" if direction == 1 else "$lt": value}}
+
+
+def keyset_filter(sort: SortSpec, values: list) -> dict:
+    """Rows strictly after `values` in `sort` order:
+    (a > x) or (a == x and b > y) or (a == x and b == y and c > z) ..."""
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        branch.update(_after(field, direction, values[i]))
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+async def fetch_page(
+    collection, query: dict, sort: SortSpec, cursor: Optional[str], limit: int, stages: Sequence[dict] = ()
+) -> Tuple[list, Optional[str]]:
+    """Return (rows, next_cursor). Rows have `_id` stripped; next_cursor is None on the last page.
+    `stages` run after the page has been cut, so they only ever see `limit + 1` documents;
+    they must leave the sort fields in place."""
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+    pipeline = [{"$match": query}, {"$sort": dict(sort)}, {"$limit": limit + 1}, *stages]
+    rows = await collection.aggregate(pipeline).to_list(limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1], sort) if len(rows) > limit else None
+    rows = rows[:limit]
+    for row in rows:
+        row.pop("_id", None)
+    return rows, next_cursor
@@ -0,0 +1,213 @@
+"""Expo push delivery.
+
+`ExpoPushClient` holds one pooled httpx client for the life of the process
+(HTTP/2 when the `h2` package is installed, so chunks share one connection).
+It is opened on startup and closed on shutdown. Messages are posted in chunks
+of CHUNK_SIZE, Expo's per-request limit. At most `concurrency` chunks are in
+flight at once; a broadcast reads tokens from its cursor only as fast as
+chunks are sent, so memory stays flat however many devices are registered.
+
+A chunk answered with 429 or 5xx, or lost to a transport error, is retried
+with exponential backoff and jitter, honouring Retry-After. A chunk that
+still fails gets NOT_DELIVERED error tickets, so callers always receive one
+ticket per message, in message order, in Expo's ticket format:
+
+    {"status": "ok", "id": "<ticket id>"}
+    {"status": "error", "message": "...", "details": {"error": "DeviceNotRegistered"}}
+
+Every chunk's tickets are also handed to `on_tickets` (see push_receipts.py).
+`receipts` fetches delivery receipts for ticket ids with the same retries.
+"""
+import asyncio
+import importlib.util
+import json
+import logging
+import random
+from typing import AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 100
+NOT_DELIVERED = "NotDelivered"
+_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
+
+
+async def registered_tokens(db, batch_size: int = 1000) -> AsyncIterable[str]:
+    """Every registered token, streamed from a cursor."""
+    async for doc in db.push_tokens.find({}, {"_id": 0, "token": 1}).batch_size(batch_size):
+        yield doc["token"]
+
+
+def _failed(chunk: List[dict], message: str, error: str = NOT_DELIVERED) -> List[dict]:
+    return [{"status": "error", "message": message, "details": {"error": error}} for _ in chunk]
+
+
+def _error_code(ticket: dict) -> Optional[str]:
+    if ticket.get("status") == "ok":
+        return None
+    return (ticket.get("details") or {}).get("error") or "Unknown"
+
+
+class ExpoPushClient:
+    def __init__(
+        self,
+        url: str,
+        concurrency: int = 8,
+        max_attempts: int = 4,
+        timeout_seconds: float = 15,
+        backoff_seconds: float = 0.5,
+        receipts_url: Optional[str] = None,
+        on_tickets: Optional[Callable[[List[dict], List[dict]], Awaitable[None]]] = None,
+    ):
+        self.url = url
+        self.receipts_url = receipts_url or url.rsplit("/", 1)[0] + "/getReceipts"
+        self.on_tickets = on_tickets
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout_seconds = timeout_seconds
+        self.backoff_seconds = backoff_seconds
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.http2 = False
+        self._http: Optional[httpx.AsyncClient] = None
+        self._counts = {"chunks": 0, "messages": 0, "retries": 0, "undelivered_chunks": 0}
+
+    def start(self):
+        self.http2 = importlib.util.find_spec("h2") is not None
+        if not self.http2:
+            logger.info("h2 not installed; Expo push uses HTTP/1.1")
+        self._http = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout_seconds,
+            headers=_HEADERS,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def send(self, messages: List[dict]) -> List[dict]:
+        """One ticket per message, in order."""
+        chunks = [messages[i:i + CHUNK_SIZE] for i in range(0, len(messages), CHUNK_SIZE)]
+        results = await asyncio.gather(*(self._send_chunk(chunk) for chunk in chunks))
+        return [ticket for tickets in results for ticket in tickets]
+
+    async def broadcast(self, tokens: AsyncIterable[str], build: Callable[[str], dict]) -> dict:
+        """Send `build(token)` to every token as it is read; returns counts, not tickets."""
+        summary = {"sent": 0, "ok": 0, "errors": {}}
+        tasks = []
+
+        async def deliver(chunk):
+            tickets = await self._post(chunk)
+            summary["sent"] += len(chunk)
+            for ticket in tickets:
+                code = _error_code(ticket)
+                if code is None:
+                    summary["ok"] += 1
+                else:
+                    summary["errors"][code] = summary["errors"].get(code, 0) + 1
+
+        async def submit(chunk):
+            await self._semaphore.acquire()  # stop reading tokens while every slot is busy
+            task = asyncio.create_task(deliver(chunk))
+            # A done callback runs even for a task cancelled before it started, so the slot always comes back.
+            task.add_done_callback(lambda _: self._semaphore.release())
+            tasks.append(task)
+
+        chunk = []
+        try:
+            async for token in tokens:
+                chunk.append(build(token))
+                if len(chunk) == CHUNK_SIZE:
+                    await submit(chunk)
+                    chunk = []
+            if chunk:
+                await submit(chunk)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)  # slots are back before the error propagates
+            raise
+        return summary
+
+    async def _send_chunk(self, chunk: List[dict]) -> List[dict]:
+        async with self._semaphore:
+            return await self._post(chunk)
+
+    async def receipts(self, ticket_ids: List[str]) -> Dict[str, dict]:
+        """Receipts by ticket id (at most 1000 ids per call); ids without a receipt yet are absent."""
+        response, reason = await self._request(self.receipts_url, {"ids": ticket_ids})
+        if response is None or response.status_code >= 400:
+            raise httpx.HTTPError(f"Expo receipts: {reason if response is None else f'HTTP {response.status_code}'}")
+        data = response.json().get("data")
+        return data if isinstance(data, dict) else {}
+
+    async def _post(self, chunk: List[dict]) -> List[dict]:
+        self._counts["chunks"] += 1
+        self._counts["messages"] += len(chunk)
+        response, reason = await self._request(self.url, chunk)
+        if response is None:
+            self._counts["undelivered_chunks"] += 1
+            logger.error(f"Expo push chunk of {len(chunk)} not delivered after {self.max_attempts} attempts: {reason}")
+            tickets = _failed(chunk, reason)
+        elif response.status_code >= 400:
+            logger.error(f"Expo push rejected a chunk of {len(chunk)}: HTTP {response.status_code} {response.text[:200]}")
+            tickets = _failed(chunk, f"HTTP {response.status_code}", "Rejected")
+        else:
+            tickets = self._tickets(chunk, response)
+        if self.on_tickets:
+            try:
+                await self.on_tickets(chunk, tickets)
+            except Exception as e:
+                logger.error(f"Recording push tickets failed: {e}")
+        return tickets
+
+    async def _request(self, url: str, payload) -> Tuple[Optional[httpx.Response], str]:
+        """POST with retries on 429 / 5xx / transport errors. (response, "") once answered
+        with anything else; (None, last failure) after max_attempts."""
+        if self._http is None:
+            raise RuntimeError("ExpoPushClient.start() has not been called")
+        reason = "no attempt made"
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._counts["retries"] += 1
+            retry_after = None
+            try:
+                response = await self._http.post(url, json=payload)
+            except httpx.TransportError as e:
+                reason = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    return response, ""
+                reason = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            if attempt + 1 < self.max_attempts:
+                await asyncio.sleep(self._delay(attempt, retry_after))
+        return None, reason
+
+    def _tickets(self, chunk: List[dict], response: httpx.Response) -> List[dict]:
+        try:
+            body = response.json()
+        except ValueError:
+            return _failed(chunk, "invalid JSON from Expo", "Rejected")
+        tickets = body.get("data") if isinstance(body, dict) else None
+        if not isinstance(tickets, list) or len(tickets) != len(chunk):
+            # Request-level errors (e.g. PUSH_TOO_MANY_EXPERIENCE_IDS) come back instead of tickets.
+            message = json.dumps(body.get("errors"))[:200] if isinstance(body, dict) else "unexpected response"
+            return _failed(chunk, message, "Rejected")
+        return tickets
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+        return self.backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    def stats(self) -> dict:
+        return {"url": self.url, "concurrency": self.concurrency, "http2": self.http2, **self._counts}
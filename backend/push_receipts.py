@@ -0,0 +1,170 @@
+"""Push receipts and dead-token pruning.
+
+Expo answers a push with a ticket per message. The final outcome is only in
+the receipt, which can be fetched from about 15 minutes after sending.
+`record_tickets` is the ExpoPushClient hook: it stores every ok ticket in
+`push_tickets`, due for checking RECEIPT_DELAY after it was sent. A
+DeviceNotRegistered error ticket prunes its token immediately.
+
+`ReceiptPoller` claims due tickets in batches of up to 1000, the receipts API
+limit. A claim is a conditional update of `check_after`, so several uvicorn
+workers can poll without fetching the same receipts. Each ticket gets its
+outcome: "delivered", "failed" (with Expo's error code), or "unknown" when no
+receipt appears after MAX_RECEIPT_CHECKS checks. Tickets are kept for
+TICKET_RETENTION through a TTL index, as a delivery log.
+
+DeviceNotRegistered means the app was uninstalled or the token rotated, so the
+token is removed from `push_tokens`. The removed token is quarantined in
+`dead_push_tokens` for inspection. Removal is conditional on the token not
+having been registered again since the push, so a device that re-registered
+meanwhile is kept.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_DELAY = timedelta(minutes=15)
+MAX_RECEIPT_CHECKS = 4
+TICKET_RETENTION = timedelta(days=3)
+QUARANTINE_RETENTION = timedelta(days=30)
+RECEIPTS_PER_REQUEST = 1000
+DEVICE_NOT_REGISTERED = "DeviceNotRegistered"
+
+PENDING = "pending"
+DELIVERED = "delivered"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+async def prune_tokens(db, dead: Dict[str, datetime], reason: str = DEVICE_NOT_REGISTERED) -> int:
+    """Remove tokens (token -> time of the push that found them dead) not registered again since; returns how many."""
+    if not dead:
+        return 0
+    now = utcnow()
+    removed = 0
+    for token, seen_at in dead.items():
+        # Tokens registered before dates were stored (string or missing registered_at) are older than any push.
+        doc = await db.push_tokens.find_one_and_delete({"token": token, "$nor": [{"registered_at": {"$gt": seen_at}}]})
+        if doc is None:
+            continue
+        removed += 1
+        doc.pop("_id", None)
+        await db.dead_push_tokens.update_one(
+            {"_id": token},
+            {"$set": {**doc, "reason": reason, "pruned_at": now, "expires_at": now + QUARANTINE_RETENTION}},
+            upsert=True,
+        )
+    if removed:
+        logger.info(f"Pruned {removed} push tokens ({reason})")
+    return removed
+
+
+async def record_tickets(db, messages: List[dict], tickets: List[dict]):
+    """ExpoPushClient.on_tickets: queue ok tickets for receipt checks, prune tokens Expo already rejected."""
+    now = utcnow()
+    docs, dead = [], {}
+    for message, ticket in zip(messages, tickets):
+        if ticket.get("status") == "ok" and ticket.get("id"):
+            docs.append({
+                "_id": ticket["id"],
+                "token": message["to"],
+                "data": message.get("data"),
+                "status": PENDING,
+                "checks": 0,
+                "sent_at": now,
+                "check_after": now + RECEIPT_DELAY,
+                "expires_at": now + TICKET_RETENTION,
+            })
+        elif (ticket.get("details") or {}).get("error") == DEVICE_NOT_REGISTERED:
+            dead[message["to"]] = now
+    if docs:
+        try:
+            await db.push_tickets.insert_many(docs, ordered=False)
+        except BulkWriteError:
+            pass  # a ticket recorded twice
+    await prune_tokens(db, dead)
+
+
+class ReceiptPoller:
+    def __init__(self, db, push_client, interval_seconds: float = 60, lease_seconds: float = 120):
+        self.db = db
+        self.push_client = push_client
+        self.interval_seconds = interval_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._counts = {"checked": 0, DELIVERED: 0, FAILED: 0, UNKNOWN: 0, "not_ready": 0, "pruned_tokens": 0, "errors": {}}
+
+    async def run(self):
+        while True:
+            try:
+                while await self.poll() == RECEIPTS_PER_REQUEST:
+                    pass  # a full batch: more may be due
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Push receipt poll error: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def claim(self, now: datetime) -> List[dict]:
+        due = await self.db.push_tickets.find(
+            {"status": PENDING, "check_after": {"$lte": now}}, {"_id": 1}
+        ).sort("check_after", 1).to_list(RECEIPTS_PER_REQUEST)
+        if not due:
+            return []
+        ids = [d["_id"] for d in due]
+        # Only tickets still due are claimed, so another worker's claim is never taken over.
+        await self.db.push_tickets.update_many(
+            {"_id": {"$in": ids}, "status": PENDING, "check_after": {"$lte": now}},
+            {"$set": {"check_after": now + timedelta(seconds=self.lease_seconds), "claimed_by": self.owner}},
+        )
+        return await self.db.push_tickets.find({"_id": {"$in": ids}, "claimed_by": self.owner, "status": PENDING}).to_list(len(ids))
+
+    async def poll(self, now: Optional[datetime] = None) -> int:
+        """Check one batch of due tickets; returns how many were claimed."""
+        now = now or utcnow()
+        tickets = await self.claim(now)
+        if not tickets:
+            return 0
+        receipts = await self.push_client.receipts([t["_id"] for t in tickets])
+
+        updates, dead = [], {}
+        for ticket in tickets:
+            receipt = receipts.get(ticket["_id"])
+            checks = ticket.get("checks", 0) + 1
+            fields = {"checks": checks, "checked_at": now, "claimed_by": None}
+            if receipt is None:
+                if checks < MAX_RECEIPT_CHECKS:
+                    fields["check_after"] = now + RECEIPT_DELAY
+                    self._counts["not_ready"] += 1
+                else:
+                    fields["status"] = UNKNOWN
+                    self._counts[UNKNOWN] += 1
+            elif receipt.get("status") == "ok":
+                fields["status"] = DELIVERED
+                self._counts[DELIVERED] += 1
+            else:
+                error = (receipt.get("details") or {}).get("error") or "Unknown"
+                fields.update(status=FAILED, error=error, message=receipt.get("message"))
+                self._counts[FAILED] += 1
+                self._counts["errors"][error] = self._counts["errors"].get(error, 0) + 1
+                if error == DEVICE_NOT_REGISTERED:
+                    dead[ticket["token"]] = max(dead.get(ticket["token"], ticket["sent_at"]), ticket["sent_at"])
+            updates.append(UpdateOne({"_id": ticket["_id"]}, {"$set": fields}))
+        await self.db.push_tickets.bulk_write(updates, ordered=False)
+        self._counts["checked"] += len(tickets)
+        self._counts["pruned_tokens"] += await prune_tokens(self.db, dead)
+        return len(tickets)
+
+    def stats(self) -> dict:
+        return dict(self._counts)
@@ -0,0 +1,207 @@
+"""Scheduled reminder pushes.
+
+`ReminderScheduler` wakes every `interval_seconds` in each uvicorn worker, but
+only the worker holding the `reminders` lease in `scheduler_leases` runs the
+tick. The holder renews the lease on every tick. If the holder dies, another
+worker takes over once `leased_until` has passed.
+
+A tick finds the contacts below the reminder threshold with the indexed
+attention_at scan (see health.py), then streams the registered devices from a
+cursor and gives each device its own batch: the lowest-health contacts that
+device has not been reminded about within the cooldown, up to what is left of
+its budget of `per_device` reminders per cooldown. The budget, threshold and
+cooldown follow the `low_pressure_mode` / `notification_intensity` settings.
+
+Every (device, contact) reminder is claimed in `reminder_deliveries` before it
+is sent. A claim is an upsert keyed by `<token>:<contact_id>` that only matches
+an expired entry, so a second claim within the cooldown fails with a duplicate
+key, even from a tick running concurrently elsewhere. Entries expire through a
+TTL index on `expires_at`. `send` returns one Expo ticket per message (see
+push.py); the ticket id is kept on the entry. Messages that never reached Expo
+expire their entries at once, so the next tick retries them; messages Expo
+rejected keep their cooldown.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from health import attention_filter, health_pipeline
+from push import NOT_DELIVERED
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+LEASE_ID = "reminders"
+CANDIDATE_LIMIT = 50
+DEVICE_BATCH = 100
+QUEUED = "queued"
+SENT = "sent"
+FAILED = "failed"
+
+
+def reminder_policy(settings: dict, cooldown_hours: float = 24) -> dict:
+    """Health threshold, reminders per device per cooldown, and the cooldown for the given settings."""
+    low_pressure = settings.get("low_pressure_mode", False)
+    intensity = settings.get("notification_intensity", 50)
+    below = 20 if low_pressure else 40
+    if intensity < 30:
+        below = min(below, 25)
+    return {
+        "below": below,
+        "per_device": 1 if low_pressure else min(5, 1 + intensity // 25),
+        "cooldown": timedelta(hours=cooldown_hours * (3 if low_pressure else 1)),
+    }
+
+
+def reminder_message(token: str, contact: dict) -> dict:
+    return {
+        "to": token,
+        "title": f"Touch — {contact['name']}",
+        "body": f"{contact['name']} might appreciate hearing from you today.",
+        "sound": "default",
+        "data": {"contactId": contact["id"], "type": "reminder"},
+    }
+
+
+def _delivery_id(token: str, contact_id: str) -> str:
+    return f"{token}:{contact_id}"
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        db,
+        send: Callable[[List[dict]], Awaitable[List[dict]]],
+        interval_seconds: float = 900,
+        cooldown_hours: float = 24,
+        lease_seconds: Optional[float] = None,
+    ):
+        self.db = db
+        self.send = send
+        self.interval_seconds = interval_seconds
+        self.cooldown_hours = cooldown_hours
+        self.lease_seconds = lease_seconds or interval_seconds * 2
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def run(self):
+        # Spread the workers' wake-ups so they do not all race for the lease at once.
+        await asyncio.sleep(random.uniform(0, min(self.interval_seconds, 5)))
+        while True:
+            try:
+                if await self.acquire():
+                    result = await self.tick()
+                    if result["sent"]:
+                        logger.info(f"Reminder tick: {result}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder tick error: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease; False while another worker holds it."""
+        now = utcnow()
+        try:
+            lease = await self.db.scheduler_leases.find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"leased_until": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "leased_until": now + timedelta(seconds=self.lease_seconds), "renewed_at": now}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False
+        return lease is not None and lease["owner"] == self.owner
+
+    async def release(self):
+        await self.db.scheduler_leases.update_one({"_id": LEASE_ID, "owner": self.owner}, {"$set": {"leased_until": utcnow()}})
+
+    async def tick(self, now: Optional[datetime] = None) -> dict:
+        """Claim and send every device's batch. Safe to run alongside another tick."""
+        now = now or utcnow()
+        settings = await self.db.settings.find_one({"id": "default"}, {"_id": 0}) or {}
+        policy = reminder_policy(settings, self.cooldown_hours)
+        candidates = await self.db.contacts.aggregate(health_pipeline(
+            attention_filter(now), now, below=policy["below"],
+            sort={"connection_health": 1, "_id": 1}, limit=CANDIDATE_LIMIT, project={"id": 1, "name": 1},
+        )).to_list(CANDIDATE_LIMIT)
+
+        result = {"devices": 0, "sent": 0, "failed": 0, "contacts": set()}
+        if candidates:
+            tokens = []
+            async for doc in self.db.push_tokens.find({}, {"_id": 0, "token": 1}).batch_size(DEVICE_BATCH):
+                tokens.append(doc["token"])
+                if len(tokens) == DEVICE_BATCH:
+                    await self._deliver(tokens, candidates, policy, now, result)
+                    tokens = []
+            if tokens:
+                await self._deliver(tokens, candidates, policy, now, result)
+        return {**result, "contacts": len(result["contacts"]), "candidates": len(candidates)}
+
+    async def _deliver(self, tokens: List[str], candidates: List[dict], policy: dict, now: datetime, result: dict):
+        result["devices"] += len(tokens)
+        deliveries = self.db.reminder_deliveries
+        # TTL deletion lags, so entries past expires_at count as gone.
+        recent, used = set(), {}
+        async for d in deliveries.find({"token": {"$in": tokens}, "expires_at": {"$gt": now}}, {"_id": 1, "token": 1}):
+            recent.add(d["_id"])
+            used[d["token"]] = used.get(d["token"], 0) + 1
+
+        claims, claimed, messages = [], [], []
+        for token in tokens:
+            budget = policy["per_device"] - used.get(token, 0)
+            if budget <= 0:
+                continue
+            batch = [c for c in candidates if _delivery_id(token, c["id"]) not in recent][:budget]
+            for contact in batch:
+                claimed.append(_delivery_id(token, contact["id"]))
+                claims.append(UpdateOne(
+                    {"_id": claimed[-1], "expires_at": {"$lte": now}},
+                    {"$set": {
+                        "token": token, "contact_id": contact["id"], "status": QUEUED,
+                        "queued_at": now, "expires_at": now + policy["cooldown"],
+                    }},
+                    upsert=True,
+                ))
+                messages.append(reminder_message(token, contact))
+        if not claims:
+            return
+
+        lost = set()
+        try:
+            await deliveries.bulk_write(claims, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate keys: claimed within the cooldown by a concurrent tick.
+            lost = {err["index"] for err in e.details.get("writeErrors", [])}
+        messages = [m for i, m in enumerate(messages) if i not in lost]
+        claimed = [key for i, key in enumerate(claimed) if i not in lost]
+        if not messages:
+            return
+
+        try:
+            tickets = await self.send(messages)
+        except Exception as e:
+            logger.error(f"Reminder push failed for {len(messages)} messages: {e}")
+            tickets = [{"status": "error", "message": str(e), "details": {"error": NOT_DELIVERED}} for _ in messages]
+
+        sent_at, outcomes = utcnow(), []
+        for key, message, ticket in zip(claimed, messages, tickets):
+            if ticket.get("status") == "ok":
+                outcomes.append(UpdateOne({"_id": key}, {"$set": {"status": SENT, "sent_at": sent_at, "ticket_id": ticket.get("id")}}))
+                result["sent"] += 1
+                result["contacts"].add(message["data"]["contactId"])
+                continue
+            error = (ticket.get("details") or {}).get("error")
+            fields = {"status": FAILED, "error": error or ticket.get("message")}
+            if error == NOT_DELIVERED:
+                fields["expires_at"] = now  # never reached Expo; the next tick retries
+            outcomes.append(UpdateOne({"_id": key}, {"$set": fields}))
+            result["failed"] += 1
+        await deliveries.bulk_write(outcomes, ordered=False)
@@ -1,27 +1,81 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
-import logging
+import asyncio
 import json
-import tempfile
+import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
+from pymongo import UpdateOne
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+from indexes import ensure_indexes, index_report
+from llm_cache import LlmCache
+from llm_gateway import CircuitBreaker, LlmGateway, extract_json, make_provider, parse_endpoint_limits
+from analytics import compute_analytics, get_prose, insight_prose, store_prose
+from bulk_import import ImportReport, import_file
+from call_prep import BriefPrefetcher, delete_brief, get_brief, invalidate_brief, invalidate_briefs
+from dashboard import get_dashboard_snapshot, invalidate_dashboard, snapshot_refresher
+from export import decode_checkpoint, gzip_chunks, json_chunks, ndjson_chunks
+from enrichment import COMPLETE, PENDING, SKIPPED, EnrichmentWorker, enqueue_enrichment
+from health import attention_filter, backfill_due_fields, due_fields, due_update, health_pipeline, health_stages
+from pagination import CONTACTS_SORT, INTERACTIONS_SORT, InvalidCursor, clamp_page_size, fetch_page
+from push import ExpoPushClient, registered_tokens
+from push_receipts import ReceiptPoller, record_tickets
+from reminders import ReminderScheduler
+from sse import SSE_HEADERS, sse_fields
+from summary_batcher import SummaryBatcher
+from synthetic import generate_dataset
+from timestamps import Timestamp, as_datetime, to_iso, utcnow
+from transcription import Transcriber
+from transcript_cache import TranscriptCache
+from voice import AudioTooLarge, InvalidUpload, UploadLimiter, UploadsBusy, receive_audio
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = client[os.environ['DB_NAME']]
 
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID', '')
 RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET', '')
+EXPO_PUSH_URL = os.environ.get('EXPO_PUSH_URL', 'https://exp.host/--/api/v2/push/send')
+PUSH_CONCURRENCY = int(os.environ.get('PUSH_CONCURRENCY', '8'))
+PUSH_RECEIPT_POLL_SECONDS = float(os.environ.get('PUSH_RECEIPT_POLL_SECONDS', '60'))
+DASHBOARD_REFRESH_SECONDS = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', '300'))
+# A read rebuilds the snapshot itself only if the refresher has missed a couple of rounds.
+DASHBOARD_MAX_AGE = timedelta(seconds=2 * DASHBOARD_REFRESH_SECONDS)
+ENRICHMENT_CONCURRENCY = int(os.environ.get('ENRICHMENT_CONCURRENCY', '16'))
+ENRICHMENT_MAX_ATTEMPTS = int(os.environ.get('ENRICHMENT_MAX_ATTEMPTS', '3'))
+CALL_PREP_PREFETCH_SECONDS = float(os.environ.get('CALL_PREP_PREFETCH_SECONDS', '300'))
+CALL_PREP_PREFETCH_BELOW = float(os.environ.get('CALL_PREP_PREFETCH_BELOW', '55'))
+SUMMARY_BATCH_WINDOW_MS = float(os.environ.get('SUMMARY_BATCH_WINDOW_MS', '50'))
+SUMMARY_BATCH_MAX_ITEMS = int(os.environ.get('SUMMARY_BATCH_MAX_ITEMS', '16'))
+SUMMARY_BATCH_MAX_TOKENS = int(os.environ.get('SUMMARY_BATCH_MAX_TOKENS', '6000'))
+REMINDER_INTERVAL_SECONDS = float(os.environ.get('REMINDER_INTERVAL_SECONDS', '900'))
+REMINDER_COOLDOWN_HOURS = float(os.environ.get('REMINDER_COOLDOWN_HOURS', '24'))
+VOICE_MAX_UPLOAD_MB = int(os.environ.get('VOICE_MAX_UPLOAD_MB', '100'))
+VOICE_IN_MEMORY_KB = int(os.environ.get('VOICE_IN_MEMORY_KB', '1024'))
+VOICE_MAX_CONCURRENT_UPLOADS = int(os.environ.get('VOICE_MAX_CONCURRENT_UPLOADS', '8'))
+VOICE_SEGMENT_SECONDS = float(os.environ.get('VOICE_SEGMENT_SECONDS', '60'))
+VOICE_TRANSCRIBE_CONCURRENCY = int(os.environ.get('VOICE_TRANSCRIBE_CONCURRENCY', '8'))
+VOICE_TRANSCRIPT_TTL_DAYS = int(os.environ.get('VOICE_TRANSCRIPT_TTL_DAYS', '30'))
+SEED_MAX_CONTACTS = int(os.environ.get('SEED_MAX_CONTACTS', '10000'))
+SEED_MAX_INTERACTIONS = int(os.environ.get('SEED_MAX_INTERACTIONS', '500000'))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '1024'))
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'emergent')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_ENDPOINT_LIMITS = parse_endpoint_limits(os.environ.get('LLM_ENDPOINT_LIMITS', ''))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '20'))
+LLM_BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', '5'))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -63,11 +117,31 @@ class ContactResponse(BaseModel):
     is_archived: bool = False
     avatar_color: str = "#40916C"
     notes: Optional[str] = None
-    last_interaction_at: Optional[str] = None
+    last_interaction_at: Optional[Timestamp] = None
     interaction_count: int = 0
     connection_health: float = 100.0
-    created_at: str
-    updated_at: str
+    created_at: Timestamp
+    updated_at: Timestamp
+
+class ContactPage(BaseModel):
+    items: List[ContactResponse]
+    next_cursor: Optional[str] = None
+
+class ContactPatch(BaseModel):
+    id: str
+    patch: ContactUpdate
+
+class ContactBatchUpdate(BaseModel):
+    operations: List[ContactPatch]
+
+class ContactBatchItem(BaseModel):
+    id: str
+    status: str  # updated | not_found | duplicate | empty
+    contact: Optional[ContactResponse] = None
+
+class ContactBatchResult(BaseModel):
+    items: List[ContactBatchItem]
+    updated: int
 
 class InteractionCreate(BaseModel):
     contact_id: str
@@ -89,7 +163,12 @@ class InteractionResponse(BaseModel):
     promises: List[str] = []
     important_dates: List[str] = []
     duration_minutes: Optional[int] = None
-    created_at: str
+    enrichment_status: str = COMPLETE
+    created_at: Timestamp
+
+class InteractionPage(BaseModel):
+    items: List[InteractionResponse]
+    next_cursor: Optional[str] = None
 
 class GoalCreate(BaseModel):
     title: str
@@ -105,7 +184,7 @@ class GoalResponse(BaseModel):
     progress: float = 0.0
     status: str = "active"
     target_date: Optional[str] = None
-    created_at: str
+    created_at: Timestamp
 
 class SettingsResponse(BaseModel):
     notification_intensity: int = 50
@@ -146,27 +225,34 @@ class ReminderResponse(BaseModel):
 
 AVATAR_COLORS = ["#2D6A4F", "#40916C", "#52B788", "#95D5B2", "#457B9D", "#E9C46A", "#F4A261", "#E76F51", "#264653", "#A8DADC"]
 
-def now_iso():
-    return datetime.now(timezone.utc).isoformat()
-
-def calc_connection_health(last_interaction_at: Optional[str], frequency_days: int) -> float:
-    if not last_interaction_at:
+def calc_connection_health(last_interaction_at, frequency_days: int) -> float:
+    """`last_interaction_at` may be a stored date or a not-yet-migrated ISO string."""
+    last = as_datetime(last_interaction_at)
+    if not last:
         return 0.0
     try:
-        last = datetime.fromisoformat(last_interaction_at.replace('Z', '+00:00'))
         elapsed = (datetime.now(timezone.utc) - last).total_seconds() / 86400
         health = max(0.0, min(100.0, (1.0 - elapsed / frequency_days) * 100))
         return round(health, 1)
     except Exception:
         return 0.0
 
+llm_cache = LlmCache(db, max_entries=LLM_CACHE_MAX_ENTRIES)
+llm = LlmGateway(
+    make_provider(LLM_BACKEND, EMERGENT_LLM_KEY, gemini_api_key=GEMINI_API_KEY),
+    cache=llm_cache,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    endpoint_limits=LLM_ENDPOINT_LIMITS,
+    default_timeout=LLM_TIMEOUT_SECONDS,
+    breaker=CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN_SECONDS),
+)
+
+def summarize_fallback(text: str) -> dict:
+    return {"summary": text[:200] if text else "", "key_highlights": [], "action_items": [], "emotional_cues": [], "promises": [], "important_dates": []}
+
 async def ai_summarize(text: str) -> dict:
-    try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"summarize-{uuid.uuid4()}",
-            system_message="""You are an empathetic AI assistant for a personal relationship CRM called Touch.
+    """Raises on LLM/transport errors so the enrichment worker can retry"""
+    system_message = """You are an empathetic AI assistant for a personal relationship CRM called Touch.
 Analyze the conversation/interaction notes and return a JSON object with:
 - "summary": A brief 1-2 sentence summary of the interaction
 - "key_highlights": Array of 2-3 key points discussed
@@ -175,35 +261,64 @@ Analyze the conversation/interaction notes and return a JSON object with:
 - "promises": Array of any promises or commitments mentioned
 - "important_dates": Array of any dates or events mentioned
 Return ONLY valid JSON, no markdown formatting."""
-        )
-        chat.with_model("gemini", "gemini-3-flash-preview")
-        response = await chat.send_message(UserMessage(text=f"Analyze this interaction: {text}"))
-        try:
-            cleaned = response.strip()
-            if cleaned.startswith("```"):
-                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-                if cleaned.endswith("```"):
-                    cleaned = cleaned[:-3]
-                cleaned = cleaned.strip()
-            result = json.loads(cleaned)
-            return result
-        except json.JSONDecodeError:
-            return {"summary": response[:200], "key_highlights": [], "action_items": [], "emotional_cues": [], "promises": [], "important_dates": []}
-    except Exception as e:
-        logger.error(f"AI summarize error: {e}")
-        return {"summary": text[:200] if text else "", "key_highlights": [], "action_items": [], "emotional_cues": [], "promises": [], "important_dates": []}
-
-async def ai_call_prep(contact_name: str, interactions: list) -> dict:
+    response = await llm.complete("summarize", system_message, f"Analyze this interaction: {text}")
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        interaction_text = "\n".join([
-            f"[{i.get('created_at', 'unknown')}] {i.get('notes', '')} {i.get('ai_summary', '')}"
-            for i in interactions[:5]
-        ])
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"callprep-{uuid.uuid4()}",
-            system_message="""You are a warm, empathetic AI assistant for Touch, a personal relationship CRM.
+        return extract_json(response)
+    except ValueError:
+        return {"summary": response[:200], "key_highlights": [], "action_items": [], "emotional_cues": [], "promises": [], "important_dates": []}
+
+def parse_summary_batch(response: str) -> list:
+    """The per-interaction results of a batch reply; raises ValueError when there are none"""
+    data = extract_json(response)
+    if isinstance(data, dict):
+        data = data.get("results")
+    if not isinstance(data, list):
+        raise ValueError("batch summary is not a list of results")
+    return data
+
+async def ai_summarize_many(texts: List[str]) -> List[Optional[dict]]:
+    """One LLM call for several interactions; result i belongs to texts[i] (None if the model skipped it)"""
+    system_message = """You are an empathetic AI assistant for a personal relationship CRM called Touch.
+You will receive a JSON array of interactions, each with an "index" and the interaction "text".
+Analyze each one separately and return a JSON array with one object per interaction containing:
+- "index": The index of the interaction it describes
+- "summary": A brief 1-2 sentence summary of the interaction
+- "key_highlights": Array of 2-3 key points discussed
+- "action_items": Array of any follow-up actions or promises made
+- "emotional_cues": Array of emotional tones detected (e.g., "happy", "concerned", "excited")
+- "promises": Array of any promises or commitments mentioned
+- "important_dates": Array of any dates or events mentioned
+Return ONLY valid JSON, no markdown formatting."""
+    items = [{"index": i, "text": text} for i, text in enumerate(texts)]
+    response = await llm.complete(
+        "summarize_batch", system_message, f"Analyze these interactions:\n{json.dumps(items, ensure_ascii=False)}", validate=parse_summary_batch,
+    )
+    results: List[Optional[dict]] = [None] * len(texts)
+    for item in parse_summary_batch(response):
+        index = item.get("index") if isinstance(item, dict) else None
+        if isinstance(index, int) and 0 <= index < len(texts):
+            results[index] = item
+    return results
+
+summary_batcher = SummaryBatcher(
+    ai_summarize, ai_summarize_many, window_seconds=SUMMARY_BATCH_WINDOW_MS / 1000,
+    max_items=SUMMARY_BATCH_MAX_ITEMS, max_tokens=SUMMARY_BATCH_MAX_TOKENS,
+)
+
+enrichment_worker = EnrichmentWorker(
+    db, summary_batcher.summarize, summarize_fallback, concurrency=ENRICHMENT_CONCURRENCY, max_attempts=ENRICHMENT_MAX_ATTEMPTS,
+)
+
+CALL_PREP_FALLBACK = {"recap": "Unable to generate prep", "follow_ups": [], "important_dates": [], "conversation_starters": ["How have you been?"], "emotional_note": ""}
+INSIGHTS_PROSE_FALLBACK = {"overall_insight": "Keep nurturing your relationships!", "encouragement": "You're doing great!"}
+PROMPTS_FALLBACK = ["How have you been?", "What's been on your mind lately?", "I've been thinking about you!"]
+
+def call_prep_messages(contact_name: str, interactions: list) -> tuple:
+    interaction_text = "\n".join([
+        f"[{to_iso(i.get('created_at')) or 'unknown'}] {i.get('notes', '')} {i.get('ai_summary', '')}"
+        for i in interactions[:5]
+    ])
+    system_message = """You are a warm, empathetic AI assistant for Touch, a personal relationship CRM.
 Generate a call preparation brief. Return a JSON object with:
 - "recap": Brief recap of the last conversation (1-2 sentences)
 - "follow_ups": Array of 2-3 suggested follow-up topics
@@ -211,58 +326,52 @@ Generate a call preparation brief. Return a JSON object with:
 - "conversation_starters": Array of 2-3 warm conversation starters
 - "emotional_note": A brief note about the emotional context
 Return ONLY valid JSON, no markdown formatting."""
-        )
-        chat.with_model("gemini", "gemini-3-flash-preview")
-        prompt = f"Prepare a call brief for {contact_name}. Recent interactions:\n{interaction_text}"
-        response = await chat.send_message(UserMessage(text=prompt))
-        try:
-            cleaned = response.strip()
-            if cleaned.startswith("```"):
-                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-                if cleaned.endswith("```"):
-                    cleaned = cleaned[:-3]
-                cleaned = cleaned.strip()
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
-            return {"recap": response[:200], "follow_ups": [], "important_dates": [], "conversation_starters": [], "emotional_note": ""}
+    return system_message, f"Prepare a call brief for {contact_name}. Recent interactions:\n{interaction_text}"
+
+async def generate_call_prep(contact_name: str, interactions: list) -> dict:
+    """Raises on LLM/transport errors so the brief prefetcher doesn't store a fallback"""
+    response = await llm.complete("call_prep", *call_prep_messages(contact_name, interactions))
+    try:
+        return extract_json(response)
+    except ValueError:
+        return {"recap": response[:200], "follow_ups": [], "important_dates": [], "conversation_starters": [], "emotional_note": ""}
+
+brief_prefetcher = BriefPrefetcher(
+    db, generate_call_prep, interval_seconds=CALL_PREP_PREFETCH_SECONDS, below=CALL_PREP_PREFETCH_BELOW,
+)
+
+async def ai_call_prep(contact_name: str, interactions: list) -> dict:
+    try:
+        return await generate_call_prep(contact_name, interactions)
     except Exception as e:
         logger.error(f"AI call prep error: {e}")
-        return {"recap": "Unable to generate prep", "follow_ups": [], "important_dates": [], "conversation_starters": ["How have you been?"], "emotional_note": ""}
+        return dict(CALL_PREP_FALLBACK)
 
-async def ai_insights(contacts_data: list) -> dict:
-    try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        summary_text = "\n".join([
-            f"- {c['name']} ({c['relationship_tag']}): last contact {c.get('last_interaction_at', 'never')}, frequency: every {c['frequency_days']} days, health: {c.get('connection_health', 0)}%"
-            for c in contacts_data[:20]
-        ])
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"insights-{uuid.uuid4()}",
-            system_message="""You are a warm, empathetic AI for Touch relationship CRM.
-Analyze the user's relationship data and return a JSON object with:
-- "overall_insight": A warm, encouraging 2-sentence overview
-- "drift_alerts": Array of objects with "contact_name" and "message" for contacts showing drift
-- "category_balance": Object showing balance across relationship categories
-- "suggestions": Array of 3 actionable, gentle suggestions
+def insights_messages(digest: dict) -> tuple:
+    system_message = """You are a warm, empathetic AI for Touch relationship CRM.
+You will receive a JSON summary of the user's relationship statistics. Write a JSON object with:
+- "overall_insight": A warm, encouraging 2-sentence overview grounded in the numbers
 - "encouragement": A warm, non-judgmental encouragement message
 Return ONLY valid JSON, no markdown formatting."""
-        )
-        chat.with_model("gemini", "gemini-3-flash-preview")
-        response = await chat.send_message(UserMessage(text=f"Analyze these relationships:\n{summary_text}"))
-        try:
-            cleaned = response.strip()
-            if cleaned.startswith("```"):
-                cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-                if cleaned.endswith("```"):
-                    cleaned = cleaned[:-3]
-                cleaned = cleaned.strip()
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
-            return {"overall_insight": response[:300], "drift_alerts": [], "category_balance": {}, "suggestions": [], "encouragement": ""}
-    except Exception as e:
-        logger.error(f"AI insights error: {e}")
-        return {"overall_insight": "Keep nurturing your relationships!", "drift_alerts": [], "category_balance": {}, "suggestions": ["Reach out to someone today"], "encouragement": "You're doing great!"}
+    return system_message, f"Relationship statistics:\n{json.dumps(digest, sort_keys=True, ensure_ascii=False)}"
+
+def parse_insight_prose(response: str) -> dict:
+    """Raises ValueError unless the reply has every prose field"""
+    prose = extract_json(response)
+    if not isinstance(prose, dict) or not all(prose.get(key) for key in INSIGHTS_PROSE_FALLBACK):
+        raise ValueError("insight prose is missing fields")
+    return {key: prose[key] for key in INSIGHTS_PROSE_FALLBACK}
+
+async def ai_insight_prose(digest: dict) -> dict:
+    """Raises on LLM/transport errors or unparsable output so fallback prose is never stored"""
+    return parse_insight_prose(await llm.complete("insights", *insights_messages(digest), validate=parse_insight_prose))
+
+def prompts_messages(contact: dict, interactions: list, mode: str) -> tuple:
+    context = "\n".join([i.get("notes", "") or i.get("ai_summary", "") for i in interactions]) if interactions else "No previous interactions"
+    system_message = f"""Generate {mode} conversation prompts for reaching out to {contact['name']} ({contact['relationship_tag']}).
+Return a JSON array of 5 strings, each a warm conversation prompt.
+Return ONLY a JSON array, no other text."""
+    return system_message, f"Recent context: {context}"
 
 # ===================== ROUTES =====================
 
@@ -288,10 +397,12 @@ async def create_contact(data: ContactCreate):
         "last_interaction_at": None,
         "interaction_count": 0,
         "connection_health": 0.0,
-        "created_at": now_iso(),
-        "updated_at": now_iso(),
+        "created_at": utcnow(),
+        "updated_at": utcnow(),
     }
+    contact.update(due_fields(None, contact["frequency_days"], contact["created_at"]))
     await db.contacts.insert_one({**contact, "_id": contact["id"]})
+    await invalidate_dashboard(db)
     return ContactResponse(**contact)
 
 @api_router.get("/contacts", response_model=List[ContactResponse])
@@ -299,11 +410,24 @@ async def get_contacts(archived: bool = False, tag: Optional[str] = None):
     query = {"is_archived": archived}
     if tag:
         query["relationship_tag"] = tag
-    contacts = await db.contacts.find(query, {"_id": 0}).sort("is_pinned", -1).to_list(500)
-    for c in contacts:
-        c["connection_health"] = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
+    pipeline = health_pipeline(query, datetime.now(timezone.utc), sort={"is_pinned": -1}, limit=500)
+    contacts = await db.contacts.aggregate(pipeline).to_list(500)
     return [ContactResponse(**c) for c in contacts]
 
+@api_router.get("/contacts/page", response_model=ContactPage)
+async def get_contacts_page(archived: bool = False, tag: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50):
+    """Keyset-paginated contacts, pinned first then by name; pass next_cursor back to continue"""
+    query = {"is_archived": archived}
+    if tag:
+        query["relationship_tag"] = tag
+    try:
+        contacts, next_cursor = await fetch_page(
+            db.contacts, query, CONTACTS_SORT, cursor, clamp_page_size(limit), health_stages(datetime.now(timezone.utc))
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return ContactPage(items=[ContactResponse(**c) for c in contacts], next_cursor=next_cursor)
+
 @api_router.get("/contacts/{contact_id}", response_model=ContactResponse)
 async def get_contact(contact_id: str):
     contact = await db.contacts.find_one({"id": contact_id}, {"_id": 0})
@@ -315,29 +439,84 @@ async def get_contact(contact_id: str):
 @api_router.put("/contacts/{contact_id}", response_model=ContactResponse)
 async def update_contact(contact_id: str, data: ContactUpdate):
     update_data = {k: v for k, v in data.dict().items() if v is not None}
-    update_data["updated_at"] = now_iso()
-    await db.contacts.update_one({"id": contact_id}, {"$set": update_data})
+    update_data["updated_at"] = utcnow()
+    await db.contacts.update_one({"id": contact_id}, due_update(update_data))
     contact = await db.contacts.find_one({"id": contact_id}, {"_id": 0})
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await invalidate_dashboard(db)
+    if "name" in update_data:
+        await invalidate_brief(db, contact_id)
+    if update_data.keys() & {"name", "is_pinned", "frequency_days", "is_archived"}:
+        brief_prefetcher.notify([contact_id])
     contact["connection_health"] = calc_connection_health(contact.get("last_interaction_at"), contact.get("frequency_days", 7))
     return ContactResponse(**contact)
 
+MAX_BATCH_OPERATIONS = 500
+
+@api_router.post("/contacts/batch", response_model=ContactBatchResult)
+async def batch_update_contacts(data: ContactBatchUpdate):
+    """Apply many (id, patch) updates with one bulk_write and read them back with one $in query"""
+    if len(data.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+    now = utcnow()
+    statuses, writes, changed_keys = {}, [], set()
+    for op in data.operations:
+        if op.id in statuses:  # reported as duplicate below
+            continue
+        update_data = {k: v for k, v in op.patch.dict().items() if v is not None}
+        if not update_data:
+            statuses[op.id] = "empty"
+            continue
+        statuses[op.id] = "pending"
+        changed_keys |= update_data.keys()
+        writes.append(UpdateOne({"id": op.id}, due_update({**update_data, "updated_at": now})))
+    if writes:
+        await db.contacts.bulk_write(writes, ordered=False)
+
+    pending = [i for i, status in statuses.items() if status == "pending"]
+    contacts = await db.contacts.aggregate(
+        health_pipeline({"id": {"$in": pending}}, datetime.now(timezone.utc))
+    ).to_list(len(pending)) if pending else []
+    by_id = {c["id"]: c for c in contacts}
+
+    items, seen = [], set()
+    for op in data.operations:
+        if op.id in seen:
+            items.append(ContactBatchItem(id=op.id, status="duplicate"))
+            continue
+        seen.add(op.id)
+        if statuses[op.id] == "empty":
+            items.append(ContactBatchItem(id=op.id, status="empty"))
+        elif op.id in by_id:
+            items.append(ContactBatchItem(id=op.id, status="updated", contact=ContactResponse(**by_id[op.id])))
+        else:
+            items.append(ContactBatchItem(id=op.id, status="not_found"))
+
+    if by_id:
+        await invalidate_dashboard(db)
+        renamed = [op.id for op in data.operations if op.patch.name is not None and op.id in by_id]
+        if renamed:
+            await invalidate_briefs(db, renamed)
+        if changed_keys & {"name", "is_pinned", "frequency_days", "is_archived"}:
+            brief_prefetcher.notify(by_id)
+    return ContactBatchResult(items=items, updated=len(by_id))
+
 @api_router.delete("/contacts/{contact_id}")
 async def delete_contact(contact_id: str):
     result = await db.contacts.delete_one({"id": contact_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
     await db.interactions.delete_many({"contact_id": contact_id})
+    await delete_brief(db, contact_id)
+    await invalidate_dashboard(db)
     return {"message": "Contact deleted"}
 
 # --- INTERACTIONS ---
 @api_router.post("/interactions", response_model=InteractionResponse)
 async def create_interaction(data: InteractionCreate):
     text_to_analyze = data.notes or data.voice_transcript or ""
-    ai_result = {}
-    if text_to_analyze and len(text_to_analyze) > 10:
-        ai_result = await ai_summarize(text_to_analyze)
+    needs_enrichment = len(text_to_analyze) > 10
 
     interaction = {
         "id": str(uuid.uuid4()),
@@ -345,20 +524,27 @@ async def create_interaction(data: InteractionCreate):
         "interaction_type": data.interaction_type,
         "notes": data.notes,
         "voice_transcript": data.voice_transcript,
-        "ai_summary": ai_result.get("summary", ""),
-        "key_highlights": ai_result.get("key_highlights", []),
-        "action_items": ai_result.get("action_items", []),
-        "emotional_cues": ai_result.get("emotional_cues", []),
-        "promises": ai_result.get("promises", []),
-        "important_dates": ai_result.get("important_dates", []),
+        "ai_summary": "",
+        "key_highlights": [],
+        "action_items": [],
+        "emotional_cues": [],
+        "promises": [],
+        "important_dates": [],
         "duration_minutes": data.duration_minutes,
-        "created_at": now_iso(),
+        "enrichment_status": PENDING if needs_enrichment else SKIPPED,
+        "created_at": utcnow(),
     }
     await db.interactions.insert_one({**interaction, "_id": interaction["id"]})
-    await db.contacts.update_one(
-        {"id": data.contact_id},
-        {"$set": {"last_interaction_at": now_iso(), "updated_at": now_iso()}, "$inc": {"interaction_count": 1}}
-    )
+    if needs_enrichment:
+        await enqueue_enrichment(db, interaction["id"], text_to_analyze)
+        enrichment_worker.notify()
+    await db.contacts.update_one({"id": data.contact_id}, due_update(
+        {"last_interaction_at": interaction["created_at"], "updated_at": interaction["created_at"]},
+        {"interaction_count": {"$add": [{"$ifNull": ["$interaction_count", 0]}, 1]}},
+    ))
+    await invalidate_dashboard(db)
+    await invalidate_brief(db, data.contact_id)
+    brief_prefetcher.notify([data.contact_id])
     return InteractionResponse(**interaction)
 
 @api_router.get("/interactions/{contact_id}", response_model=List[InteractionResponse])
@@ -368,154 +554,196 @@ async def get_interactions(contact_id: str, limit: int = 20):
     ).sort("created_at", -1).to_list(limit)
     return [InteractionResponse(**i) for i in interactions]
 
+@api_router.get("/interactions/{contact_id}/page", response_model=InteractionPage)
+async def get_interactions_page(contact_id: str, cursor: Optional[str] = None, limit: int = 50):
+    """Keyset-paginated interaction history, newest first; pass next_cursor back to continue"""
+    try:
+        interactions, next_cursor = await fetch_page(
+            db.interactions, {"contact_id": contact_id}, INTERACTIONS_SORT, cursor, clamp_page_size(limit)
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return InteractionPage(items=[InteractionResponse(**i) for i in interactions], next_cursor=next_cursor)
+
+@api_router.get("/interactions/{interaction_id}/enrichment")
+async def get_interaction_enrichment(interaction_id: str, wait: float = 0):
+    """Poll AI enrichment of an interaction; `wait` long-polls up to that many seconds (max 30) for it to settle"""
+    deadline = asyncio.get_running_loop().time() + min(max(wait, 0), 30)
+    while True:
+        interaction = await db.interactions.find_one({"id": interaction_id}, {"_id": 0})
+        if not interaction:
+            raise HTTPException(status_code=404, detail="Interaction not found")
+        if interaction.get("enrichment_status", COMPLETE) != PENDING or asyncio.get_running_loop().time() >= deadline:
+            return InteractionResponse(**interaction)
+        await asyncio.sleep(0.5)
+
 # --- VOICE TRANSCRIPTION ---
+voice_uploads = UploadLimiter(VOICE_MAX_CONCURRENT_UPLOADS)
+
+async def whisper_transcribe(audio) -> str:
+    from emergentintegrations.llm.openai import OpenAISpeechToText
+    stt = OpenAISpeechToText(api_key=EMERGENT_LLM_KEY)
+    response = await stt.transcribe(file=audio, model="whisper-1", response_format="json", language="en")
+    return response.text
+
+transcriber = Transcriber(whisper_transcribe, concurrency=VOICE_TRANSCRIBE_CONCURRENCY, segment_seconds=VOICE_SEGMENT_SECONDS)
+transcript_cache = TranscriptCache(db, ttl=timedelta(days=VOICE_TRANSCRIPT_TTL_DAYS))
+
 @api_router.post("/voice/transcribe")
-async def transcribe_voice(file: UploadFile = File(...)):
+async def transcribe_voice(request: Request):
+    """Transcribe the multipart `file` part; the upload is streamed and capped at VOICE_MAX_UPLOAD_MB, and audio already transcribed is answered from the cache"""
     try:
-        from emergentintegrations.llm.openai import OpenAISpeechToText
-        stt = OpenAISpeechToText(api_key=EMERGENT_LLM_KEY)
-        contents = await file.read()
-        suffix = Path(file.filename).suffix if file.filename else ".wav"
-        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
-            tmp.write(contents)
-            tmp_path = tmp.name
-        with open(tmp_path, "rb") as audio_file:
-            response = await stt.transcribe(file=audio_file, model="whisper-1", response_format="json", language="en")
-        os.unlink(tmp_path)
-        return {"transcript": response.text}
+        with voice_uploads.slot():
+            buffer = await receive_audio(request.headers, request.stream(), VOICE_MAX_UPLOAD_MB * 1024 * 1024, VOICE_IN_MEMORY_KB * 1024)
+            async with buffer:
+                transcript = await transcript_cache.transcribe(buffer.sha256, buffer.size, lambda: transcriber.transcribe(buffer))
+        return {"transcript": transcript}
+    except UploadsBusy:
+        raise HTTPException(status_code=429, detail="Too many voice uploads in progress, try again shortly", headers={"Retry-After": "5"})
+    except AudioTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e) or f"Audio larger than {VOICE_MAX_UPLOAD_MB} MB")
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Transcription error: {e}")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
 # --- AI CALL PREP ---
-@api_router.get("/ai/call-prep/{contact_id}")
-async def get_call_prep(contact_id: str):
+async def call_prep_context(contact_id: str) -> tuple:
     contact = await db.contacts.find_one({"id": contact_id}, {"_id": 0})
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     interactions = await db.interactions.find(
         {"contact_id": contact_id}, {"_id": 0}
     ).sort("created_at", -1).to_list(5)
+    return contact, interactions
+
+NO_INTERACTIONS_PREP = {
+    "recap": "No previous interactions recorded yet.",
+    "follow_ups": ["Get to know them better", "Ask about their day"],
+    "important_dates": [],
+    "conversation_starters": ["How have you been?", "What's new with you?"],
+    "emotional_note": "This is a fresh connection — be warm and open!"
+}
+
+@api_router.get("/ai/call-prep/{contact_id}")
+async def get_call_prep(contact_id: str):
+    brief = await get_brief(db, contact_id)
+    if brief:
+        return brief
+    contact, interactions = await call_prep_context(contact_id)
     if not interactions:
-        return {
-            "contact_name": contact["name"],
-            "recap": "No previous interactions recorded yet.",
-            "follow_ups": ["Get to know them better", "Ask about their day"],
-            "important_dates": [],
-            "conversation_starters": ["How have you been?", "What's new with you?"],
-            "emotional_note": "This is a fresh connection — be warm and open!"
-        }
+        return {"contact_name": contact["name"], **NO_INTERACTIONS_PREP}
     prep = await ai_call_prep(contact["name"], interactions)
     prep["contact_name"] = contact["name"]
     return prep
 
+@api_router.get("/ai/call-prep/{contact_id}/stream")
+async def stream_call_prep(contact_id: str):
+    """SSE variant of /ai/call-prep: one `field` event per brief field as soon as it is generated"""
+    brief = await get_brief(db, contact_id)
+    if brief:
+        events = sse_fields(_no_chunks(), {}, {"contact_name": brief["contact_name"], **brief})
+        return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+    contact, interactions = await call_prep_context(contact_id)
+    if not interactions:
+        events = sse_fields(_no_chunks(), {}, {"contact_name": contact["name"], **NO_INTERACTIONS_PREP})
+    else:
+        chunks = llm.stream("call_prep", *call_prep_messages(contact["name"], interactions))
+        events = sse_fields(chunks, CALL_PREP_FALLBACK, {"contact_name": contact["name"]})
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
 # --- AI INSIGHTS ---
+NO_CONTACTS_INSIGHTS = {
+    "overall_insight": "Add some contacts to start tracking your relationships!",
+    "drift_alerts": [],
+    "category_balance": {},
+    "suggestions": ["Add your first contact to get started"],
+    "encouragement": "Every journey begins with a single step!"
+}
+
+def insights_numbers(analysis: dict) -> dict:
+    return {key: analysis[key] for key in ["drift_alerts", "category_balance", "suggestions", "overdue_distribution", "stats"]}
+
 @api_router.get("/ai/insights")
 async def get_insights():
-    contacts = await db.contacts.find({"is_archived": False}, {"_id": 0}).to_list(100)
-    for c in contacts:
-        c["connection_health"] = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
-    if not contacts:
-        return {
-            "overall_insight": "Add some contacts to start tracking your relationships!",
-            "drift_alerts": [],
-            "category_balance": {},
-            "suggestions": ["Add your first contact to get started"],
-            "encouragement": "Every journey begins with a single step!"
-        }
-    insights = await ai_insights(contacts)
-    return insights
+    analysis = await compute_analytics(db)
+    if not analysis:
+        return dict(NO_CONTACTS_INSIGHTS)
+    try:
+        prose = await insight_prose(db, analysis, ai_insight_prose)
+    except Exception as e:
+        logger.error(f"AI insights error: {e}")
+        prose = INSIGHTS_PROSE_FALLBACK
+    return {**prose, **insights_numbers(analysis)}
+
+async def _store_streamed_prose(chunks, fingerprint: str):
+    """Pass the model's text through, then keep the prose for this fingerprint if it parsed"""
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    try:
+        prose = parse_insight_prose("".join(parts))
+    except ValueError:
+        return
+    await store_prose(db, fingerprint, prose)
+
+@api_router.get("/ai/insights/stream")
+async def stream_insights():
+    """SSE variant of /ai/insights: the computed numbers at once, then the prose as it is written"""
+    analysis = await compute_analytics(db)
+    if not analysis:
+        events = sse_fields(_no_chunks(), {}, NO_CONTACTS_INSIGHTS)
+        return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+    numbers = insights_numbers(analysis)
+    prose = await get_prose(db, analysis["fingerprint"])
+    if prose:
+        events = sse_fields(_no_chunks(), {}, {**prose, **numbers})
+    else:
+        chunks = _store_streamed_prose(llm.stream("insights", *insights_messages(analysis["digest"]), validate=parse_insight_prose), analysis["fingerprint"])
+        events = sse_fields(chunks, INSIGHTS_PROSE_FALLBACK, numbers)
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
 
 # --- CONVERSATION PROMPTS ---
-@api_router.get("/ai/prompts/{contact_id}")
-async def get_prompts(contact_id: str, mode: str = "deep"):
+async def prompts_context(contact_id: str) -> tuple:
     contact = await db.contacts.find_one({"id": contact_id}, {"_id": 0})
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     interactions = await db.interactions.find(
         {"contact_id": contact_id}, {"_id": 0}
     ).sort("created_at", -1).to_list(3)
+    return contact, interactions
+
+@api_router.get("/ai/prompts/{contact_id}")
+async def get_prompts(contact_id: str, mode: str = "deep"):
+    contact, interactions = await prompts_context(contact_id)
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
-        context = "\n".join([i.get("notes", "") or i.get("ai_summary", "") for i in interactions]) if interactions else "No previous interactions"
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"prompts-{uuid.uuid4()}",
-            system_message=f"""Generate {mode} conversation prompts for reaching out to {contact['name']} ({contact['relationship_tag']}).
-Return a JSON array of 5 strings, each a warm conversation prompt.
-Return ONLY a JSON array, no other text."""
-        )
-        chat.with_model("gemini", "gemini-3-flash-preview")
-        response = await chat.send_message(UserMessage(text=f"Recent context: {context}"))
-        cleaned = response.strip()
-        if cleaned.startswith("```"):
-            cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-        prompts = json.loads(cleaned)
+        response = await llm.complete("prompts", *prompts_messages(contact, interactions, mode))
+        prompts = extract_json(response)
         return {"prompts": prompts, "mode": mode}
     except Exception as e:
         logger.error(f"Prompts error: {e}")
-        return {"prompts": ["How have you been?", "What's been on your mind lately?", "I've been thinking about you!"], "mode": mode}
+        return {"prompts": list(PROMPTS_FALLBACK), "mode": mode}
+
+@api_router.get("/ai/prompts/{contact_id}/stream")
+async def stream_prompts(contact_id: str, mode: str = "deep"):
+    """SSE variant of /ai/prompts: one `item` event per prompt"""
+    contact, interactions = await prompts_context(contact_id)
+    chunks = llm.stream("prompts", *prompts_messages(contact, interactions, mode))
+    return StreamingResponse(
+        sse_fields(chunks, {"prompts": PROMPTS_FALLBACK}, {"mode": mode}, array_field="prompts"),
+        media_type="text/event-stream", headers=SSE_HEADERS,
+    )
+
+async def _no_chunks():
+    return
+    yield
 
 # --- DASHBOARD ---
 @api_router.get("/dashboard")
 async def get_dashboard():
-    contacts = await db.contacts.find({"is_archived": False}, {"_id": 0}).to_list(500)
-    total = len(contacts)
-    if total == 0:
-        return {
-            "overall_score": 0,
-            "total_contacts": 0,
-            "needs_attention": [],
-            "suggested_contact": None,
-            "weekly_interactions": 0,
-            "monthly_interactions": 0,
-            "category_breakdown": {},
-        }
-
-    scores = []
-    needs_attention = []
-    for c in contacts:
-        health = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
-        c["connection_health"] = health
-        scores.append(health)
-        if health < 30:
-            needs_attention.append({"id": c["id"], "name": c["name"], "health": health, "relationship_tag": c["relationship_tag"]})
-
-    overall_score = round(sum(scores) / len(scores), 1) if scores else 0
-
-    needs_attention.sort(key=lambda x: x["health"])
-    needs_attention = needs_attention[:5]
-
-    # Suggested contact: lowest health pinned first, then lowest health
-    pinned = [c for c in contacts if c.get("is_pinned")]
-    pool = pinned if pinned else contacts
-    suggested = min(pool, key=lambda c: c.get("connection_health", 0)) if pool else None
-    suggested_contact = None
-    if suggested:
-        suggested_contact = {"id": suggested["id"], "name": suggested["name"], "health": suggested.get("connection_health", 0), "relationship_tag": suggested["relationship_tag"]}
-
-    week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-    month_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-    weekly_count = await db.interactions.count_documents({"created_at": {"$gte": week_ago}})
-    monthly_count = await db.interactions.count_documents({"created_at": {"$gte": month_ago}})
-
-    categories = {}
-    for c in contacts:
-        tag = c.get("relationship_tag", "Other")
-        categories[tag] = categories.get(tag, 0) + 1
-
-    return {
-        "overall_score": overall_score,
-        "total_contacts": total,
-        "needs_attention": needs_attention,
-        "suggested_contact": suggested_contact,
-        "weekly_interactions": weekly_count,
-        "monthly_interactions": monthly_count,
-        "category_breakdown": categories,
-    }
+    return await get_dashboard_snapshot(db, DASHBOARD_MAX_AGE)
 
 # --- GOALS ---
 @api_router.post("/goals", response_model=GoalResponse)
@@ -528,7 +756,7 @@ async def create_goal(data: GoalCreate):
         "progress": 0.0,
         "status": "active",
         "target_date": data.target_date,
-        "created_at": now_iso(),
+        "created_at": utcnow(),
     }
     await db.goals.insert_one({**goal, "_id": goal["id"]})
     return GoalResponse(**goal)
@@ -590,18 +818,51 @@ async def update_settings(data: SettingsUpdate):
 
 # --- DATA EXPORT & DELETE ---
 @api_router.get("/data/export")
-async def export_data():
-    contacts = await db.contacts.find({}, {"_id": 0}).to_list(1000)
-    interactions = await db.interactions.find({}, {"_id": 0}).to_list(5000)
-    goals = await db.goals.find({}, {"_id": 0}).to_list(100)
-    settings = await db.settings.find_one({"id": "default"}, {"_id": 0})
-    return {
-        "contacts": contacts,
-        "interactions": interactions,
-        "goals": goals,
-        "settings": settings,
-        "exported_at": now_iso(),
-    }
+async def export_data(format: str = "json", gzip: bool = False, resume: Optional[str] = None):
+    """Streams every contact, interaction and goal. format=ndjson adds resumable checkpoints; gzip compresses on the fly"""
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+    if format == "json":
+        if resume:
+            raise HTTPException(status_code=400, detail="resume requires format=ndjson")
+        chunks, media_type = json_chunks(db), "application/json"
+    else:
+        if resume:
+            try:
+                decode_checkpoint(resume)
+            except InvalidCursor:
+                raise HTTPException(status_code=400, detail="Invalid resume token")
+        chunks, media_type = ndjson_chunks(db, resume), "application/x-ndjson"
+    filename = f"touch-export-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(gzip_chunks(chunks), media_type=media_type, headers=headers)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@api_router.post("/data/import")
+async def import_data(
+    file: UploadFile = File(...), format: Optional[str] = None, kind: Optional[str] = None, enrich: bool = False,
+):
+    """Bulk import contacts / interactions from NDJSON or CSV. Returns a per-row error report"""
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    if kind not in (None, "contact", "interaction"):
+        raise HTTPException(status_code=400, detail="kind must be contact or interaction")
+    if fmt == "csv" and not kind:
+        raise HTTPException(status_code=400, detail="CSV imports need kind=contact or kind=interaction")
+    report = ImportReport()
+    try:
+        await import_file(db, file.file, fmt, kind, enrich=enrich, avatar_colors=AVATAR_COLORS, report=report)
+    finally:
+        # Rows written before a failure are live data too.
+        if report.inserted["contact"] or report.inserted["interaction"]:
+            await invalidate_dashboard(db)
+            await invalidate_briefs(db, list(report.touched_contacts))
+        if report.enrichment_queued:
+            enrichment_worker.notify()
+    return report.as_dict()
 
 @api_router.delete("/data/delete-all")
 async def delete_all_data():
@@ -609,15 +870,39 @@ async def delete_all_data():
     await db.interactions.delete_many({})
     await db.goals.delete_many({})
     await db.settings.delete_many({})
+    await db.enrichment_jobs.delete_many({})
+    await db.call_prep_briefs.delete_many({})
+    await invalidate_dashboard(db)
     return {"message": "All data deleted"}
 
 # --- SEED DATA ---
 @api_router.post("/seed")
-async def seed_data():
+async def seed_data(contacts: Optional[int] = None, interactions: Optional[int] = None, seed: int = 42):
+    """Without parameters, seeds six sample contacts. With `contacts` (and optionally
+    `interactions`) it generates a synthetic dataset of that size from `seed`;
+    larger datasets are built with `python synthetic.py`."""
+    synthetic = contacts is not None or interactions is not None
+    if synthetic:
+        contacts = contacts if contacts is not None else 100
+        interactions = interactions if interactions is not None else contacts * 10
+        if not 0 < contacts <= SEED_MAX_CONTACTS or not 0 <= interactions <= SEED_MAX_INTERACTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"contacts must be 1-{SEED_MAX_CONTACTS} and interactions 0-{SEED_MAX_INTERACTIONS}; use synthetic.py for larger datasets",
+            )
+
     existing = await db.contacts.count_documents({})
     if existing > 0:
         return {"message": "Data already seeded", "count": existing}
 
+    if synthetic:
+        result = await generate_dataset(db, contacts, interactions, seed=seed, avatar_colors=AVATAR_COLORS)
+        await invalidate_dashboard(db)
+        return {
+            "message": f"Generated {result['contacts']} contacts with {result['interactions']} interactions",
+            **result,
+        }
+
     import random
     sample_contacts = [
         {"name": "Mom", "relationship_tag": "Family", "frequency_days": 3, "is_pinned": True, "phone": "+1234567890"},
@@ -628,10 +913,10 @@ async def seed_data():
         {"name": "Jamie", "relationship_tag": "Partner", "frequency_days": 1, "is_pinned": True, "phone": "+1234567895"},
     ]
 
-    created = []
+    created, contact_docs, interaction_docs = [], [], []
     for sc in sample_contacts:
         days_ago = random.randint(0, sc["frequency_days"] * 2)
-        last_dt = (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat()
+        last_dt = utcnow() - timedelta(days=days_ago)
         contact = {
             "id": str(uuid.uuid4()),
             "name": sc["name"],
@@ -646,11 +931,12 @@ async def seed_data():
             "last_interaction_at": last_dt,
             "interaction_count": random.randint(1, 15),
             "connection_health": 0,
-            "created_at": now_iso(),
-            "updated_at": now_iso(),
+            "created_at": utcnow(),
+            "updated_at": utcnow(),
         }
         contact["connection_health"] = calc_connection_health(contact["last_interaction_at"], contact["frequency_days"])
-        await db.contacts.insert_one({**contact, "_id": contact["id"]})
+        contact.update(due_fields(contact["last_interaction_at"], contact["frequency_days"], contact["created_at"]))
+        contact_docs.append({**contact, "_id": contact["id"]})
         created.append(contact["id"])
 
         # Seed some interactions
@@ -675,9 +961,13 @@ async def seed_data():
                 "promises": [],
                 "important_dates": [],
                 "duration_minutes": random.randint(5, 45),
-                "created_at": (datetime.now(timezone.utc) - timedelta(days=inter_days_ago)).isoformat(),
+                "created_at": utcnow() - timedelta(days=inter_days_ago),
             }
-            await db.interactions.insert_one({**interaction, "_id": interaction["id"]})
+            interaction_docs.append({**interaction, "_id": interaction["id"]})
+
+    await db.contacts.insert_many(contact_docs)
+    await db.interactions.insert_many(interaction_docs)
+    await invalidate_dashboard(db)
 
     # Set onboarding as not completed
     await db.settings.update_one(
@@ -691,46 +981,54 @@ async def seed_data():
 # --- NOTIFICATIONS/REMINDERS ---
 @api_router.get("/notifications/pending")
 async def get_pending_reminders():
-    contacts = await db.contacts.find({"is_archived": False}, {"_id": 0}).to_list(500)
     settings = await db.settings.find_one({"id": "default"}, {"_id": 0})
     low_pressure = settings.get("low_pressure_mode", False) if settings else False
     intensity = settings.get("notification_intensity", 50) if settings else 50
 
+    health_filter = {"$lt": 40}
+    if low_pressure:
+        health_filter["$lte"] = 20
+    if intensity < 30:
+        health_filter["$lte"] = min(health_filter.get("$lte", 25), 25)
+    now = datetime.now(timezone.utc)
+    pipeline = [
+        {"$match": attention_filter(now)},
+        *health_stages(now, with_overdue=True),
+        {"$match": {"connection_health": health_filter}},
+        {"$facet": {
+            "rows": [
+                {"$sort": {"connection_health": 1, "_id": 1}},
+                {"$limit": 10},
+                {"$project": {"_id": 0, "id": 1, "name": 1, "relationship_tag": 1, "avatar_color": 1, "connection_health": 1, "days_overdue": 1}},
+            ],
+            "total": [{"$count": "n"}],
+        }},
+    ]
+    result = (await db.contacts.aggregate(pipeline).to_list(1))[0]
+    total = result["total"][0]["n"] if result["total"] else 0
+
     reminders = []
-    for c in contacts:
-        health = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
-        if health < 40:
-            priority = "gentle"
-            if health < 15:
-                priority = "warm"
-            if low_pressure and health > 20:
-                continue
-            if intensity < 30 and health > 25:
-                continue
-            days_overdue = 0
-            if c.get("last_interaction_at"):
-                last = datetime.fromisoformat(c["last_interaction_at"].replace('Z', '+00:00'))
-                elapsed = (datetime.now(timezone.utc) - last).total_seconds() / 86400
-                days_overdue = max(0, int(elapsed - c.get("frequency_days", 7)))
-            messages = {
-                "gentle": f"It's been a while since you connected with {c['name']}. Maybe a quick message?",
-                "warm": f"{c['name']} might appreciate hearing from you today.",
-            }
-            reminders.append({
-                "id": f"reminder-{c['id']}",
-                "contact_id": c["id"],
-                "contact_name": c["name"],
-                "relationship_tag": c.get("relationship_tag", "Other"),
-                "message": messages[priority],
-                "health": health,
-                "days_overdue": days_overdue,
-                "priority": priority,
-                "status": "pending",
-                "avatar_color": c.get("avatar_color", "#40916C"),
-            })
-
-    reminders.sort(key=lambda x: x["health"])
-    return {"reminders": reminders[:10], "total": len(reminders)}
+    for c in result["rows"]:
+        health = c["connection_health"]
+        priority = "warm" if health < 15 else "gentle"
+        messages = {
+            "gentle": f"It's been a while since you connected with {c['name']}. Maybe a quick message?",
+            "warm": f"{c['name']} might appreciate hearing from you today.",
+        }
+        reminders.append({
+            "id": f"reminder-{c['id']}",
+            "contact_id": c["id"],
+            "contact_name": c["name"],
+            "relationship_tag": c.get("relationship_tag", "Other"),
+            "message": messages[priority],
+            "health": health,
+            "days_overdue": int(c.get("days_overdue", 0)),
+            "priority": priority,
+            "status": "pending",
+            "avatar_color": c.get("avatar_color", "#40916C"),
+        })
+
+    return {"reminders": reminders, "total": total}
 
 # --- SHARED MODE ---
 @api_router.post("/shared/invite")
@@ -742,7 +1040,7 @@ async def create_shared_invite(data: SharedInvite):
         "shared_contact_ids": data.shared_contact_ids,
         "mode": data.mode,
         "status": "pending",
-        "created_at": now_iso(),
+        "created_at": utcnow(),
     }
     await db.shared_invites.insert_one({**invite, "_id": invite["id"]})
     return invite
@@ -760,9 +1058,9 @@ async def get_shared_contacts():
         shared_ids.extend(inv.get("shared_contact_ids", []))
     if not shared_ids:
         return {"contacts": [], "partner": None}
-    contacts = await db.contacts.find({"id": {"$in": shared_ids}}, {"_id": 0}).to_list(100)
-    for c in contacts:
-        c["connection_health"] = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
+    contacts = await db.contacts.aggregate(
+        health_pipeline({"id": {"$in": shared_ids}}, datetime.now(timezone.utc), limit=100)
+    ).to_list(100)
     return {"contacts": contacts, "partner": invites[0].get("partner_name") if invites else None}
 
 # --- CALENDAR/AVAILABILITY ---
@@ -773,35 +1071,23 @@ async def suggest_call_times(contact_id: str):
         raise HTTPException(status_code=404, detail="Contact not found")
     interactions = await db.interactions.find({"contact_id": contact_id}, {"_id": 0}).sort("created_at", -1).to_list(10)
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
         interaction_times = []
         for i in interactions:
             try:
-                dt = datetime.fromisoformat(i["created_at"].replace('Z', '+00:00'))
+                dt = as_datetime(i["created_at"])
                 interaction_times.append(f"{dt.strftime('%A')} at {dt.strftime('%I:%M %p')}")
             except Exception:
                 pass
         time_patterns = ", ".join(interaction_times[:5]) if interaction_times else "No pattern data available"
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"calendar-{uuid.uuid4()}",
-            system_message="""You are a scheduling assistant for Touch, a relationship CRM.
+        system_message = """You are a scheduling assistant for Touch, a relationship CRM.
 Based on past interaction patterns, suggest optimal call times.
 Return JSON with:
 - "suggested_times": Array of 3 objects with "day" (e.g. "Monday"), "time" (e.g. "6:30 PM"), "reason" (brief)
 - "best_duration": Suggested call duration in minutes
 - "availability_tip": One gentle scheduling tip
 Return ONLY valid JSON."""
-        )
-        chat.with_model("gemini", "gemini-3-flash-preview")
-        response = await chat.send_message(UserMessage(text=f"Past interaction times for {contact['name']} ({contact['relationship_tag']}): {time_patterns}. Frequency goal: every {contact['frequency_days']} days."))
-        cleaned = response.strip()
-        if cleaned.startswith("```"):
-            cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-        result = json.loads(cleaned)
+        response = await llm.complete("calendar", system_message, f"Past interaction times for {contact['name']} ({contact['relationship_tag']}): {time_patterns}. Frequency goal: every {contact['frequency_days']} days.")
+        result = extract_json(response)
         result["contact_name"] = contact["name"]
         return result
     except Exception as e:
@@ -851,9 +1137,10 @@ async def upgrade_premium(tier: str = "plus"):
 # --- WIDGET DATA ---
 @api_router.get("/widget/data")
 async def get_widget_data():
-    contacts = await db.contacts.find({"is_pinned": True, "is_archived": False}, {"_id": 0}).to_list(4)
-    for c in contacts:
-        c["connection_health"] = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
+    contacts = await db.contacts.aggregate(health_pipeline(
+        {"is_archived": False, "is_pinned": True}, datetime.now(timezone.utc), limit=4,
+        project={"name": 1, "avatar_color": 1, "relationship_tag": 1, "connection_health": 1},
+    )).to_list(4)
     dashboard = await get_dashboard()
     return {
         "pinned_contacts": [
@@ -889,7 +1176,7 @@ async def create_razorpay_order(plan_id: str = "plus"):
             "test_mode": True,
         }
         await db.orders.insert_one({
-            **order_data, "_id": order_id, "status": "created", "created_at": now_iso(),
+            **order_data, "_id": order_id, "status": "created", "created_at": utcnow(),
         })
         return order_data
 
@@ -912,7 +1199,7 @@ async def create_razorpay_order(plan_id: str = "plus"):
             "test_mode": False,
         }
         await db.orders.insert_one({
-            **order_data, "_id": order["id"], "status": "created", "created_at": now_iso(),
+            **order_data, "_id": order["id"], "status": "created", "created_at": utcnow(),
         })
         return order_data
     except Exception as e:
@@ -935,7 +1222,7 @@ async def verify_razorpay_payment(
         # Test mode - auto-verify
         await db.orders.update_one(
             {"order_id": razorpay_order_id},
-            {"$set": {"status": "paid", "payment_id": razorpay_payment_id, "paid_at": now_iso()}},
+            {"$set": {"status": "paid", "payment_id": razorpay_payment_id, "paid_at": utcnow()}},
         )
         await db.settings.update_one({"id": "default"}, {"$set": {"premium_tier": plan_id}}, upsert=True)
 
@@ -947,8 +1234,8 @@ async def verify_razorpay_payment(
             "status": "active",
             "amount": order.get("amount", 0),
             "currency": order.get("currency", "INR"),
-            "started_at": now_iso(),
-            "expires_at": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
+            "started_at": utcnow(),
+            "expires_at": utcnow() + timedelta(days=30),
         }
         await db.subscriptions.insert_one({**sub, "_id": sub["id"]})
         return {"verified": True, "plan_id": plan_id, "message": "Subscription activated (test mode)"}
@@ -966,7 +1253,7 @@ async def verify_razorpay_payment(
 
         await db.orders.update_one(
             {"order_id": razorpay_order_id},
-            {"$set": {"status": "paid", "payment_id": razorpay_payment_id, "signature": razorpay_signature, "paid_at": now_iso()}},
+            {"$set": {"status": "paid", "payment_id": razorpay_payment_id, "signature": razorpay_signature, "paid_at": utcnow()}},
         )
         await db.settings.update_one({"id": "default"}, {"$set": {"premium_tier": plan_id}}, upsert=True)
 
@@ -978,8 +1265,8 @@ async def verify_razorpay_payment(
             "status": "active",
             "amount": order.get("amount", 0),
             "currency": order.get("currency", "INR"),
-            "started_at": now_iso(),
-            "expires_at": (datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
+            "started_at": utcnow(),
+            "expires_at": utcnow() + timedelta(days=30),
         }
         await db.subscriptions.insert_one({**sub, "_id": sub["id"]})
         return {"verified": True, "plan_id": plan_id, "message": "Subscription activated"}
@@ -998,7 +1285,7 @@ async def get_subscription():
 
 @api_router.post("/payment/cancel")
 async def cancel_subscription():
-    await db.subscriptions.update_many({"status": "active"}, {"$set": {"status": "cancelled", "cancelled_at": now_iso()}})
+    await db.subscriptions.update_many({"status": "active"}, {"$set": {"status": "cancelled", "cancelled_at": utcnow()}})
     await db.settings.update_one({"id": "default"}, {"$set": {"premium_tier": "free"}})
     return {"message": "Subscription cancelled", "plan_id": "free"}
 
@@ -1015,7 +1302,7 @@ async def register_push_token(data: PushTokenRegister):
         "token": data.token,
         "device_id": data.device_id or str(uuid.uuid4()),
         "platform": data.platform or "unknown",
-        "registered_at": now_iso(),
+        "registered_at": utcnow(),
     }
     await db.push_tokens.update_one(
         {"token": data.token},
@@ -1024,79 +1311,72 @@ async def register_push_token(data: PushTokenRegister):
     )
     return {"registered": True, "token": data.token}
 
+push_client = ExpoPushClient(
+    EXPO_PUSH_URL,
+    concurrency=PUSH_CONCURRENCY,
+    on_tickets=lambda messages, tickets: record_tickets(db, messages, tickets),
+)
+receipt_poller = ReceiptPoller(db, push_client, interval_seconds=PUSH_RECEIPT_POLL_SECONDS)
+
+reminder_scheduler = ReminderScheduler(
+    db,
+    push_client.send,
+    interval_seconds=REMINDER_INTERVAL_SECONDS,
+    cooldown_hours=REMINDER_COOLDOWN_HOURS,
+)
+
 @api_router.post("/push/send")
 async def send_push_notification(title: str, body: str, data: Optional[dict] = None):
     """Send push notification to all registered devices via Expo Push Service"""
-    import httpx
-    tokens = await db.push_tokens.find({}, {"_id": 0}).to_list(100)
-    if not tokens:
-        return {"sent": 0, "message": "No registered devices"}
-
-    messages = []
-    for t in tokens:
-        msg = {"to": t["token"], "title": title, "body": body, "sound": "default"}
+    def build(token: str) -> dict:
+        msg = {"to": token, "title": title, "body": body, "sound": "default"}
         if data:
             msg["data"] = data
-        messages.append(msg)
+        return msg
 
-    try:
-        async with httpx.AsyncClient() as client_http:
-            response = await client_http.post(
-                "https://exp.host/--/api/v2/push/send",
-                json=messages,
-                headers={"Accept": "application/json", "Content-Type": "application/json"},
-            )
-            result = response.json()
-            return {"sent": len(messages), "response": result}
-    except Exception as e:
-        logger.error(f"Push send error: {e}")
-        return {"sent": 0, "error": str(e)}
+    result = await push_client.broadcast(registered_tokens(db), build)
+    if not result["sent"]:
+        return {"sent": 0, "message": "No registered devices"}
+    return result
 
 @api_router.post("/push/send-reminders")
 async def send_reminder_push_notifications():
-    """Send push notifications for contacts that need attention"""
-    import httpx
-    tokens = await db.push_tokens.find({}, {"_id": 0}).to_list(100)
-    if not tokens:
-        return {"sent": 0, "message": "No registered devices"}
-
-    contacts = await db.contacts.find({"is_archived": False}, {"_id": 0}).to_list(500)
-    settings = await db.settings.find_one({"id": "default"}, {"_id": 0})
-    low_pressure = settings.get("low_pressure_mode", False) if settings else False
-
-    reminders = []
-    for c in contacts:
-        health = calc_connection_health(c.get("last_interaction_at"), c.get("frequency_days", 7))
-        threshold = 20 if low_pressure else 40
-        if health < threshold:
-            reminders.append(c)
-
-    if not reminders:
-        return {"sent": 0, "message": "All connections healthy"}
-
-    messages = []
-    for r in reminders[:3]:
-        for t in tokens:
-            messages.append({
-                "to": t["token"],
-                "title": f"Touch — {r['name']}",
-                "body": f"{r['name']} might appreciate hearing from you today.",
-                "sound": "default",
-                "data": {"contactId": r["id"], "type": "reminder"},
-            })
-
-    try:
-        async with httpx.AsyncClient() as client_http:
-            response = await client_http.post(
-                "https://exp.host/--/api/v2/push/send",
-                json=messages,
-                headers={"Accept": "application/json", "Content-Type": "application/json"},
-            )
-            result = response.json()
-            return {"sent": len(messages), "contacts_notified": len(reminders[:3]), "response": result}
-    except Exception as e:
-        logger.error(f"Push reminders error: {e}")
-        return {"sent": 0, "error": str(e)}
+    """Run a reminder tick now instead of waiting for the scheduler; reminders sent within the cooldown are skipped"""
+    result = await reminder_scheduler.tick()
+    response = {"sent": result["sent"], "contacts_notified": result["contacts"], "devices": result["devices"], "failed": result["failed"]}
+    if not result["candidates"]:
+        response["message"] = "All connections healthy"
+    elif not result["devices"]:
+        response["message"] = "No registered devices"
+    elif not result["sent"] and not result["failed"]:
+        response["message"] = "Reminders already sent recently"
+    return response
+
+# --- ADMIN ---
+@api_router.get("/admin/indexes")
+async def get_index_report():
+    """Report registered indexes that are missing, unregistered or unused"""
+    return await index_report(db)
+
+@api_router.get("/admin/llm")
+async def get_llm_status():
+    """LLM gateway provider, in-flight calls, circuit breaker state and summary batching"""
+    return {**llm.stats(), "summary_batcher": summary_batcher.stats()}
+
+@api_router.get("/admin/llm-cache")
+async def get_llm_cache_stats():
+    """LLM response cache hit / miss counters for this process"""
+    return llm_cache.stats()
+
+@api_router.get("/admin/push")
+async def get_push_stats():
+    """Expo push chunks, retries and undelivered chunks, and receipt outcomes, for this process"""
+    return {**push_client.stats(), "receipts": receipt_poller.stats()}
+
+@api_router.get("/admin/voice")
+async def get_voice_stats():
+    """Voice uploads in progress and rejected, and transcript cache hit rate, for this process"""
+    return {"uploads": voice_uploads.stats(), "transcripts": transcript_cache.stats()}
 
 app.include_router(api_router)
 
@@ -1108,6 +1388,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+background_tasks = []
+
+@app.on_event("startup")
+async def startup_indexes():
+    await ensure_indexes(db)
+    await backfill_due_fields(db)
+
+@app.on_event("startup")
+async def startup_background_tasks():
+    background_tasks.append(asyncio.create_task(snapshot_refresher(db, DASHBOARD_REFRESH_SECONDS)))
+    background_tasks.extend(enrichment_worker.start())
+    background_tasks.append(asyncio.create_task(brief_prefetcher.run()))
+    push_client.start()
+    background_tasks.append(asyncio.create_task(reminder_scheduler.run()))
+    background_tasks.append(asyncio.create_task(receipt_poller.run()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    try:
+        await reminder_scheduler.release()
+    except Exception as e:
+        logger.warning(f"Reminder lease not released: {e}")
+    await push_client.close()
     client.close()
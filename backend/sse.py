@@ -0,0 +1,135 @@
+"""Server-Sent Events for streamed LLM responses.
+
+The AI endpoints ask the model for one JSON object (or array). While the
+response streams in, `JsonFieldParser` watches the top level of that document
+and hands back each member as soon as it is syntactically complete, so the
+client can render `recap` while `conversation_starters` is still being
+generated:
+
+    event: field
+    data: {"field": "recap", "value": "You last talked about..."}
+
+Array responses (prompts) produce one `item` event per element instead. The
+stream always ends with a `done` event; if the model failed or left fields
+out, the fallback values for the missing fields are sent first and `done`
+carries `"fallback": true`.
+"""
+import json
+import logging
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class JsonFieldParser:
+    """Incremental parser for the top level of a JSON object or array.
+
+    Anything before the first `{` or `[` (markdown fences, prose) is skipped.
+    `feed` returns the (key, value) pairs completed by the new text; array
+    elements are keyed by their index. Members that are not valid JSON are dropped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.root: Optional[str] = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.start = 0
+        self.index = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[Union[str, int], object]]:
+        self.buffer += chunk
+        completed = []
+        while self.pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self.pos]
+            if self.root is None:
+                if ch in "{[":
+                    self.root = ch
+                    self.depth = 1
+                    self.start = self.pos + 1
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._member(self.buffer[self.start:self.pos], completed)
+                    self.done = True
+            elif ch == "," and self.depth == 1:
+                self._member(self.buffer[self.start:self.pos], completed)
+                self.start = self.pos + 1
+            self.pos += 1
+        return completed
+
+    def _member(self, segment: str, completed: list):
+        segment = segment.strip()
+        if not segment:
+            return
+        try:
+            if self.root == "{":
+                (key, value), = json.loads("{" + segment + "}").items()
+                completed.append((key, value))
+            else:
+                completed.append((self.index, json.loads(segment)))
+                self.index += 1
+        except ValueError:
+            logger.debug(f"Skipping malformed streamed member: {segment[:80]}")
+
+
+async def sse_fields(
+    chunks: AsyncIterator[str],
+    fallback: dict,
+    preamble: Optional[dict] = None,
+    array_field: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Turn streamed model text into SSE events.
+
+    `preamble` fields are sent before the model is called. For array responses
+    `array_field` names the fallback entry whose elements stand in when the model
+    produced none.
+    """
+    for key, value in (preamble or {}).items():
+        yield sse_event("field", {"field": key, "value": value})
+
+    parser = JsonFieldParser()
+    sent = set()
+    try:
+        async for chunk in chunks:
+            for key, value in parser.feed(chunk):
+                sent.add(key)
+                if array_field:
+                    yield sse_event("item", {"field": array_field, "index": key, "value": value})
+                else:
+                    yield sse_event("field", {"field": key, "value": value})
+    except Exception as e:
+        logger.error(f"Streamed AI response failed: {e}")
+
+    used_fallback = False
+    if array_field:
+        if not sent:
+            used_fallback = True
+            for index, value in enumerate(fallback[array_field]):
+                yield sse_event("item", {"field": array_field, "index": index, "value": value})
+    else:
+        for key, value in fallback.items():
+            if key not in sent:
+                used_fallback = True
+                yield sse_event("field", {"field": key, "value": value})
+    yield sse_event("done", {"fallback": used_fallback})
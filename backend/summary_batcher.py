@@ -0,0 +1,103 @@
+"""Micro-batching front end for interaction summaries.
+
+    summary = await batcher.summarize(text)
+
+Callers (the enrichment worker coroutines) each ask for one summary. Requests
+that arrive within `window_seconds` of each other are gathered into a batch of
+at most `max_items` texts / `max_tokens` estimated prompt tokens and sent to
+the model as one structured prompt that returns an array of results; each
+result is then handed back to the caller that asked for it. A lone request is
+sent through the single-item `summarize` call so it keeps sharing cache entries
+with the unbatched path.
+
+If the batch call fails every caller in it sees the exception (and the worker
+retries the job as usual). Items the model left out of its array fail on their
+own without affecting the rest of the batch.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size: ~4 characters per token."""
+    return len(text) // 4 + 1
+
+
+class SummaryBatcher:
+    def __init__(
+        self,
+        summarize: Callable[[str], Awaitable[dict]],
+        summarize_many: Callable[[List[str]], Awaitable[List[Optional[dict]]]],
+        window_seconds: float = 0.05,
+        max_items: int = 16,
+        max_tokens: int = 6000,
+    ):
+        self.summarize_one = summarize
+        self.summarize_many = summarize_many
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = {"requests": 0, "batches": 0, "batched_items": 0, "single_calls": 0, "failed_batches": 0}
+
+    async def summarize(self, text: str) -> dict:
+        tokens = estimate_tokens(text)
+        if self._pending and self._pending_tokens + tokens > self.max_tokens:
+            self._flush()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._pending_tokens += tokens
+        self._stats["requests"] += 1
+        if len(self._pending) >= self.max_items or self._pending_tokens >= self.max_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if batch:
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            if len(batch) == 1:
+                self._stats["single_calls"] += 1
+                results = [await self.summarize_one(texts[0])]
+            else:
+                self._stats["batches"] += 1
+                self._stats["batched_items"] += len(batch)
+                results = await self.summarize_many(texts)
+        except Exception as e:
+            if len(batch) > 1:
+                self._stats["failed_batches"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for i, (_, future) in enumerate(batch):
+            if future.done():  # caller was cancelled
+                continue
+            result = results[i] if i < len(results) else None
+            if result is None:
+                future.set_exception(ValueError(f"batch response has no result for item {i}"))
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self._stats["batched_items"] / batches, 2) if batches else 0.0,
+        }
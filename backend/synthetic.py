@@ -0,0 +1,261 @@
+"""Synthetic contact and interaction data at production scale.
+
+`generate_dataset` writes N contacts and exactly M interactions with
+`insert_many(ordered=False)` in batches of `batch_size`, holding at most one
+batch of each in memory. Everything is drawn from a single `random.Random`
+seeded by the caller - ids included - so the same (seed, now) always produces
+the same documents:
+
+  * relationship tags follow TAG_PROFILES, and each tag draws its reminder
+    frequency from that tag's own choices (partners daily, mentors monthly);
+  * interactions are shared out in proportion to a log-normal "activity" per
+    contact divided by its frequency, so most contacts have a handful and a
+    few have hundreds; some contacts have none at all;
+  * the gap since the last interaction is exponential, with a mean just under
+    the contact's frequency - or several times it for a slice of "neglected"
+    contacts - so health spans the whole range; earlier interactions step back from there over at most
+    `history_days`.
+
+Each contact's `last_interaction_at` and `interaction_count` agree with the
+interactions generated for it. Interactions are stored as already enriched.
+
+    cd backend && python synthetic.py --contacts 100000 --interactions 5000000 --seed 42 --drop
+"""
+import itertools
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from enrichment import COMPLETE
+from health import due_fields
+
+# tag -> (share of contacts, frequency_days choices)
+TAG_PROFILES = {
+    "Friend": (0.35, [7, 14, 30]),
+    "Family": (0.20, [3, 7, 14]),
+    "Colleague": (0.20, [14, 30, 60]),
+    "Mentor": (0.08, [30, 60, 90]),
+    "Partner": (0.02, [1, 2, 3]),
+    "Other": (0.15, [30, 60, 90]),
+}
+INTERACTION_TYPES = ["call", "text", "note", "voice", "meeting"]
+_TYPE_CUM_WEIGHTS = list(itertools.accumulate([0.35, 0.35, 0.15, 0.05, 0.10]))
+TIMED_TYPES = {"call", "voice", "meeting"}
+
+PINNED_SHARE = 0.05
+ARCHIVED_SHARE = 0.03
+NEGLECTED_SHARE = 0.15
+TYPICAL_GAP = 0.6  # mean days since the last interaction, as a fraction of frequency_days
+
+FIRST_NAMES = [
+    "Alex", "Amara", "Ben", "Chloe", "Daniel", "Elena", "Farah", "Gabriel", "Hana", "Isaac",
+    "Jamie", "Kai", "Leila", "Marcus", "Nina", "Omar", "Priya", "Quinn", "Rosa", "Sam",
+    "Tariq", "Uma", "Victor", "Wen", "Yusuf", "Zoe",
+]
+LAST_NAMES = [
+    "Adams", "Baker", "Chen", "Diaz", "Evans", "Fischer", "Garcia", "Haddad", "Ito", "Johnson",
+    "Kim", "Lopez", "Moreau", "Nakamura", "Okafor", "Patel", "Rossi", "Singh", "Tanaka", "Williams",
+]
+NOTES = [
+    "Had a great chat about their weekend plans.",
+    "Quick check-in, they seemed happy.",
+    "Talked about upcoming birthday celebration.",
+    "Discussed their new job, very excited.",
+    "They mentioned feeling stressed about work.",
+    "Caught up over coffee, lots of laughs.",
+    "They asked for advice on moving to a new city.",
+    "Shared photos from their trip.",
+]
+SUMMARIES = [
+    "A warm conversation covering recent updates.",
+    "A short, friendly check-in.",
+    "A supportive talk about a stressful week.",
+    "An upbeat catch-up full of plans.",
+]
+DEFAULT_AVATAR_COLORS = ["#2D6A4F", "#40916C", "#52B788", "#457B9D", "#E9C46A"]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _health(days_since: float, frequency_days: int) -> float:
+    return round(max(0.0, min(100.0, (1.0 - days_since / frequency_days) * 100)), 1)
+
+
+def allocate(total: int, weights: List[float], rng: random.Random) -> List[int]:
+    """Split `total` into integer counts proportional to `weights`; the counts always sum to `total`."""
+    if not weights or total <= 0:
+        return [0] * len(weights)
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    remainder = total - sum(counts)
+    for i in rng.choices(range(len(weights)), weights=weights, k=remainder):
+        counts[i] += 1
+    return counts
+
+
+class _Batches:
+    def __init__(self, collection, batch_size: int):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.docs: List[dict] = []
+        self.written = 0
+
+    async def add(self, doc: dict):
+        self.docs.append(doc)
+        if len(self.docs) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if self.docs:
+            await self.collection.insert_many(self.docs, ordered=False)
+            self.written += len(self.docs)
+            self.docs = []
+
+
+def _interaction(rng: random.Random, contact_id: str, created: datetime) -> dict:
+    interaction_id = _uuid(rng)
+    kind = rng.choices(INTERACTION_TYPES, cum_weights=_TYPE_CUM_WEIGHTS)[0]
+    return {
+        "_id": interaction_id,
+        "id": interaction_id,
+        "contact_id": contact_id,
+        "interaction_type": kind,
+        "notes": NOTES[int(rng.random() * len(NOTES))],
+        "voice_transcript": None,
+        "ai_summary": SUMMARIES[int(rng.random() * len(SUMMARIES))],
+        "key_highlights": ["Caught up on recent news"],
+        "action_items": [],
+        "emotional_cues": ["warm", "connected"],
+        "promises": [],
+        "important_dates": [],
+        "duration_minutes": rng.randint(5, 60) if kind in TIMED_TYPES else None,
+        "enrichment_status": COMPLETE,
+        "created_at": created,
+    }
+
+
+async def generate_dataset(
+    db,
+    contacts: int,
+    interactions: int,
+    seed: int = 42,
+    now: Optional[datetime] = None,
+    batch_size: int = 5000,
+    history_days: int = 365,
+    avatar_colors: Optional[List[str]] = None,
+) -> dict:
+    """Insert the dataset into `db.contacts` / `db.interactions` and return what was written."""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    colors = avatar_colors or DEFAULT_AVATAR_COLORS
+    tags = list(TAG_PROFILES)
+    tag_weights = [share for share, _ in TAG_PROFILES.values()]
+
+    profiles = []
+    for _ in range(contacts):
+        tag = rng.choices(tags, weights=tag_weights)[0]
+        profiles.append((tag, rng.choice(TAG_PROFILES[tag][1]), rng.lognormvariate(0, 1)))
+    counts = allocate(interactions if contacts else 0, [activity / freq for _, freq, activity in profiles], rng)
+
+    contact_batches = _Batches(db.contacts, batch_size)
+    interaction_batches = _Batches(db.interactions, batch_size)
+    sample_ids = []
+    for i, ((tag, freq, _), count) in enumerate(zip(profiles, counts)):
+        contact_id = _uuid(rng)
+        if len(sample_ids) < 10:
+            sample_ids.append(contact_id)
+
+        last = None
+        if count:
+            stretch = rng.uniform(2, 6) if rng.random() < NEGLECTED_SHARE else TYPICAL_GAP
+            days_since = min(rng.expovariate(1 / (freq * stretch)), history_days)
+            last = now - timedelta(days=days_since)
+            mean_gap = min(freq, max(history_days - days_since, 1) / count)
+            created = last
+            for _ in range(count):
+                await interaction_batches.add(_interaction(rng, contact_id, created))
+                created -= timedelta(days=rng.expovariate(1 / mean_gap))
+            first_seen = created
+        else:
+            first_seen = now - timedelta(days=rng.uniform(0, history_days))
+
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        await contact_batches.add({
+            **due_fields(last, freq, first_seen),
+            "_id": contact_id,
+            "id": contact_id,
+            "name": f"{first_name} {last_name}",
+            "phone": f"+1555{rng.randrange(10 ** 7):07d}",
+            "email": f"{first_name.lower()}.{last_name.lower()}{i}@example.com" if rng.random() < 0.6 else None,
+            "relationship_tag": tag,
+            "frequency_days": freq,
+            "is_pinned": rng.random() < PINNED_SHARE,
+            "is_archived": rng.random() < ARCHIVED_SHARE,
+            "avatar_color": rng.choice(colors),
+            "notes": None,
+            "last_interaction_at": last,
+            "interaction_count": count,
+            "connection_health": _health((now - last).total_seconds() / 86400, freq) if last else 0.0,
+            "created_at": first_seen,
+            "updated_at": last or first_seen,
+        })
+
+    await contact_batches.flush()
+    await interaction_batches.flush()
+    return {
+        "contacts": contact_batches.written,
+        "interactions": interaction_batches.written,
+        "seed": seed,
+        "now": now.isoformat(),
+        "sample_contact_ids": sample_ids,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import json
+    import os
+    import time
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from dashboard import invalidate_dashboard
+    from indexes import ensure_indexes
+
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def main():
+        parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+        parser.add_argument("--contacts", type=int, default=100_000)
+        parser.add_argument("--interactions", type=int, default=5_000_000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--now", help="ISO timestamp to generate relative to (default: current time)")
+        parser.add_argument("--db", help="database name (default: $DB_NAME)")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--drop", action="store_true", help="delete existing contacts and interactions first")
+        args = parser.parse_args()
+
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        db = client[args.db or os.environ['DB_NAME']]
+        if args.drop:
+            await db.contacts.delete_many({})
+            await db.interactions.delete_many({})
+        await ensure_indexes(db)
+        now = None
+        if args.now:
+            now = datetime.fromisoformat(args.now.replace('Z', '+00:00'))
+            now = now if now.tzinfo else now.replace(tzinfo=timezone.utc)
+        started = time.perf_counter()
+        result = await generate_dataset(db, args.contacts, args.interactions, seed=args.seed, now=now, batch_size=args.batch_size)
+        result["seconds"] = round(time.perf_counter() - started, 1)
+        await invalidate_dashboard(db)
+        print(json.dumps(result, indent=2))
+        client.close()
+
+    asyncio.run(main())
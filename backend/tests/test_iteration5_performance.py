@@ -0,0 +1,376 @@
+"""
+Iteration 5 Backend Tests: Scalability features
+Tests: index report, keyset pagination for contacts and interactions, streaming export, bulk import, batch contact updates,
+synthetic seeding, date timestamps, due-time reminders, scheduled reminder pushes, chunked push delivery, push receipts, streamed voice uploads, segmented transcription, transcript cache
+"""
+import asyncio
+import base64
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import httpx
+import numpy as np
+import pytest
+import requests
+import os
+import uuid
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from push import ExpoPushClient
+from transcription import _drop_repeated_head, plan_segments, stitch
+
+# Get backend URL from environment
+BASE_URL = os.environ.get('EXPO_PUBLIC_BACKEND_URL') or os.environ.get('BACKEND_URL', 'https://human-first-mobile.preview.emergentagent.com')
+BASE_URL = BASE_URL.rstrip('/')
+
+
+class TestIndexReport:
+    """Index registry report"""
+
+    def test_index_report(self, api_client):
+        """Test GET /api/admin/indexes reports every registered collection with no missing indexes"""
+        response = api_client.get(f"{BASE_URL}/api/admin/indexes")
+        assert response.status_code == 200
+        data = response.json()
+        for collection in ["contacts", "interactions", "orders", "push_tokens"]:
+            assert collection in data
+            assert "missing" in data[collection]
+            assert "unused" in data[collection]
+            assert data[collection]["missing"] == [], f"{collection} missing indexes: {data[collection]['missing']}"
+        print(f"✓ Index report covers {len(data)} collections")
+
+
+class TestKeysetPagination:
+    """Cursor pagination for contacts and interactions"""
+
+    def test_contacts_page_walk(self, api_client):
+        """Test GET /api/contacts/page walks every contact exactly once"""
+        api_client.post(f"{BASE_URL}/api/seed")
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = api_client.get(f"{BASE_URL}/api/contacts/page", params=params)
+            assert response.status_code == 200
+            data = response.json()
+            assert "items" in data
+            assert "next_cursor" in data
+            assert len(data["items"]) <= 2
+            seen.extend(c["id"] for c in data["items"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen)), "Contact returned on more than one page"
+        total = len(api_client.get(f"{BASE_URL}/api/contacts").json())
+        assert len(seen) == total
+        print(f"✓ Paged through {len(seen)} contacts")
+
+    def test_interactions_page_order(self, api_client):
+        """Test GET /api/interactions/{id}/page returns newest first across pages"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        assert len(contacts) > 0
+        contact_id = contacts[0]["id"]
+        for i in range(3):
+            api_client.post(f"{BASE_URL}/api/interactions", json={"contact_id": contact_id, "interaction_type": "text", "notes": f"TEST_page {i}"})
+
+        first = api_client.get(f"{BASE_URL}/api/interactions/{contact_id}/page", params={"limit": 2}).json()
+        assert len(first["items"]) == 2
+        assert first["next_cursor"]
+        second = api_client.get(f"{BASE_URL}/api/interactions/{contact_id}/page", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+        assert len(second["items"]) >= 1
+        timestamps = [i["created_at"] for i in first["items"] + second["items"]]
+        assert timestamps == sorted(timestamps, reverse=True)
+        print("✓ Interaction pages are ordered newest first")
+
+    def test_invalid_cursor(self, api_client):
+        """Test a garbage cursor is rejected with 400"""
+        response = api_client.get(f"{BASE_URL}/api/contacts/page", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_forged_cursor(self, api_client):
+        """Test cursors carrying query operators, out-of-range or mistyped values, or a bad date are rejected with 400"""
+        for values in ([{"$ne": None}, {"$ne": None}, "x"], [True, "a", 10 ** 30], [1, "a", "x"], [{"$date": "nope"}, "x"]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+            path = "contacts/page" if len(values) == 3 else "interactions/TEST_any/page"
+            response = api_client.get(f"{BASE_URL}/api/{path}", params={"cursor": cursor})
+            assert response.status_code == 400
+
+
+class TestStreamingExport:
+    """GET /api/data/export streams every record"""
+
+    def test_ndjson_export(self, api_client):
+        """Test NDJSON export has header, records and an end line whose counts match"""
+        response = api_client.get(f"{BASE_URL}/api/data/export", params={"format": "ndjson"}, stream=True)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        assert lines[0]["type"] == "header"
+        assert lines[-1]["type"] == "end"
+        contacts = [line for line in lines if line["type"] == "contact"]
+        assert lines[-1]["counts"]["contact"] == len(contacts)
+        print(f"✓ NDJSON export: {lines[-1]['counts']}")
+
+    def test_gzip_export(self, api_client):
+        """Test gzip export decodes to the same JSON shape"""
+        response = api_client.get(f"{BASE_URL}/api/data/export", params={"gzip": "true"})
+        assert response.status_code == 200
+        assert response.headers.get("content-encoding") == "gzip"
+        data = response.json()
+        for key in ["contacts", "interactions", "goals", "settings", "exported_at"]:
+            assert key in data
+
+    def test_invalid_resume(self, api_client):
+        """Test a malformed resume token returns 400"""
+        response = api_client.get(f"{BASE_URL}/api/data/export", params={"format": "ndjson", "resume": "not-a-token"})
+        assert response.status_code == 400
+
+
+class TestBulkImport:
+    """POST /api/data/import"""
+
+    def test_ndjson_import_with_errors(self, api_client):
+        """Test valid rows are written and bad rows are reported by line number"""
+        contact_id = f"TEST_import_{uuid.uuid4().hex[:8]}"
+        lines = [
+            json.dumps({"type": "contact", "data": {"id": contact_id, "name": "TEST_Import Person", "relationship_tag": "Friend"}}),
+            json.dumps({"type": "contact", "data": {"name": ""}}),
+            json.dumps({"type": "interaction", "data": {"contact_id": contact_id, "notes": "Imported call", "created_at": "2024-01-02T10:00:00Z"}}),
+            json.dumps({"type": "interaction", "data": {"contact_id": contact_id, "notes": "Later call", "created_at": "2024-03-04T10:00:00Z"}}),
+            json.dumps({"type": "interaction", "data": {"contact_id": "does-not-exist", "notes": "Orphan"}}),
+        ]
+        response = requests.post(
+            f"{BASE_URL}/api/data/import",
+            files={"file": ("import.ndjson", "\n".join(lines).encode(), "application/x-ndjson")},
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["inserted"] == {"contact": 1, "interaction": 2}
+        assert [e["row"] for e in report["errors"]] == [2, 5]
+
+        contact = api_client.get(f"{BASE_URL}/api/contacts/{contact_id}").json()
+        assert contact["interaction_count"] == 2
+        assert contact["last_interaction_at"].startswith("2024-03-04")
+        api_client.delete(f"{BASE_URL}/api/contacts/{contact_id}")
+
+    def test_csv_requires_kind(self, api_client):
+        """Test CSV import without kind returns 400"""
+        response = requests.post(f"{BASE_URL}/api/data/import", files={"file": ("contacts.csv", b"name\nTEST_Csv\n", "text/csv")})
+        assert response.status_code == 400
+
+
+class TestBatchContactUpdate:
+    """POST /api/contacts/batch"""
+
+    def test_batch_update(self, api_client):
+        """Test mixed batch returns per-item status and updated documents"""
+        created = [
+            api_client.post(f"{BASE_URL}/api/contacts", json={"name": f"TEST_Batch {i}", "frequency_days": 7}).json()
+            for i in range(2)
+        ]
+        response = api_client.post(f"{BASE_URL}/api/contacts/batch", json={"operations": [
+            {"id": created[0]["id"], "patch": {"is_pinned": True, "relationship_tag": "Work"}},
+            {"id": created[1]["id"], "patch": {"frequency_days": 30}},
+            {"id": "does-not-exist", "patch": {"is_archived": True}},
+            {"id": created[0]["id"], "patch": {"is_archived": True}},
+        ]})
+        assert response.status_code == 200
+        result = response.json()
+        assert [item["status"] for item in result["items"]] == ["updated", "updated", "not_found", "duplicate"]
+        assert result["updated"] == 2
+        assert result["items"][0]["contact"]["is_pinned"] is True
+        assert result["items"][0]["contact"]["relationship_tag"] == "Work"
+        assert result["items"][1]["contact"]["frequency_days"] == 30
+        for contact in created:
+            api_client.delete(f"{BASE_URL}/api/contacts/{contact['id']}")
+
+
+class TestSyntheticSeed:
+    """Synthetic dataset generation through /seed parameters"""
+
+    def test_seed_limits(self, api_client):
+        """Test POST /api/seed rejects sizes outside the HTTP limits"""
+        for params in ({"contacts": 0}, {"contacts": 10**7}, {"contacts": 10, "interactions": -1}):
+            response = api_client.post(f"{BASE_URL}/api/seed", params=params)
+            assert response.status_code == 400, params
+        print("✓ Oversized synthetic seeds rejected")
+
+    def test_seed_keeps_existing_data(self, api_client):
+        """Test POST /api/seed with sizes does not add to a database that already has contacts"""
+        api_client.post(f"{BASE_URL}/api/seed")
+        before = api_client.get(f"{BASE_URL}/api/dashboard").json()["total_contacts"]
+        response = api_client.post(f"{BASE_URL}/api/seed", params={"contacts": 20, "interactions": 100, "seed": 7})
+        assert response.status_code == 200
+        assert response.json()["message"] == "Data already seeded"
+        assert api_client.get(f"{BASE_URL}/api/dashboard").json()["total_contacts"] == before
+        print("✓ Synthetic seed leaves existing data alone")
+
+
+class TestTimestamps:
+    """Timestamps stored as dates are still served as ISO strings"""
+
+    def test_iso_timestamps(self, api_client):
+        """Test contact and interaction timestamps are timezone-aware ISO strings that agree with each other"""
+        contact = api_client.post(f"{BASE_URL}/api/contacts", json={"name": "TEST_Timestamps", "frequency_days": 7}).json()
+        interaction = api_client.post(f"{BASE_URL}/api/interactions", json={"contact_id": contact["id"], "notes": "Hi"}).json()
+        created = datetime.fromisoformat(interaction["created_at"])
+        assert created.tzinfo is not None
+        assert abs(datetime.now(timezone.utc) - created) < timedelta(minutes=5)
+
+        fetched = api_client.get(f"{BASE_URL}/api/contacts/{contact['id']}").json()
+        assert datetime.fromisoformat(fetched["last_interaction_at"]) == created
+        assert datetime.fromisoformat(fetched["created_at"]) == datetime.fromisoformat(contact["created_at"])
+        page = api_client.get(f"{BASE_URL}/api/interactions/{contact['id']}/page").json()
+        assert page["items"][0]["created_at"] == interaction["created_at"]
+        api_client.delete(f"{BASE_URL}/api/contacts/{contact['id']}")
+        print("✓ Timestamps round-trip as ISO strings")
+
+
+class TestDueReminders:
+    """Reminders found through the maintained attention_at threshold time"""
+
+    def test_reminder_follows_interactions(self, api_client):
+        """Test a never-contacted contact is pending until an interaction is logged, and again after its frequency drops"""
+        def pending_total():
+            return api_client.get(f"{BASE_URL}/api/notifications/pending").json()["total"]
+
+        before = pending_total()
+        contact = api_client.post(f"{BASE_URL}/api/contacts", json={"name": "TEST_Due", "frequency_days": 30}).json()
+        assert pending_total() == before + 1
+        api_client.post(f"{BASE_URL}/api/interactions", json={"contact_id": contact["id"], "notes": "Hi"})
+        assert pending_total() == before
+        # A frequency of 0 days makes the contact overdue immediately.
+        api_client.put(f"{BASE_URL}/api/contacts/{contact['id']}", json={"frequency_days": 0})
+        assert pending_total() == before + 1
+        api_client.delete(f"{BASE_URL}/api/contacts/{contact['id']}")
+        print("✓ Pending reminders track due times")
+
+
+class TestReminderPushes:
+    """Reminder pushes deduplicated through the delivery log"""
+
+    def test_reminders_not_repeated(self, api_client):
+        """Test a second POST /api/push/send-reminders within the cooldown sends nothing new"""
+        api_client.post(f"{BASE_URL}/api/push/register", json={"token": f"ExponentPushToken[TEST_Dedupe_{uuid.uuid4().hex[:8]}]"})
+        first = api_client.post(f"{BASE_URL}/api/push/send-reminders").json()
+        second = api_client.post(f"{BASE_URL}/api/push/send-reminders").json()
+        assert {"sent", "contacts_notified", "devices"} <= set(second)
+        if first["sent"]:
+            assert second["sent"] == 0
+            assert second["message"] == "Reminders already sent recently"
+        print(f"✓ {first['sent']} reminders sent, then {second['sent']}")
+
+
+class TestPushDelivery:
+    """Chunked Expo push delivery"""
+
+    def test_broadcast_counts(self, api_client):
+        """Test POST /api/push/send reports per-ticket outcomes and GET /api/admin/push counts the chunks"""
+        api_client.post(f"{BASE_URL}/api/push/register", json={"token": f"ExponentPushToken[TEST_Broadcast_{uuid.uuid4().hex[:8]}]"})
+        before = api_client.get(f"{BASE_URL}/api/admin/push").json()
+        result = api_client.post(f"{BASE_URL}/api/push/send", params={"title": "TEST", "body": "Broadcast"}).json()
+        assert result["sent"] >= 1
+        assert result["ok"] + sum(result["errors"].values()) == result["sent"]
+        after = api_client.get(f"{BASE_URL}/api/admin/push").json()
+        assert after["messages"] - before["messages"] >= result["sent"]
+        assert after["chunks"] - before["chunks"] >= -(-result["sent"] // 100)
+        print(f"✓ Broadcast to {result['sent']} devices: {result['ok']} ok, errors {result['errors']}")
+
+    def test_failed_broadcast_returns_slots(self):
+        """Test a broadcast whose token cursor fails gives every concurrency slot back to the client"""
+        async def scenario():
+            client = ExpoPushClient("https://expo.test/--/api/v2/push/send", concurrency=2)
+            client._http = httpx.AsyncClient(transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, json={"data": [{"status": "ok", "id": "t"}] * len(json.loads(request.content))})
+            ))
+
+            async def tokens():
+                for i in range(150):
+                    yield f"ExponentPushToken[TEST_{i}]"
+                raise RuntimeError("cursor lost")
+
+            with pytest.raises(RuntimeError):
+                await client.broadcast(tokens(), lambda token: {"to": token, "body": "TEST"})
+            await client.close()
+            return client._semaphore._value
+
+        assert asyncio.run(scenario()) == 2
+        print("✓ Failed broadcast released its push slots")
+
+    def test_receipt_stats(self, api_client):
+        """Test GET /api/admin/push reports receipt outcomes and pruned tokens"""
+        response = api_client.get(f"{BASE_URL}/api/admin/push")
+        assert response.status_code == 200
+        receipts = response.json()["receipts"]
+        for key in ("checked", "delivered", "failed", "unknown", "pruned_tokens", "errors"):
+            assert key in receipts
+        print(f"✓ Receipts: {receipts['delivered']} delivered, {receipts['failed']} failed, {receipts['pruned_tokens']} tokens pruned")
+
+
+class TestVoiceUpload:
+    """Streamed /voice/transcribe uploads"""
+
+    def test_rejects_bad_uploads(self):
+        """Test POST /api/voice/transcribe answers 400 without a multipart 'file' part, before any transcription"""
+        response = requests.post(f"{BASE_URL}/api/voice/transcribe", json={"file": "not audio"})
+        assert response.status_code == 400
+        response = requests.post(f"{BASE_URL}/api/voice/transcribe", files={"audio": ("note.wav", b"RIFF", "audio/wav")})
+        assert response.status_code == 400
+        print("✓ Uploads without a file part rejected")
+
+    def test_voice_stats(self):
+        """Test GET /api/admin/voice reports upload slots and transcript cache counters"""
+        response = requests.get(f"{BASE_URL}/api/admin/voice")
+        assert response.status_code == 200
+        data = response.json()
+        assert {"active", "max_concurrent", "rejected"} <= set(data["uploads"])
+        assert {"hits", "joined", "misses", "hit_rate"} <= set(data["transcripts"])
+        assert 0 <= data["transcripts"]["hit_rate"] <= 1
+        print(f"✓ Transcript cache hit rate: {data['transcripts']['hit_rate']}")
+
+
+class TestTranscriptionSegments:
+    """Cutting long voice notes into segments and stitching the texts back together"""
+
+    def test_short_audio_is_one_segment(self):
+        """Test audio within segment + search length is not split"""
+        rms = np.ones(int(65 / 0.05))
+        assert plan_segments(rms, 0.05, 60, 1.0, 10) == [(0.0, 65.0, False)]
+
+    def test_cuts_at_pauses(self):
+        """Test each cut lands on the pause nearest the segment boundary, without overlap"""
+        rms = np.full(int(170 / 0.05), 1000.0)
+        for pause in (55, 118):
+            rms[int(pause / 0.05):int(pause / 0.05) + 4] = 0
+        segments = plan_segments(rms, 0.05, 60, 1.0, 10)
+        assert len(segments) == 3
+        assert not any(overlapped for _, _, overlapped in segments)
+        assert 55 <= segments[0][1] <= 55.2
+        assert 118 <= segments[1][1] <= 118.2
+        assert segments[0][1] == segments[1][0] and segments[-1][1] == 170
+        print(f"✓ Cuts at {[round(end, 2) for _, end, _ in segments[:-1]]}")
+
+    def test_overlaps_without_pauses(self):
+        """Test audio that never goes quiet is cut on the boundaries with a shared overlap"""
+        rms = np.random.RandomState(0).uniform(3000, 4000, int(200 / 0.05))
+        segments = plan_segments(rms, 0.05, 60, 1.0, 10)
+        assert [(round(a, 2), round(b, 2), o) for a, b, o in segments] == [
+            (0.0, 60.5, False), (59.5, 120.0, True), (119.0, 179.5, True), (178.5, 200.0, True),
+        ]
+
+    def test_drop_repeated_head(self):
+        """Test the words heard twice in the overlap are dropped, including after a cut-off first word"""
+        previous = "we talked about the trip to goa next".split()
+        assert _drop_repeated_head(previous, "to goa next month".split()) == ["month"]
+        assert _drop_repeated_head(previous, "oa to goa next month".split()) == ["month"]
+        assert _drop_repeated_head(previous, "Goa, next month".split()) == ["month"]
+        assert _drop_repeated_head(previous, "something else".split()) == ["something", "else"]
+
+    def test_stitch(self):
+        """Test segment texts are joined in order and only overlapping segments are deduplicated"""
+        segments = [(0, 60.5, False), (59.5, 120.5, True), (120.5, 180, False)]
+        assert stitch(["a b c d", "c d e f", "e f g"], segments) == "a b c d e f e f g"
+        assert stitch(["hello", "", "there"], segments) == "hello there"
@@ -0,0 +1,164 @@
+"""
+Iteration 6 Backend Tests: AI pipeline
+Tests: background interaction enrichment, batched summaries, SSE streaming, call-prep briefs, insights analytics
+"""
+import json
+import pytest
+import requests
+import os
+
+# Get backend URL from environment
+BASE_URL = os.environ.get('EXPO_PUBLIC_BACKEND_URL') or os.environ.get('BACKEND_URL', 'https://human-first-mobile.preview.emergentagent.com')
+BASE_URL = BASE_URL.rstrip('/')
+
+
+class TestInteractionEnrichment:
+    """Interactions are stored immediately and enriched in the background"""
+
+    def test_create_returns_pending(self, api_client):
+        """Test POST /api/interactions returns before AI analysis with enrichment_status pending"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        assert len(contacts) > 0
+        response = api_client.post(f"{BASE_URL}/api/interactions", json={
+            "contact_id": contacts[0]["id"],
+            "interaction_type": "call",
+            "notes": "TEST_enrich Talked about their new puppy and a trip to Goa next month.",
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert data["enrichment_status"] == "pending"
+
+        # Long-poll until the worker settles it (AI result or fallback)
+        enriched = api_client.get(f"{BASE_URL}/api/interactions/{data['id']}/enrichment", params={"wait": 30}).json()
+        assert enriched["enrichment_status"] in ["complete", "failed"]
+        assert enriched["ai_summary"]
+        print(f"✓ Enrichment settled: {enriched['enrichment_status']}")
+
+    def test_short_note_skipped(self, api_client):
+        """Test notes too short for analysis are marked skipped"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        response = api_client.post(f"{BASE_URL}/api/interactions", json={"contact_id": contacts[0]["id"], "notes": "hi"})
+        assert response.status_code == 200
+        assert response.json()["enrichment_status"] == "skipped"
+
+    def test_enrichment_not_found(self, api_client):
+        """Test polling an unknown interaction returns 404"""
+        response = api_client.get(f"{BASE_URL}/api/interactions/does-not-exist/enrichment")
+        assert response.status_code == 404
+
+
+class TestBatchedEnrichment:
+    """Bursts of interactions are summarized in shared LLM calls"""
+
+    def test_burst_all_settle(self, api_client):
+        """Test a burst of POST /api/interactions all get enriched"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        ids = []
+        for i in range(6):
+            response = api_client.post(f"{BASE_URL}/api/interactions", json={
+                "contact_id": contacts[0]["id"],
+                "interaction_type": "text",
+                "notes": f"TEST_batch Caught up about plans number {i} for the holidays.",
+            })
+            assert response.status_code == 200
+            ids.append(response.json()["id"])
+
+        for interaction_id in ids:
+            enriched = api_client.get(f"{BASE_URL}/api/interactions/{interaction_id}/enrichment", params={"wait": 30}).json()
+            assert enriched["enrichment_status"] in ["complete", "failed"]
+            assert enriched["ai_summary"]
+
+        stats = api_client.get(f"{BASE_URL}/api/admin/llm").json()["summary_batcher"]
+        assert stats["requests"] >= len(ids)
+        print(f"✓ Burst enriched, batcher stats: {stats}")
+
+
+def read_sse(response):
+    """Parse a text/event-stream body into (event, data) pairs"""
+    events, event = [], None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+class TestStreamingAI:
+    """SSE variants of the AI endpoints"""
+
+    def test_call_prep_stream(self, api_client):
+        """Test GET /api/ai/call-prep/{id}/stream emits every brief field then done"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        response = api_client.get(f"{BASE_URL}/api/ai/call-prep/{contacts[0]['id']}/stream", stream=True, timeout=60)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_sse(response)
+        assert events[0] == ("field", {"field": "contact_name", "value": contacts[0]["name"]})
+        assert events[-1][0] == "done"
+        fields = {data["field"] for event, data in events if event == "field"}
+        for key in ["recap", "follow_ups", "important_dates", "conversation_starters", "emotional_note"]:
+            assert key in fields
+        print(f"✓ Call prep streamed {len(events)} events")
+
+    def test_prompts_stream(self, api_client):
+        """Test GET /api/ai/prompts/{id}/stream emits prompts as items"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        response = api_client.get(f"{BASE_URL}/api/ai/prompts/{contacts[0]['id']}/stream", params={"mode": "light"}, stream=True, timeout=60)
+        assert response.status_code == 200
+        events = read_sse(response)
+        items = [data["value"] for event, data in events if event == "item"]
+        assert len(items) > 0
+        assert events[-1][0] == "done"
+
+    def test_insights_stream(self, api_client):
+        """Test GET /api/ai/insights/stream ends with done"""
+        response = api_client.get(f"{BASE_URL}/api/ai/insights/stream", stream=True, timeout=60)
+        assert response.status_code == 200
+        events = read_sse(response)
+        assert any(data.get("field") == "overall_insight" for event, data in events if event == "field")
+        assert events[-1][0] == "done"
+
+    def test_stream_not_found(self, api_client):
+        """Test streaming call prep for an unknown contact returns 404"""
+        response = api_client.get(f"{BASE_URL}/api/ai/call-prep/does-not-exist/stream")
+        assert response.status_code == 404
+
+
+class TestCallPrepBriefs:
+    """Prebuilt call-prep briefs never go stale"""
+
+    def test_brief_follows_rename(self, api_client):
+        """Test GET /api/ai/call-prep/{id} reflects a rename right away"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        pinned = [c for c in contacts if c.get("is_pinned")] or contacts
+        contact = pinned[0]
+        assert api_client.get(f"{BASE_URL}/api/ai/call-prep/{contact['id']}").json()["contact_name"] == contact["name"]
+
+        api_client.put(f"{BASE_URL}/api/contacts/{contact['id']}", json={"name": f"{contact['name']} TEST_brief"})
+        try:
+            prep = api_client.get(f"{BASE_URL}/api/ai/call-prep/{contact['id']}").json()
+            assert prep["contact_name"] == f"{contact['name']} TEST_brief"
+            assert "recap" in prep
+        finally:
+            api_client.put(f"{BASE_URL}/api/contacts/{contact['id']}", json={"name": contact["name"]})
+
+
+class TestInsightsAnalytics:
+    """Insights numbers are computed over all contacts, deterministically"""
+
+    def test_numbers_cover_all_contacts(self, api_client):
+        """Test GET /api/ai/insights stats and category balance account for every active contact"""
+        contacts = api_client.get(f"{BASE_URL}/api/contacts").json()
+        insights = api_client.get(f"{BASE_URL}/api/ai/insights").json()
+        assert insights["stats"]["total"] == len(contacts)
+        assert sum(c["count"] for c in insights["category_balance"].values()) == len(contacts)
+        assert sum(insights["overdue_distribution"].values()) == len(contacts)
+        assert len(insights["suggestions"]) == 3
+
+    def test_repeat_is_identical(self, api_client):
+        """Test unchanged data yields the same insights, prose included"""
+        first = api_client.get(f"{BASE_URL}/api/ai/insights").json()
+        second = api_client.get(f"{BASE_URL}/api/ai/insights").json()
+        assert first["drift_alerts"] == second["drift_alerts"]
+        assert first["overall_insight"] == second["overall_insight"]
@@ -0,0 +1,79 @@
+"""Timestamps stored as native BSON dates.
+
+Timestamps used to be written as ISO-8601 strings (`now_iso()`); they are now
+written as timezone-aware datetimes, which MongoDB stores as BSON dates. That
+makes range queries date comparisons rather than string comparisons, lets
+`$dateDiff` and friends work on the fields directly, and makes TTL indexes on
+them possible (TTL indexes ignore strings).
+
+Documents written before the switch keep their strings until
+`migrate_dates.py` converts them, so every reader accepts both:
+
+  * `as_datetime` / `to_iso` on the Python side - API responses keep the
+    same ISO string format whichever way a document is stored;
+  * `date_expr` in aggregation expressions;
+  * `since` in query filters. A range query with a date only matches dates
+    (MongoDB compares values of one BSON type at a time), so it is paired
+    with the same range on the ISO string.
+"""
+from datetime import datetime, timezone
+from typing import Annotated, Dict, List, Optional, Union
+
+from pydantic import BeforeValidator
+
+# Timestamp fields per collection, converted by migrate_dates.py.
+TIMESTAMP_FIELDS: Dict[str, List[str]] = {
+    "contacts": ["created_at", "updated_at", "last_interaction_at"],
+    "interactions": ["created_at"],
+    "goals": ["created_at"],
+    "shared_invites": ["created_at"],
+    "orders": ["created_at", "paid_at"],
+    "subscriptions": ["started_at", "expires_at", "cancelled_at"],
+    "push_tokens": ["registered_at"],
+    "enrichment_jobs": ["finished_at"],
+}
+
+
+def utcnow() -> datetime:
+    """Current UTC time at BSON date precision (milliseconds), so a value returned from
+    a write reads back identically."""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def as_datetime(value: Union[datetime, str, None]) -> Optional[datetime]:
+    """Aware UTC datetime from a stored value (BSON date, naive or aware, or ISO string); None if absent or unparsable."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def to_iso(value):
+    """ISO string for API output; strings that do not parse are passed through unchanged."""
+    dt = as_datetime(value)
+    if dt is None:
+        return value
+    return dt.isoformat()
+
+
+# Response model fields: accept a stored datetime or string, always serialize as an ISO string.
+Timestamp = Annotated[str, BeforeValidator(to_iso)]
+
+
+def date_expr(field: str) -> dict:
+    """Aggregation expression: the field as a date, or null when missing or unparsable."""
+    return {"$convert": {"input": f"${field}", "to": "date", "onError": None, "onNull": None}}
+
+
+def since(field: str, start: datetime) -> dict:
+    """Query filter: `field` >= `start`, whether the document stores a date or an ISO string."""
+    return {"$or": [{field: {"$gte": start}}, {field: {"$gte": start.isoformat()}}]}
@@ -0,0 +1,92 @@
+"""Transcripts cached by audio content.
+
+Mobile clients retry uploads that timed out and sometimes send the same
+recording twice. Each copy used to cost a full Whisper call. The key is the
+upload's SHA-256 (`AudioBuffer.sha256`, computed while it streams in), so
+identical bytes get the stored transcript back without the provider being
+called. A different encoding of the same words is a different file and a miss.
+
+Transcripts live in the `transcripts` collection, one document per digest,
+until `expires_at`; a TTL index removes them after that. Lookups also filter on
+`expires_at` because the TTL monitor only runs about once a minute.
+
+An upload that arrives while the same audio is still being transcribed in this
+process waits for that transcription instead of starting another ("joined" in
+`stats`). Failures are not cached.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict
+
+from timestamps import utcnow
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = timedelta(days=30)
+
+
+class TranscriptCache:
+    def __init__(self, db, ttl: timedelta = DEFAULT_TTL):
+        self.db = db
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counts = {"hits": 0, "joined": 0, "misses": 0, "writes": 0}
+
+    async def get(self, digest: str):
+        doc = await self.db.transcripts.find_one({"_id": digest, "expires_at": {"$gt": utcnow()}})
+        return None if doc is None else doc["transcript"]
+
+    async def set(self, digest: str, transcript: str, size: int):
+        now = utcnow()
+        await self.db.transcripts.update_one(
+            {"_id": digest},
+            {"$set": {"transcript": transcript, "size": size, "created_at": now, "expires_at": now + self.ttl}},
+            upsert=True,
+        )
+        self._counts["writes"] += 1
+
+    async def transcribe(self, digest: str, size: int, produce: Callable[[], Awaitable[str]]) -> str:
+        """The cached transcript for `digest`, else `produce()`'s, which is then stored."""
+        inflight = self._inflight.get(digest)
+        while inflight is not None:
+            await asyncio.wait([inflight])
+            if not inflight.cancelled():
+                self._counts["joined"] += 1
+                return inflight.result()
+            inflight = self._inflight.get(digest)  # its request went away; transcribe here instead
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[digest] = future
+        try:
+            transcript = await self.get(digest)
+            if transcript is not None:
+                self._counts["hits"] += 1
+            else:
+                self._counts["misses"] += 1
+                transcript = await produce()
+                try:
+                    await self.set(digest, transcript, size)
+                except Exception as e:
+                    logger.error(f"Storing transcript {digest[:12]} failed: {e}")
+            future.set_result(transcript)
+            return transcript
+        except Exception as e:
+            # Waiters get the same failure; retrieved here so one nobody waited for is not logged.
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[digest]
+
+    def stats(self) -> dict:
+        served = self._counts["hits"] + self._counts["joined"]
+        lookups = served + self._counts["misses"]
+        return {
+            **self._counts,
+            "inflight": len(self._inflight),
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,262 @@
+"""Chunked, parallel transcription of long voice notes.
+
+Whisper's latency grows with the length of the audio, and it refuses files over
+PROVIDER_MAX_BYTES. `Transcriber` splits anything longer than about
+`segment_seconds` into segments and transcribes them concurrently, then
+joins the texts in order. A 20-minute call then takes roughly as long as its
+slowest segment.
+
+Where to cut: the audio is scanned once in 50 ms frames for RMS loudness (numpy).
+Near each `segment_seconds` boundary, within `search_seconds` either side, the
+quietest frame is picked. If that frame is silence, the cut goes there and
+the segments do not overlap. If nobody paused, the cut falls on the boundary
+and the two segments share `overlap_seconds` of audio, so no word is lost. The
+words the overlap produced twice are dropped from the later segment when
+stitching (`stitch`).
+
+WAV is read with the standard `wave` module, streaming, so a spooled upload is
+never loaded whole; each segment is cut out when its turn in the pool comes.
+Other formats are split only when the optional `pydub` (with ffmpeg) is
+installed. Otherwise they go to the provider in one piece, as before; over
+PROVIDER_MAX_BYTES that fails fast with AudioTooLarge.
+
+The pool (`concurrency`) is shared by all requests in the process, so it also
+bounds the provider calls that several long uploads can make at once.
+"""
+import asyncio
+import importlib.util
+import io
+import logging
+import re
+import wave
+from typing import Awaitable, BinaryIO, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from voice import AudioBuffer, AudioTooLarge
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_MAX_BYTES = 25 * 1024 * 1024
+FRAME_SECONDS = 0.05
+MAX_OVERLAP_WORDS = 12
+
+# (start seconds, end seconds, overlaps the previous segment)
+Segment = Tuple[float, float, bool]
+
+
+def frame_rms(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS loudness of consecutive `frame_len`-sample frames of mono float samples (a trailing partial frame is dropped)."""
+    usable = len(samples) // frame_len * frame_len
+    if not usable:
+        return np.zeros(0)
+    frames = samples[:usable].reshape(-1, frame_len)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def silence_threshold(rms: np.ndarray) -> float:
+    """Loudness below which a frame counts as a pause: a tenth of the way from the quiet floor to typical speech,
+    and at least 20 dB under speech, so audio that never goes quiet has no pauses."""
+    if not len(rms):
+        return 0.0
+    floor, speech = np.percentile(rms, 10), np.percentile(rms, 90)
+    return float(min(floor + (speech - floor) * 0.1, speech * 0.1))
+
+
+def plan_segments(
+    rms: np.ndarray,
+    frame_seconds: float,
+    segment_seconds: float,
+    overlap_seconds: float,
+    search_seconds: float,
+) -> List[Segment]:
+    total = len(rms) * frame_seconds
+    if total <= segment_seconds + search_seconds:
+        return [(0.0, total, False)]
+    threshold = silence_threshold(rms)
+    segments, start, overlapped = [], 0.0, False
+    while total - start > segment_seconds + search_seconds:
+        ideal = start + segment_seconds
+        lo = int((ideal - search_seconds) / frame_seconds)
+        hi = int((ideal + search_seconds) / frame_seconds)
+        window = rms[lo:hi]
+        quietest = int(np.argmin(window))
+        if window[quietest] <= threshold:
+            cut = (lo + quietest + 0.5) * frame_seconds
+            segments.append((start, cut, overlapped))
+            start, overlapped = cut, False
+        else:
+            segments.append((start, ideal + overlap_seconds / 2, overlapped))
+            start, overlapped = ideal - overlap_seconds / 2, True
+    segments.append((start, total, overlapped))
+    return segments
+
+
+def _norm(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _drop_repeated_head(previous: List[str], words: List[str]) -> List[str]:
+    """`words` without the leading run that repeats the end of `previous` (the overlap, heard twice).
+    The first word may be a fragment of a word cut at the boundary, so a match may start one word in."""
+    tail = [_norm(w) for w in previous[-MAX_OVERLAP_WORDS:]]
+    head = [_norm(w) for w in words[:MAX_OVERLAP_WORDS + 1]]
+    for size in range(min(len(tail), len(head)), 0, -1):
+        for skip in (0, 1):
+            if skip and size < 2:
+                continue
+            if head[skip:skip + size] == tail[-size:] and len(head[skip:skip + size]) == size:
+                return words[skip + size:]
+    return words
+
+
+def stitch(texts: List[str], segments: List[Segment]) -> str:
+    words: List[str] = []
+    for text, (_, _, overlapped) in zip(texts, segments):
+        part = (text or "").split()
+        if overlapped and words:
+            part = _drop_repeated_head(words, part)
+        words.extend(part)
+    return " ".join(words)
+
+
+class _WavSource:
+    """A PCM WAV read through `wave`, block by block."""
+
+    def __init__(self, params):
+        self.params = params
+        self.rate = params.framerate
+        self.duration = params.nframes / params.framerate
+
+    @staticmethod
+    def open(reader: BinaryIO) -> Optional["_WavSource"]:
+        try:
+            with wave.open(reader, "rb") as wav:
+                return _WavSource(wav.getparams())
+        except (wave.Error, EOFError):
+            return None
+
+    def _mono(self, data: bytes) -> np.ndarray:
+        width, channels = self.params.sampwidth, self.params.nchannels
+        if width == 1:
+            samples = np.frombuffer(data, np.uint8).astype(np.float32) - 128
+        elif width == 3:
+            raw = np.frombuffer(data, np.uint8).reshape(-1, 3)
+            samples = (raw[:, 0].astype(np.int32) | raw[:, 1].astype(np.int32) << 8 | raw[:, 2].astype(np.int8).astype(np.int32) << 16).astype(np.float32)
+        else:
+            samples = np.frombuffer(data, {2: np.int16, 4: np.int32}[width]).astype(np.float32)
+        return samples.reshape(-1, channels).mean(axis=1)
+
+    def rms(self, reader: BinaryIO) -> np.ndarray:
+        frame_len = max(1, int(self.rate * FRAME_SECONDS))
+        block = frame_len * 200  # 10 s per read
+        parts = []
+        with wave.open(reader, "rb") as wav:
+            while True:
+                data = wav.readframes(block)
+                if not data:
+                    break
+                parts.append(frame_rms(self._mono(data), frame_len))
+        return np.concatenate(parts) if parts else np.zeros(0)
+
+    def segment(self, reader: BinaryIO, start: float, end: float, index: int) -> BinaryIO:
+        first = int(start * self.rate)
+        count = max(0, min(self.params.nframes, int(end * self.rate)) - first)
+        out = io.BytesIO()
+        with wave.open(reader, "rb") as wav:
+            wav.setpos(first)
+            data = wav.readframes(count)
+        with wave.open(out, "wb") as part:
+            part.setparams(self.params)
+            part.writeframes(data)
+        out.seek(0)
+        out.name = f"segment-{index}.wav"
+        return out
+
+
+class _PydubSource:
+    """Any format ffmpeg decodes, through the optional pydub; decoded in memory."""
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.duration = len(audio) / 1000
+
+    @staticmethod
+    def open(reader: BinaryIO, suffix: str) -> Optional["_PydubSource"]:
+        if importlib.util.find_spec("pydub") is None:
+            return None
+        from pydub import AudioSegment
+        try:
+            return _PydubSource(AudioSegment.from_file(reader, format=suffix.lstrip(".") or None))
+        except Exception as e:
+            logger.warning(f"pydub could not decode {suffix} audio: {e}")
+            return None
+
+    def rms(self, reader: BinaryIO) -> np.ndarray:
+        samples = np.array(self.audio.get_array_of_samples(), dtype=np.float32)
+        samples = samples.reshape(-1, self.audio.channels).mean(axis=1)
+        return frame_rms(samples, max(1, int(self.audio.frame_rate * FRAME_SECONDS)))
+
+    def segment(self, reader: BinaryIO, start: float, end: float, index: int) -> BinaryIO:
+        out = io.BytesIO()
+        self.audio[int(start * 1000):int(end * 1000)].export(out, format="wav")
+        out.seek(0)
+        out.name = f"segment-{index}.wav"
+        return out
+
+
+class Transcriber:
+    def __init__(
+        self,
+        transcribe: Callable[[BinaryIO], Awaitable[str]],
+        concurrency: int = 8,
+        segment_seconds: float = 60,
+        overlap_seconds: float = 1.0,
+        search_seconds: float = 10,
+    ):
+        self.transcribe_file = transcribe
+        self.segment_seconds = segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.search_seconds = search_seconds
+        self._pool = asyncio.Semaphore(concurrency)
+
+    async def _source(self, buffer: AudioBuffer):
+        reader = await buffer.open()
+        source = await asyncio.to_thread(_WavSource.open, reader)
+        if source is None:
+            reader.seek(0)
+            source = await asyncio.to_thread(_PydubSource.open, reader, buffer.suffix)
+        return source
+
+    async def transcribe(self, buffer: AudioBuffer) -> str:
+        source = await self._source(buffer)
+        if source is None or source.duration <= self.segment_seconds + self.search_seconds:
+            if source is None and buffer.size > PROVIDER_MAX_BYTES:
+                raise AudioTooLarge(f"{buffer.suffix} audio over {PROVIDER_MAX_BYTES // (1024 * 1024)} MB cannot be split; send WAV")
+            async with self._pool:
+                return await self.transcribe_file(await buffer.open())
+
+        rms = await asyncio.to_thread(source.rms, await buffer.open())
+        segments = plan_segments(rms, FRAME_SECONDS, self.segment_seconds, self.overlap_seconds, self.search_seconds)
+        start, _, overlapped = segments[-1]
+        segments[-1] = (start, source.duration, overlapped)  # the scan drops a trailing partial frame
+        tasks = [asyncio.create_task(self._segment(buffer, source, seg, i)) for i, seg in enumerate(segments)]
+        try:
+            texts = await asyncio.gather(*tasks)
+        except BaseException:
+            # One segment failed (or the request went away): stop the rest before the buffer is closed under them.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return stitch(texts, segments)
+
+    async def _segment(self, buffer: AudioBuffer, source, segment: Segment, index: int) -> str:
+        start, end, _ = segment
+        async with self._pool:
+            # Cut out only when a slot is free, so at most `concurrency` segments are held in memory.
+            audio = await asyncio.to_thread(source.segment, await buffer.open(), start, end, index)
+            try:
+                return await self.transcribe_file(audio)
+            finally:
+                audio.close()
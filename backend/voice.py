@@ -0,0 +1,229 @@
+"""Voice note uploads for /voice/transcribe.
+
+The multipart body is parsed as it streams in (python-multipart's push
+parser over `request.stream()`), not buffered by the framework first. Only
+the `file` part is kept, in an `AudioBuffer`:
+
+  * clips up to `memory_bytes` stay in memory and are handed to the
+    transcriber as a named BytesIO;
+  * larger ones roll over to a temporary file, and every disk write and the
+    final unlink run in a worker thread, off the event loop.
+
+Reading stops as soon as the file passes `max_bytes` (AudioTooLarge), and a
+Content-Length that is already too big is refused before any of the body is
+read. `async with` on the buffer guarantees the temp file is removed however
+the request ends. The bytes are hashed (SHA-256) as they arrive, so
+`AudioBuffer.sha256` is ready to key the transcript cache without reading the
+audio again.
+
+`UploadLimiter` caps the uploads being received or transcribed at once. An
+upload over the cap is refused immediately with UploadsBusy (429), rather than
+queueing more audio in memory and on disk.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, List, Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+FILE_FIELD = "file"
+DEFAULT_SUFFIX = ".wav"
+# Room for multipart boundaries and headers on top of the file itself.
+_ENVELOPE_BYTES = 16 * 1024
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+class AudioTooLarge(ValueError):
+    pass
+
+
+class UploadsBusy(Exception):
+    pass
+
+
+class UploadLimiter:
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        if self.active >= self.max_concurrent:
+            self.rejected += 1
+            raise UploadsBusy()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        return {"active": self.active, "max_concurrent": self.max_concurrent, "rejected": self.rejected}
+
+
+class AudioBuffer:
+    def __init__(self, filename: Optional[str], memory_bytes: int):
+        self.suffix = Path(filename).suffix.lower() if filename and Path(filename).suffix else DEFAULT_SUFFIX
+        self.memory_bytes = memory_bytes
+        self.size = 0
+        self.path: Optional[str] = None
+        self.sha256: Optional[str] = None  # hex digest of the whole file, set by finish()
+        self._hash = hashlib.sha256()
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._disk: Optional[BinaryIO] = None
+        self._readers: List[BinaryIO] = []
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        self._hash.update(data)
+        if self._memory is not None and self.size <= self.memory_bytes:
+            self._memory.write(data)
+            return
+        if self._memory is not None:
+            self._disk = await asyncio.to_thread(tempfile.NamedTemporaryFile, suffix=self.suffix, delete=False)
+            self.path = self._disk.name
+            await asyncio.to_thread(self._disk.write, self._memory.getvalue())
+            self._memory = None
+        await asyncio.to_thread(self._disk.write, data)
+
+    async def finish(self):
+        self.sha256 = self._hash.hexdigest()
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.close)
+
+    async def open(self) -> BinaryIO:
+        """A fresh reader over the audio, named so the transcriber can tell the format; closed with the buffer."""
+        if self.in_memory:
+            reader = io.BytesIO(self._memory.getbuffer())
+            reader.name = f"audio{self.suffix}"
+        else:
+            reader = await asyncio.to_thread(open, self.path, "rb")
+        self._readers.append(reader)
+        return reader
+
+    async def close(self):
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.close)
+        if self.path is not None:
+            path, self.path = self.path, None
+            try:
+                await asyncio.to_thread(os.unlink, path)
+            except FileNotFoundError:
+                pass
+        self._memory = io.BytesIO()
+
+    async def __aenter__(self) -> "AudioBuffer":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class _FilePart:
+    """python-multipart callbacks collecting the `file` part's bytes per fed chunk."""
+
+    def __init__(self):
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+        self.is_file = False
+        self.filename: Optional[str] = None
+        self.started = False
+        self.complete = False
+        self.pending: List[bytes] = []
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": lambda data, start, end: self._append("header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._append("header_value", data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _append(self, attr: str, data: bytes):
+        setattr(self, attr, getattr(self, attr) + data)
+
+    def _part_begin(self):
+        self.headers = {}
+
+    def _header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = self.header_value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        self.is_file = options.get(b"name") == FILE_FIELD.encode() and not self.started
+        if self.is_file:
+            self.started = True
+            filename = options.get(b"filename")
+            self.filename = filename.decode("utf-8", "replace") if filename else None
+
+    def _part_data(self, data, start, end):
+        if self.is_file:
+            self.pending.append(bytes(data[start:end]))
+
+    def _part_end(self):
+        if self.is_file:
+            self.complete = True
+            self.is_file = False
+
+
+async def receive_audio(headers, body: AsyncIterator[bytes], max_bytes: int, memory_bytes: int) -> AudioBuffer:
+    """Stream the `file` part of a multipart body into an AudioBuffer. The caller closes it (`async with`)."""
+    content_type, options = parse_options_header(headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("expected multipart/form-data with a 'file' part")
+    length = headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes + _ENVELOPE_BYTES:
+        raise AudioTooLarge()
+
+    part = _FilePart()
+    parser = MultipartParser(boundary, part.callbacks())
+    buffer: Optional[AudioBuffer] = None
+    try:
+        async for chunk in body:
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise InvalidUpload(f"malformed multipart body: {e}")
+            if part.pending:
+                if buffer is None:
+                    buffer = AudioBuffer(part.filename, memory_bytes)
+                for data in part.pending:
+                    if buffer.size + len(data) > max_bytes:
+                        raise AudioTooLarge()
+                    await buffer.write(data)
+                part.pending = []
+        try:
+            parser.finalize()
+        except MultipartParseError as e:
+            raise InvalidUpload(f"malformed multipart body: {e}")
+        if not part.complete or buffer is None:
+            raise InvalidUpload("no audio in the 'file' part")
+        await buffer.finish()
+    except BaseException:
+        if buffer is not None:
+            await buffer.close()
+        raise
+    return buffer
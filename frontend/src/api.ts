@@ -20,13 +20,24 @@ export const api = {
     if (tag) url += `&tag=${tag}`;
     return request(url);
   },
+  getContactsPage: (cursor?: string, limit = 50, archived = false, tag?: string) => {
+    let url = `/contacts/page?archived=${archived}&limit=${limit}`;
+    if (tag) url += `&tag=${tag}`;
+    if (cursor) url += `&cursor=${cursor}`;
+    return request(url);
+  },
   getContact: (id: string) => request(`/contacts/${id}`),
   createContact: (data: any) => request('/contacts', { method: 'POST', body: JSON.stringify(data) }),
   updateContact: (id: string, data: any) => request(`/contacts/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
   deleteContact: (id: string) => request(`/contacts/${id}`, { method: 'DELETE' }),
+  batchUpdateContacts: (operations: { id: string; patch: any }[]) =>
+    request('/contacts/batch', { method: 'POST', body: JSON.stringify({ operations }) }),
 
   // Interactions
   getInteractions: (contactId: string, limit = 20) => request(`/interactions/${contactId}?limit=${limit}`),
+  getInteractionsPage: (contactId: string, cursor?: string, limit = 50) =>
+    request(`/interactions/${contactId}/page?limit=${limit}${cursor ? `&cursor=${cursor}` : ''}`),
+  getInteractionEnrichment: (interactionId: string, wait = 10) => request(`/interactions/${interactionId}/enrichment?wait=${wait}`),
   createInteraction: (data: any) => request('/interactions', { method: 'POST', body: JSON.stringify(data) }),
 
   // Voice
@@ -42,6 +53,10 @@ export const api = {
   getCallPrep: (contactId: string) => request(`/ai/call-prep/${contactId}`),
   getInsights: () => request('/ai/insights'),
   getPrompts: (contactId: string, mode = 'deep') => request(`/ai/prompts/${contactId}?mode=${mode}`),
+  // Server-Sent Events URLs for the streaming variants (use with an EventSource client)
+  callPrepStreamUrl: (contactId: string) => `${API}/ai/call-prep/${contactId}/stream`,
+  insightsStreamUrl: () => `${API}/ai/insights/stream`,
+  promptsStreamUrl: (contactId: string, mode = 'deep') => `${API}/ai/prompts/${contactId}/stream?mode=${mode}`,
 
   // Dashboard
   getDashboard: () => request('/dashboard'),